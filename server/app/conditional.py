@@ -0,0 +1,85 @@
+"""
+条件请求支持 (ETag / Last-Modified / 304)
+
+ETag 使用 PNG 内容的 MD5 (与 R2/S3 单段上传的 ETag 相同)，
+设备端可以直接用 md5sum 计算本地图片的 ETag 并发送 If-None-Match。
+"""
+
+import hashlib
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response
+
+# 记录每个 ETag 第一次出现的时间，作为 Last-Modified
+_MAX_TRACKED_ETAGS = 64
+_first_seen: OrderedDict[str, datetime] = OrderedDict()
+
+
+def content_etag(content: bytes) -> str:
+    """计算强 ETag (带引号的 MD5 十六进制)"""
+    return f'"{hashlib.md5(content).hexdigest()}"'
+
+
+def last_modified_for(etag: str) -> datetime:
+    """获取该内容第一次生成的时间 (精确到秒)"""
+    modified = _first_seen.get(etag)
+    if modified is None:
+        modified = datetime.now(timezone.utc).replace(microsecond=0)
+        _first_seen[etag] = modified
+        while len(_first_seen) > _MAX_TRACKED_ETAGS:
+            _first_seen.popitem(last=False)
+    return modified
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match 使用弱比较：忽略 W/ 前缀，支持列表和 *"""
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    return etag in candidates
+
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime) -> bool:
+    """判断请求是否可以返回 304 (有 If-None-Match 时忽略 If-Modified-Since)"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return last_modified <= since
+    return False
+
+
+def png_response(
+    request: Request,
+    png_bytes: bytes,
+    cache_control: str = "no-cache, must-revalidate",
+    last_modified: Optional[datetime] = None,
+    headers: Optional[dict] = None
+) -> Response:
+    """
+    返回 PNG 图片，带 ETag 和 Last-Modified；内容未变化时返回 304
+
+    no-cache 允许客户端缓存，但每次都必须带条件请求重新验证。
+    """
+    etag = content_etag(png_bytes)
+    last_modified = last_modified or last_modified_for(etag)
+    response_headers = {
+        "ETag": etag,
+        "Last-Modified": format_datetime(last_modified, usegmt=True),
+        "Cache-Control": cache_control,
+        **(headers or {})
+    }
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=response_headers)
+    return Response(content=png_bytes, media_type="image/png", headers=response_headers)
@@ -1,3 +1,4 @@
+import json
 import os
 from dotenv import load_dotenv
 
@@ -5,7 +6,8 @@ load_dotenv()
 
 # QWeather API configuration
 QWEATHER_API_HOST = os.getenv("QWEATHER_API_HOST", "devapi.qweather.com")
-QWEATHER_BASE_URL = f"https://{QWEATHER_API_HOST}/v7"
+# 可整体覆盖，例如指向本地的替身服务 (benchmarks/stubs.py)
+QWEATHER_BASE_URL = os.getenv("QWEATHER_BASE_URL", f"https://{QWEATHER_API_HOST}/v7")
 
 # QWeather JWT authentication (recommended)
 QWEATHER_PROJECT_ID = os.getenv("QWEATHER_PROJECT_ID", "")
@@ -16,9 +18,12 @@ QWEATHER_PRIVATE_KEY = os.getenv("QWEATHER_PRIVATE_KEY", "")
 LOCATION = os.getenv("LOCATION", "121.1462,31.4622")  # Default location (Taicang)
 LOCATION_NAME = os.getenv("LOCATION_NAME", "太仓")
 
-# 新闻 RSS 配置
-NEWS_RSS_DOMESTIC = "https://www.chinanews.com.cn/rss/importnews.xml"
-NEWS_RSS_INTERNATIONAL = {
+# 多设备注册表 (JSON)，见 app/devices.py；render_cli.py --devices 批量渲染
+DEVICES_FILE = os.getenv("DEVICES_FILE", "devices.json")
+
+# 新闻 RSS 配置 (NEWS_RSS_INTERNATIONAL 可用 JSON 覆盖：{"分类": "RSS 地址"})
+NEWS_RSS_DOMESTIC = os.getenv("NEWS_RSS_DOMESTIC", "https://www.chinanews.com.cn/rss/importnews.xml")
+NEWS_RSS_INTERNATIONAL = json.loads(os.getenv("NEWS_RSS_INTERNATIONAL", "null")) or {
     "国际": "https://news.google.com/rss/search?q=site:reuters.com+world",
     "财经": "https://news.google.com/rss/search?q=site:reuters.com+markets",
     "科技": "https://news.google.com/rss/search?q=site:reuters.com+technology"
@@ -31,3 +36,108 @@ NEWS_COUNT_PER_CATEGORY = 2  # 每个国际分类获取2条
 # 截图尺寸 (Kindle 4/5 NT)
 SCREEN_WIDTH = 800
 SCREEN_HEIGHT = 600
+
+# 浏览器池配置 (常驻 Chromium，避免每次渲染冷启动)
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))                  # 预热页面数量
+BROWSER_PAGE_MAX_RENDERS = int(os.getenv("BROWSER_PAGE_MAX_RENDERS", "50"))   # 单页面渲染多少次后回收
+BROWSER_POOL_MAX_WAITERS = int(os.getenv("BROWSER_POOL_MAX_WAITERS", "8"))    # 排队等待的渲染上限
+BROWSER_POOL_ACQUIRE_TIMEOUT = float(os.getenv("BROWSER_POOL_ACQUIRE_TIMEOUT", "30"))  # 等待空闲页面的超时 (秒)
+# 预热页面轮流使用的机型 (逗号分隔，见 app/devices.py 的 SCREEN_PRESETS)，留空只预热默认尺寸
+BROWSER_POOL_PRESETS = [name.strip() for name in os.getenv("BROWSER_POOL_PRESETS", "").split(",") if name.strip()]
+
+# /dashboard 渲染闸门：相同输出的并发请求合并为一次渲染，不同输出最多同时渲染 N 个，
+# 排队的渲染超过上限时返回 503 + Retry-After
+RENDER_MAX_CONCURRENCY = int(os.getenv("RENDER_MAX_CONCURRENCY", str(max(1, BROWSER_POOL_SIZE))))
+RENDER_MAX_QUEUE = int(os.getenv("RENDER_MAX_QUEUE", "8"))
+RENDER_RETRY_AFTER = int(os.getenv("RENDER_RETRY_AFTER", "30"))     # 503 响应中建议的重试间隔 (秒)
+
+# 截图就绪等待
+# signal: 等待 document.fonts.ready、图片解码及模板设置的就绪标记 (推荐)
+# networkidle: 旧模式，等待网络空闲后再固定等待 500ms
+RENDER_READY_MODE = os.getenv("RENDER_READY_MODE", "signal")
+RENDER_READY_TIMEOUT_MS = int(os.getenv("RENDER_READY_TIMEOUT_MS", "5000"))  # 就绪等待上限
+
+# 本地字体资源：截图时拦截图标字体/中文字体请求，直接从内存返回 (见 build_fonts.py)
+RENDER_LOCAL_ASSETS = os.getenv("RENDER_LOCAL_ASSETS", "true").lower() == "true"
+# 拒绝所有其他外部请求，保证渲染零外网访问
+RENDER_BLOCK_EXTERNAL = os.getenv("RENDER_BLOCK_EXTERNAL", "false").lower() == "true"
+
+# 共享 HTTP 客户端 (连接池，随 app lifespan 创建/关闭)
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))   # 空闲连接保留时间 (秒)
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").lower() == "true"
+
+# 单个天气接口 (含回退请求) 的总超时 (秒)，超时按失败处理，不影响其他接口
+WEATHER_CALL_TIMEOUT = float(os.getenv("WEATHER_CALL_TIMEOUT", "8"))
+
+# 上游数据缓存 (TTL + stale-while-revalidate)
+UPSTREAM_CACHE_ENABLED = os.getenv("UPSTREAM_CACHE_ENABLED", "true").lower() == "true"
+CACHE_TTL_CURRENT_WEATHER = int(os.getenv("CACHE_TTL_CURRENT_WEATHER", "600"))     # 实时天气 (秒)
+CACHE_TTL_AIR_QUALITY = int(os.getenv("CACHE_TTL_AIR_QUALITY", "1800"))            # 空气质量
+CACHE_TTL_MINUTELY_RAIN = int(os.getenv("CACHE_TTL_MINUTELY_RAIN", "300"))         # 分钟级降水 (接口 5 分钟更新)
+CACHE_TTL_DAILY_FORECAST = int(os.getenv("CACHE_TTL_DAILY_FORECAST", "10800"))     # 逐日预报
+CACHE_TTL_NEWS = int(os.getenv("CACHE_TTL_NEWS", "900"))                           # RSS 新闻
+UPSTREAM_CACHE_STALE_TTL = int(os.getenv("UPSTREAM_CACHE_STALE_TTL", "3600"))      # 过期后仍可先返回旧数据的时长
+UPSTREAM_CACHE_FILE = os.getenv("UPSTREAM_CACHE_FILE", ".cache/upstream.pickle")   # 持久化文件 (last-known-good)，留空则只在内存中缓存
+
+# 上游熔断：连续失败 N 次后在冷却时间内直接失败，回退到缓存中最近一次成功的数据
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "3"))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "60"))             # 冷却时间 (秒)，之后放行一个试探请求
+
+# 渲染结果缓存：相同 HTML 直接返回上次的 PNG
+RENDER_CACHE_MAX_ENTRIES = int(os.getenv("RENDER_CACHE_MAX_ENTRIES", "16"))        # 0 表示禁用
+RENDER_CACHE_MAX_BYTES = int(os.getenv("RENDER_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+
+# Jinja 模板：开发时开启自动重载 (每次渲染检查模板文件修改)；字节码缓存让进程重启后跳过模板解析
+TEMPLATE_AUTO_RELOAD = os.getenv("TEMPLATE_AUTO_RELOAD", "false").lower() == "true"
+TEMPLATE_BYTECODE_CACHE = os.getenv("TEMPLATE_BYTECODE_CACHE", "true").lower() == "true"
+TEMPLATE_BYTECODE_CACHE_DIR = os.getenv("TEMPLATE_BYTECODE_CACHE_DIR", "")    # 留空使用系统临时目录
+
+# 后台预渲染：按设备的刷新计划提前渲染，/dashboard 直接返回内存中的图片
+PRERENDER_ENABLED = os.getenv("PRERENDER_ENABLED", "false").lower() == "true"
+REFRESH_SCHEDULE = os.getenv("REFRESH_SCHEDULE", "5 7-23 * * *")     # 与设备端 REFRESH_SCHEDULE 保持一致
+TIMEZONE = os.getenv("TIMEZONE", "Asia/Shanghai")
+PRERENDER_LEAD_SECONDS = int(os.getenv("PRERENDER_LEAD_SECONDS", "60"))  # 在设备唤醒前多少秒渲染
+
+# 提前渲染时间线：按每台设备的计划渲染接下来几次唤醒的图片，/dashboard/next 带 Expires 返回
+TIMELINE_ENABLED = os.getenv("TIMELINE_ENABLED", "false").lower() == "true"
+TIMELINE_AHEAD = int(os.getenv("TIMELINE_AHEAD", "3"))               # 每台设备提前渲染的唤醒次数
+TIMELINE_GRACE_SECONDS = int(os.getenv("TIMELINE_GRACE_SECONDS", "120"))  # 唤醒后多久内仍返回该次唤醒的图片 (设备联网需要时间)
+
+# Pillow 后处理线程数 (灰度/对比度/量化/旋转/PNG 编码在线程池中执行，不阻塞事件循环)
+POSTPROCESS_WORKERS = int(os.getenv("POSTPROCESS_WORKERS", "2"))
+
+# PNG 输出格式：gray8 (8 位灰度) / gray4 (4 位灰度) / palette4 (4 位灰阶调色板)
+PNG_OUTPUT_MODE = os.getenv("PNG_OUTPUT_MODE", "gray8")
+PNG_COMPRESS_LEVEL = int(os.getenv("PNG_COMPRESS_LEVEL", "9"))               # zlib 压缩级别 0-9
+PNG_COMPRESS_STRATEGY = os.getenv("PNG_COMPRESS_STRATEGY", "filtered")       # default / filtered / huffman / rle / fixed
+
+# 渲染引擎：chromium (HTML 模板 + 截图) / pillow (Pillow 直接绘制，无需浏览器)
+RENDERER = os.getenv("RENDERER", "chromium")
+# pillow 渲染使用的字体 (ttc 会自动选择其中的简体中文字体)
+PILLOW_FONT_REGULAR = os.getenv("PILLOW_FONT_REGULAR", "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc")
+PILLOW_FONT_BOLD = os.getenv("PILLOW_FONT_BOLD", "/usr/share/fonts/opentype/noto/NotoSansCJK-Bold.ttc")
+
+# 局部刷新 (/dashboard/delta)：与设备上一帧比较，只下发变化的矩形区域
+DELTA_MAX_FRAMES = int(os.getenv("DELTA_MAX_FRAMES", "8"))                   # 保留多少个历史帧用于比较
+DELTA_TILE_SIZE = int(os.getenv("DELTA_TILE_SIZE", "32"))                    # 比较粒度 (像素)
+DELTA_MAX_CHANGED_RATIO = float(os.getenv("DELTA_MAX_CHANGED_RATIO", "0.5"))  # 变化面积超过该比例时直接下发整图
+
+# 设备同步 (/device/sync)：一次请求完成取图、下次唤醒时间和电量上报
+SYNC_FULL_REFRESH_EVERY = int(os.getenv("SYNC_FULL_REFRESH_EVERY", "4"))      # 局刷多少次后提示设备全刷，0 表示每次全刷
+TELEMETRY_DB = os.getenv("TELEMETRY_DB", ".cache/telemetry.sqlite3")         # 设备遥测 SQLite 文件，留空则只保存在内存中
+TELEMETRY_RETENTION_DAYS = int(os.getenv("TELEMETRY_RETENTION_DAYS", "90"))  # 同步记录保留天数
+
+# 16 级灰度量化方式：posterize (直接截断) / bayer (有序抖动) / floyd-steinberg (误差扩散)
+DITHER_MODE = os.getenv("DITHER_MODE", "posterize")
+
+# R2 上传：后台队列 + 重试，内容未变化时跳过
+R2_UPLOAD_CONCURRENCY = int(os.getenv("R2_UPLOAD_CONCURRENCY", "4"))          # 同时进行的上传数
+R2_UPLOAD_RETRIES = int(os.getenv("R2_UPLOAD_RETRIES", "3"))                  # 失败后重试次数
+R2_UPLOAD_BACKOFF = float(os.getenv("R2_UPLOAD_BACKOFF", "1"))                # 首次重试等待 (秒)，之后翻倍
+R2_MULTIPART_THRESHOLD = int(os.getenv("R2_MULTIPART_THRESHOLD", str(8 * 1024 * 1024)))  # 超过该大小分段上传
+
+# 指标与计时：/metrics (Prometheus 文本格式)、Server-Timing 响应头、结构化计时日志 (logger app.timing)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "false").lower() == "true"
+TIMING_LOG_ENABLED = os.getenv("TIMING_LOG_ENABLED", "false").lower() == "true"
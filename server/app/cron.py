@@ -0,0 +1,123 @@
+"""
+Cron 表达式解析
+
+与设备端 next-wakeup 使用相同的 5 字段格式 (分 时 日 月 周)，
+支持 *、列表、范围、步长以及 JAN-DEC / SUN-SAT 名称。
+日和周同时被限定时按标准 cron 语义取并集。
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Iterator
+from zoneinfo import ZoneInfo
+
+_MONTH_NAMES = {name: i for i, name in enumerate(
+    ["JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"], start=1)}
+_DOW_NAMES = {name: i for i, name in enumerate(["SUN", "MON", "TUE", "WED", "THU", "FRI", "SAT"])}
+
+# 最多向后查找的天数，避免 "0 0 30 2 *" 这类永远不会触发的表达式死循环
+_MAX_LOOKAHEAD_DAYS = 366 * 5
+
+
+def _parse_value(token: str, names: dict[str, int]) -> int:
+    return names[token.upper()] if token.upper() in names else int(token)
+
+
+def _parse_field(field: str, low: int, high: int, names: dict[str, int]) -> frozenset[int]:
+    values: set[int] = set()
+    for part in field.split(","):
+        expr, _, step_str = part.partition("/")
+        step = int(step_str) if step_str else 1
+        if step < 1:
+            raise ValueError(f"Invalid step in cron field: {field!r}")
+
+        if expr == "*":
+            start, end = low, high
+        elif "-" in expr:
+            start_str, end_str = expr.split("-", 1)
+            start, end = _parse_value(start_str, names), _parse_value(end_str, names)
+        else:
+            start = _parse_value(expr, names)
+            end = high if step_str else start
+
+        if not (low <= start <= high and low <= end <= high) or start > end:
+            raise ValueError(f"Cron field out of range ({low}-{high}): {field!r}")
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+@dataclass(frozen=True)
+class CronSchedule:
+    """解析后的 cron 表达式"""
+    expression: str
+    minutes: frozenset[int]
+    hours: frozenset[int]
+    days: frozenset[int]
+    months: frozenset[int]
+    weekdays: frozenset[int]       # 0 = 周日
+    days_restricted: bool
+    weekdays_restricted: bool
+
+    @classmethod
+    def parse(cls, expression: str) -> "CronSchedule":
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Expected 5 cron fields, got {len(fields)}: {expression!r}")
+        minute, hour, day, month, weekday = fields
+        weekdays = _parse_field(weekday, 0, 7, _DOW_NAMES)
+        return cls(
+            expression=expression,
+            minutes=_parse_field(minute, 0, 59, {}),
+            hours=_parse_field(hour, 0, 23, {}),
+            days=_parse_field(day, 1, 31, {}),
+            months=_parse_field(month, 1, 12, _MONTH_NAMES),
+            # 7 和 0 都表示周日
+            weekdays=frozenset(d % 7 for d in weekdays),
+            days_restricted=day != "*",
+            weekdays_restricted=weekday != "*"
+        )
+
+    def _day_matches(self, dt: datetime) -> bool:
+        day_ok = dt.day in self.days
+        weekday_ok = (dt.isoweekday() % 7) in self.weekdays
+        if self.days_restricted and self.weekdays_restricted:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+
+    def next_after(self, after: datetime) -> datetime:
+        """
+        返回严格晚于 after 的下一次触发时间
+
+        after 必须带时区；按该时区的本地时间匹配，结果同样带时区。
+        """
+        if after.tzinfo is None:
+            raise ValueError("next_after requires a timezone-aware datetime")
+        tz = after.tzinfo
+        local = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = local.replace(hour=0, minute=0)
+
+        for _ in range(_MAX_LOOKAHEAD_DAYS):
+            if day.month in self.months and self._day_matches(day):
+                for hour in sorted(self.hours):
+                    for minute in sorted(self.minutes):
+                        candidate = day.replace(hour=hour, minute=minute)
+                        if candidate < local:
+                            continue
+                        # 规范化夏令时间隙中不存在的本地时间
+                        normalized = candidate.astimezone(ZoneInfo("UTC")).astimezone(tz)
+                        if normalized > after:
+                            return normalized
+            day = (day + timedelta(days=1)).replace(hour=0, minute=0)
+        raise ValueError(f"Cron schedule never fires: {self.expression!r}")
+
+    def iter_after(self, after: datetime) -> Iterator[datetime]:
+        """依次产生 after 之后的触发时间"""
+        current = after
+        while True:
+            current = self.next_after(current)
+            yield current
+
+
+def next_wakeup(schedule: str, timezone: str, now: datetime) -> datetime:
+    """与设备端 next-wakeup 相同：按时区解释 schedule，返回下一次唤醒时间"""
+    return CronSchedule.parse(schedule).next_after(now.astimezone(ZoneInfo(timezone)))
@@ -0,0 +1,190 @@
+"""
+局部刷新 (脏区域) 支持
+
+服务端保留最近发布的若干帧 (按 ETag 索引)。设备带上当前显示图片的 ETag 请求
+/dashboard/delta 时，与最新一帧逐块比较，合并出变化的矩形区域，
+只打包这些区域的 PNG，设备用 eips -g -x -y 逐块更新屏幕。
+
+返回的 tar 包中包含 manifest.txt：
+    etag "<新图片的 ETag>"
+    region <x> <y> <宽> <高> <文件名>     (局部更新)
+    full dashboard.png                    (基准帧未知或变化过多时下发整图)
+坐标为最终 (旋转后) 图片中的像素坐标，即设备屏幕坐标。
+"""
+
+import io
+import tarfile
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+from PIL import Image, ImageChops
+
+from app.config import (
+    DELTA_MAX_FRAMES,
+    DELTA_TILE_SIZE,
+    DELTA_MAX_CHANGED_RATIO,
+    PNG_OUTPUT_MODE,
+    PNG_COMPRESS_LEVEL,
+    PNG_COMPRESS_STRATEGY
+)
+from app.conditional import content_etag
+from app.renderer.png_encoder import encode_png
+
+
+@dataclass(frozen=True)
+class Region:
+    """变化的矩形区域"""
+    x: int
+    y: int
+    width: int
+    height: int
+
+    @property
+    def box(self) -> tuple[int, int, int, int]:
+        return self.x, self.y, self.x + self.width, self.y + self.height
+
+
+class FrameHistory:
+    """最近发布的帧 (ETag -> PNG)，发布在线程中执行，读写加锁"""
+
+    def __init__(self, max_frames: int = DELTA_MAX_FRAMES):
+        self.max_frames = max_frames
+        self._frames: OrderedDict[str, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, png_bytes: bytes) -> str:
+        etag = content_etag(png_bytes)
+        with self._lock:
+            self._frames[etag] = png_bytes
+            self._frames.move_to_end(etag)
+            while len(self._frames) > self.max_frames:
+                self._frames.popitem(last=False)
+        return etag
+
+    def get(self, etag: str) -> Optional[bytes]:
+        with self._lock:
+            return self._frames.get(etag)
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+
+def dirty_regions(old: Image.Image, new: Image.Image, tile: int = DELTA_TILE_SIZE) -> list[Region]:
+    """
+    计算两帧之间变化的矩形区域
+
+    按 tile x tile 分块比较，同一行相邻的变化块合并为一段，
+    上下相邻且左右边界相同的段再合并为一个矩形。
+    """
+    if old.size != new.size:
+        return [Region(0, 0, *new.size)]
+    diff = ImageChops.difference(old.convert("L"), new.convert("L"))
+    bbox = diff.getbbox()
+    if bbox is None:
+        return []
+
+    width, height = new.size
+    # 只检查整体差异范围内的块
+    col_start, col_end = bbox[0] // tile, (bbox[2] - 1) // tile + 1
+    row_start, row_end = bbox[1] // tile, (bbox[3] - 1) // tile + 1
+
+    regions: list[Region] = []
+    open_runs: dict[tuple[int, int], Region] = {}
+    for row in range(row_start, row_end):
+        y0, y1 = row * tile, min((row + 1) * tile, height)
+        runs: list[tuple[int, int]] = []
+        run_start: Optional[int] = None
+        for col in range(col_start, col_end + 1):
+            dirty = col < col_end and diff.crop(
+                (col * tile, y0, min((col + 1) * tile, width), y1)).getbbox() is not None
+            if dirty and run_start is None:
+                run_start = col
+            elif not dirty and run_start is not None:
+                runs.append((run_start * tile, min(col * tile, width)))
+                run_start = None
+
+        next_runs: dict[tuple[int, int], Region] = {}
+        for x0, x1 in runs:
+            above = open_runs.pop((x0, x1), None)
+            if above is not None:
+                next_runs[(x0, x1)] = Region(x0, above.y, x1 - x0, y1 - above.y)
+            else:
+                next_runs[(x0, x1)] = Region(x0, y0, x1 - x0, y1 - y0)
+        regions.extend(open_runs.values())
+        open_runs = next_runs
+    regions.extend(open_runs.values())
+    return sorted(regions, key=lambda r: (r.y, r.x))
+
+
+def _add_file(archive: tarfile.TarFile, name: str, data: bytes) -> None:
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    archive.addfile(info, io.BytesIO(data))
+
+
+def pack_archive(lines: list[str], files: Sequence[tuple[str, bytes]] = ()) -> bytes:
+    """打包 manifest.txt 和各文件为 tar"""
+    output = io.BytesIO()
+    with tarfile.open(fileobj=output, mode="w", format=tarfile.USTAR_FORMAT) as archive:
+        _add_file(archive, "manifest.txt", ("\n".join(lines) + "\n").encode("ascii"))
+        for name, data in files:
+            _add_file(archive, name, data)
+        end = archive.offset
+    # 去掉 tarfile 补齐到 10KB 记录的填充，只保留两个结束块
+    return output.getvalue()[:end + 2 * tarfile.BLOCKSIZE]
+
+
+def delta_regions(
+    base_png: Optional[bytes],
+    current_png: bytes,
+    tile: int = DELTA_TILE_SIZE,
+    max_changed_ratio: float = DELTA_MAX_CHANGED_RATIO
+) -> Optional[list[Region]]:
+    """相对基准帧变化的区域；基准帧未知或变化面积超过 max_changed_ratio 时返回 None (下发整图)"""
+    if base_png is None:
+        return None
+    current = Image.open(io.BytesIO(current_png))
+    regions = dirty_regions(Image.open(io.BytesIO(base_png)), current, tile)
+    changed = sum(r.width * r.height for r in regions)
+    if changed > max_changed_ratio * current.width * current.height:
+        return None
+    return regions
+
+
+def pack_delta(current_png: bytes, regions: Optional[list[Region]], extra_lines: Sequence[str] = ()) -> bytes:
+    """打包局部刷新 tar 包，regions 为 None 时包内为整图 (extra_lines 写在 manifest 的 etag 行之后)"""
+    lines = [f"etag {content_etag(current_png)}", *extra_lines]
+    files: list[tuple[str, bytes]] = []
+    if regions is None:
+        lines.append("full dashboard.png")
+        files.append(("dashboard.png", current_png))
+    else:
+        gray = Image.open(io.BytesIO(current_png)).convert("L")
+        for i, region in enumerate(regions):
+            name = f"region-{i}.png"
+            lines.append(f"region {region.x} {region.y} {region.width} {region.height} {name}")
+            tile_png = encode_png(gray.crop(region.box), PNG_OUTPUT_MODE, PNG_COMPRESS_LEVEL, PNG_COMPRESS_STRATEGY)
+            files.append((name, tile_png))
+    return pack_archive(lines, files)
+
+
+def build_delta(
+    base_png: Optional[bytes],
+    current_png: bytes,
+    tile: int = DELTA_TILE_SIZE,
+    max_changed_ratio: float = DELTA_MAX_CHANGED_RATIO
+) -> tuple[bytes, bool]:
+    """
+    生成局部刷新 tar 包
+
+    Returns:
+        (tar 字节, 是否为整图)
+    """
+    regions = delta_regions(base_png, current_png, tile, max_changed_ratio)
+    return pack_delta(current_png, regions), regions is None
+
+
+# 全局帧历史，发布仪表盘和 /device/sync 下发图片时记录
+frame_history = FrameHistory()
@@ -0,0 +1,185 @@
+"""
+设备注册表
+
+多台 Kindle 部署在不同地点时，在 JSON 文件 (DEVICES_FILE) 中为每台设备配置位置、
+屏幕尺寸、旋转方向、布局、上传到 R2 的文件名以及设备端的刷新计划：
+
+    [
+        {"id": "taicang-kitchen", "location": "121.1462,31.4622", "location_name": "太仓"},
+        {"id": "beijing-office", "location": "101010100", "location_name": "北京",
+         "width": 1072, "height": 1448, "rotation": 0, "key": "beijing/dashboard.png",
+         "schedule": "*/30 8-20 * * 1-5"}
+    ]
+
+未配置的字段使用全局默认值 (SCREEN_WIDTH / SCREEN_HEIGHT、逆时针旋转 90 度、dashboard 布局、
+REFRESH_SCHEDULE / TIMEZONE)。schedule 和 timezone 须与设备端 env.sh 一致，见 app/timeline.py。
+
+/dashboard 还可以按请求指定屏幕：device 为注册表中的设备 id 或 SCREEN_PRESETS 中的机型，
+w / h 为设备显示的图片尺寸 (竖放分辨率)，rotate 为旋转角度，见 resolve_device。
+"""
+
+import json
+import re
+from dataclasses import dataclass, fields, replace
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from app.config import DEVICES_FILE, LOCATION, LOCATION_NAME, SCREEN_WIDTH, SCREEN_HEIGHT, REFRESH_SCHEDULE, TIMEZONE
+from app.cron import CronSchedule
+
+TEMPLATES_DIR = Path(__file__).parent / "templates"
+
+# 截图后逆时针旋转的角度
+ROTATIONS = (0, 90, 180, 270)
+
+_DEVICE_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+
+# 常见机型的屏幕分辨率 (竖放时的 宽, 高)
+SCREEN_PRESETS: dict[str, tuple[int, int]] = {
+    "kindle4": (600, 800),          # Kindle 4 / 5 NT / Touch
+    "paperwhite": (758, 1024),      # Paperwhite 1 / 2
+    "paperwhite3": (1072, 1448),    # Paperwhite 3 / 4, Voyage, Oasis 1
+    "oasis2": (1264, 1680),         # Oasis 2 / 3
+    "paperwhite5": (1236, 1648),    # Paperwhite 5
+}
+DEFAULT_PRESET = "kindle4"
+
+# 按请求指定的图片尺寸范围 (像素)
+MIN_SCREEN_SIZE = 200
+MAX_SCREEN_SIZE = 2000
+
+
+@dataclass(frozen=True)
+class DeviceConfig:
+    """单台设备的渲染配置"""
+    id: str
+    location: str = LOCATION
+    location_name: str = LOCATION_NAME
+    width: int = SCREEN_WIDTH        # 渲染 (横屏布局) 宽度
+    height: int = SCREEN_HEIGHT      # 渲染高度
+    rotation: int = 90               # 截图后逆时针旋转角度
+    layout: str = "dashboard"        # templates/ 下的模板名
+    key: str = ""                    # R2 文件名，默认 devices/<id>/dashboard.png
+    schedule: str = REFRESH_SCHEDULE # 设备端的刷新计划 (cron)
+    timezone: str = TIMEZONE         # 解释 schedule 的时区
+
+    def __post_init__(self):
+        if not _DEVICE_ID_PATTERN.match(self.id):
+            raise ValueError(f"Invalid device id {self.id!r}, use letters, digits, '-' and '_'")
+        if self.width <= 0 or self.height <= 0:
+            raise ValueError(f"Invalid screen size for device {self.id}: {self.width}x{self.height}")
+        if self.rotation not in ROTATIONS:
+            raise ValueError(f"Invalid rotation for device {self.id}: {self.rotation}, expected one of {ROTATIONS}")
+        if not (TEMPLATES_DIR / f"{self.layout}.html").exists():
+            raise ValueError(f"Unknown layout for device {self.id}: {self.layout!r}")
+        try:
+            CronSchedule.parse(self.schedule)
+        except ValueError as e:
+            raise ValueError(f"Invalid schedule for device {self.id}: {e}") from None
+        try:
+            ZoneInfo(self.timezone)
+        except (ValueError, ZoneInfoNotFoundError):
+            raise ValueError(f"Unknown timezone for device {self.id}: {self.timezone!r}") from None
+        if not self.key:
+            object.__setattr__(self, "key", f"devices/{self.id}/dashboard.png")
+
+    @property
+    def output_size(self) -> tuple[int, int]:
+        """旋转后 (设备上显示) 的图片尺寸"""
+        if self.rotation in (90, 270):
+            return self.height, self.width
+        return self.width, self.height
+
+    @property
+    def render_group(self) -> tuple:
+        """输出完全相同的设备只需渲染一次"""
+        return self.location, self.location_name, self.width, self.height, self.rotation, self.layout
+
+
+def _device_from_entry(entry: object, devices_path: Path) -> DeviceConfig:
+    """校验单个设备条目的字段，拼写错误的字段报 ValueError 而不是 TypeError"""
+    if not isinstance(entry, dict):
+        raise ValueError(f"Each device in {devices_path} must be a JSON object, got {entry!r}")
+    if "id" not in entry:
+        raise ValueError(f"Device without an id in {devices_path}: {entry!r}")
+    known = {field.name for field in fields(DeviceConfig)}
+    unknown = sorted(set(entry) - known)
+    if unknown:
+        raise ValueError(
+            f"Unknown keys for device {entry['id']!r} in {devices_path}: {', '.join(unknown)}, "
+            f"expected some of {', '.join(sorted(known))}"
+        )
+    return DeviceConfig(**entry)
+
+
+def load_devices(path: Optional[str] = None) -> list[DeviceConfig]:
+    """从 JSON 文件读取设备列表"""
+    devices_path = Path(path or DEVICES_FILE)
+    entries = json.loads(devices_path.read_text(encoding="utf-8"))
+    if not isinstance(entries, list):
+        raise ValueError(f"{devices_path} must contain a JSON list of devices")
+
+    devices = [_device_from_entry(entry, devices_path) for entry in entries]
+    ids = [device.id for device in devices]
+    duplicates = sorted({device_id for device_id in ids if ids.count(device_id) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate device ids in {devices_path}: {', '.join(duplicates)}")
+    return devices
+
+
+# 默认设备：全局 LOCATION，800x600 横屏布局旋转为 600x800
+DEFAULT_DEVICE = DeviceConfig(id="default")
+
+
+@lru_cache(maxsize=1)
+def registered_devices() -> dict[str, DeviceConfig]:
+    """DEVICES_FILE 中的设备 (文件不存在时为空)"""
+    if not Path(DEVICES_FILE).exists():
+        return {}
+    return {device.id: device for device in load_devices(DEVICES_FILE)}
+
+
+def resolve_device(
+    device: Optional[str] = None,
+    width: Optional[int] = None,
+    height: Optional[int] = None,
+    rotation: Optional[int] = None
+) -> DeviceConfig:
+    """
+    根据请求参数确定渲染配置
+
+    Args:
+        device: 注册表中的设备 id 或 SCREEN_PRESETS 中的机型 (默认 kindle4)
+        width / height: 覆盖设备显示的图片尺寸 (竖放分辨率)
+        rotation: 覆盖旋转角度
+
+    Raises:
+        ValueError: 未知设备/机型或尺寸超出范围
+    """
+    registered = registered_devices()
+    if device in registered:
+        base = registered[device]
+    elif device is None or device in SCREEN_PRESETS:
+        preset_width, preset_height = SCREEN_PRESETS[device or DEFAULT_PRESET]
+        # 预设为竖放分辨率，布局按横屏渲染后旋转 90 度
+        base = replace(
+            DEFAULT_DEVICE, id=device or DEFAULT_PRESET, width=preset_height, height=preset_width, key=""
+        )
+    else:
+        raise ValueError(f"Unknown device {device!r}, expected a registered device or one of {tuple(SCREEN_PRESETS)}")
+
+    rotation = base.rotation if rotation is None else rotation
+    output_width, output_height = base.output_size
+    output_width = output_width if width is None else width
+    output_height = output_height if height is None else height
+    for value in (output_width, output_height):
+        if not MIN_SCREEN_SIZE <= value <= MAX_SCREEN_SIZE:
+            raise ValueError(f"Screen size must be between {MIN_SCREEN_SIZE} and {MAX_SCREEN_SIZE} pixels")
+
+    if rotation in (90, 270):
+        page_width, page_height = output_height, output_width
+    else:
+        page_width, page_height = output_width, output_height
+    return replace(base, width=page_width, height=page_height, rotation=rotation)
@@ -4,31 +4,137 @@ Kindle Dashboard Server
 FastAPI 主入口，提供仪表盘图片生成服务
 """
 
+import asyncio
 import logging
+import math
 import os
-from pathlib import Path
+import time
+from contextlib import asynccontextmanager
+from dataclasses import replace
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Optional
 
-from fastapi import FastAPI, Response
+from fastapi import FastAPI, Request, Response
 from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
+from pydantic import BaseModel, Field
 
 from app.services.weather import get_weather_data
 
 logger = logging.getLogger(__name__)
 from app.services.news import get_news_data
 from app.renderer.template import render_dashboard_html
-from app.renderer.screenshot import html_to_grayscale_png
-from app.services.r2_storage import upload_dashboard_image
-from app.config import LOCATION
+from app.renderer.browser_pool import BrowserPoolBusy, start_browser_pool, stop_browser_pool
+from app.services.http_client import get_http_client, close_http_client
+from app.services.cache import upstream_cache
+from app.services.circuit_breaker import breaker_states
+from app.services.r2_storage import start_upload_queue, stop_upload_queue
+from app.pipeline import STATIC_DIR, render_dashboard_png, publish_dashboard
+from app.scheduler import get_scheduler, start_scheduler, stop_scheduler
+from app.timeline import get_timeline, start_timeline, stop_timeline
+from app.conditional import content_etag, png_response
+from app.delta import build_delta, delta_regions, frame_history, pack_archive, pack_delta
+from app.telemetry import telemetry_store
+from app.cron import next_wakeup
+from app.renderer.screenshot import postprocess_executor
+from app.devices import DEFAULT_DEVICE, DeviceConfig, registered_devices, resolve_device
+from app.render_gate import RenderOverloaded, render_gate
+from app.metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    TRACING_ENABLED,
+    end_trace,
+    http_request_seconds,
+    log_timing,
+    render_metrics,
+    server_timing_header,
+    stage,
+    start_trace
+)
+from app.config import (
+    LOCATION,
+    BROWSER_POOL_SIZE,
+    BROWSER_POOL_PRESETS,
+    PRERENDER_ENABLED,
+    TIMELINE_ENABLED,
+    RENDERER,
+    RENDER_RETRY_AFTER,
+    METRICS_ENABLED,
+    SERVER_TIMING_ENABLED,
+    SYNC_FULL_REFRESH_EVERY,
+    TIMING_LOG_ENABLED
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动时恢复上游缓存和设备遥测、创建共享 HTTP 客户端和上传队列、预热浏览器池、启动预渲染和时间线，退出时关闭"""
+    # 设备注册表有误时启动失败，而不是每个请求都报错
+    registered_devices()
+    upstream_cache.load()
+    await asyncio.to_thread(telemetry_store.open)
+    get_http_client()
+    start_upload_queue()
+    if RENDERER == "chromium" and BROWSER_POOL_SIZE > 0:
+        try:
+            # 为常用机型各预热页面，按请求切换屏幕尺寸时无需调整视口
+            viewports = [
+                {"width": device.width, "height": device.height}
+                for device in map(resolve_device, BROWSER_POOL_PRESETS)
+            ]
+            await start_browser_pool(viewports=viewports or None)
+        except Exception:
+            # 浏览器池不可用时回退到每次渲染临时启动 Chromium
+            logger.exception("Failed to start browser pool")
+    if PRERENDER_ENABLED:
+        start_scheduler()
+    if TIMELINE_ENABLED:
+        # 默认设备和注册表中的所有设备
+        start_timeline(list({DEFAULT_DEVICE.id: DEFAULT_DEVICE, **registered_devices()}.values()))
+    yield
+    await stop_timeline()
+    await stop_scheduler()
+    await stop_browser_pool()
+    await stop_upload_queue()
+    await close_http_client()
+    await upstream_cache.close()
+    telemetry_store.close()
+
 
 app = FastAPI(
     title="Kindle Dashboard Server",
     description="为 Kindle 设备生成天气和新闻仪表盘图片",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+if METRICS_ENABLED or TRACING_ENABLED:
+    @app.middleware("http")
+    async def record_request_timing(request: Request, call_next):
+        """记录请求耗时；开启 tracing 时汇总各阶段耗时写入 Server-Timing 头和计时日志"""
+        token = start_trace() if TRACING_ENABLED else None
+        start = time.perf_counter()
+        try:
+            response = await call_next(request)
+        except Exception:
+            if token is not None:
+                end_trace(token)
+            raise
+        total = time.perf_counter() - start
+
+        # 按路由模板统计 (而不是原始路径)，避免 label 无限增长
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        http_request_seconds.observe(total, route=route, status=response.status_code)
+        if token is not None:
+            trace = end_trace(token)
+            if SERVER_TIMING_ENABLED:
+                response.headers["Server-Timing"] = server_timing_header(trace, total)
+            if TIMING_LOG_ENABLED:
+                log_timing(request.method, route, response.status_code, trace, total)
+        return response
+
+
 # 确保静态目录存在
-STATIC_DIR = Path(__file__).parent.parent / "static"
 STATIC_DIR.mkdir(parents=True, exist_ok=True)
 
 # 挂载静态文件目录
@@ -41,51 +147,285 @@ async def health_check():
     return {"status": "ok"}
 
 
+async def _render_and_publish() -> bytes:
+    png_bytes = await render_dashboard_png()
+
+    # 保存到静态目录供调试，并在后台上传到 Cloudflare R2 (如果配置了)
+    await publish_dashboard(png_bytes)
+    return png_bytes
+
+
+async def current_dashboard_png(refresh: bool = False) -> bytes:
+    """
+    最新的仪表盘 PNG：启用预渲染时取内存中的图片，否则在请求中执行完整流水线
+
+    同时到达的请求共享同一次渲染 (见 app/render_gate.py)。
+    """
+    scheduler = get_scheduler()
+    if scheduler is not None:
+        dashboard = scheduler.latest
+        if refresh or dashboard is None:
+            dashboard = await render_gate.run(("prerender",), scheduler.refresh)
+        return dashboard.png_bytes
+
+    return await render_gate.run(DEFAULT_DEVICE.render_group, _render_and_publish)
+
+
+def overloaded_response(e: Exception) -> JSONResponse:
+    """渲染排队过多时返回 503，设备稍后重试"""
+    retry_after = getattr(e, "retry_after", RENDER_RETRY_AFTER)
+    return JSONResponse(
+        status_code=503,
+        content={"error": str(e)},
+        headers={"Retry-After": str(retry_after)}
+    )
+
+
 @app.get("/dashboard")
-async def get_dashboard_image():
+async def get_dashboard_image(
+    request: Request,
+    refresh: bool = False,
+    device: Optional[str] = None,
+    w: Optional[int] = None,
+    h: Optional[int] = None,
+    rotate: Optional[int] = None
+):
     """
     生成仪表盘 PNG 图片
     
-    返回 800x600 灰度 PNG 图片，适用于 Kindle eips 显示
+    默认返回 600x800 (800x600 布局旋转 90 度) 灰度 PNG 图片，适用于 Kindle eips 显示。
+    device 可指定注册表中的设备或机型预设 (见 app/devices.py)，w / h / rotate 覆盖图片尺寸和旋转角度；
+    其他尺寸按请求渲染，相同的页面直接命中渲染缓存。
+    启用预渲染时直接返回内存中最新的图片，refresh=true 时立即重新渲染。
+    相同输出的并发请求共享一次渲染；排队的渲染过多时返回 503 + Retry-After。
+    支持 If-None-Match / If-Modified-Since，图片未变化时返回 304。
     """
     try:
-        # 1. 获取天气数据
-        weather = await get_weather_data(LOCATION)
-        
-        # 2. 获取新闻数据
-        news = get_news_data()
-        
-        # 3. 渲染 HTML
-        html_content = render_dashboard_html(weather, news)
-        
-        # 4. 生成灰度 PNG 截图
-        png_bytes = await html_to_grayscale_png(html_content)
-        
-        # 5. 保存到静态目录供调试
-        try:
-            with open(STATIC_DIR / "dashboard.png", "wb") as f:
-                f.write(png_bytes)
-        except Exception as e:
-            logger.error(f"Failed to save static dashboard image: {e}")
-        
-        # 6. 上传到 Cloudflare R2 (如果配置了)
-        upload_dashboard_image(png_bytes)
-            
+        target = resolve_device(device, w, h, rotate)
+    except ValueError as e:
+        return JSONResponse(
+            status_code=400,
+            content={"error": str(e)}
+        )
+
+    try:
+        if target.render_group == DEFAULT_DEVICE.render_group:
+            png_bytes = await current_dashboard_png(refresh)
+        else:
+            png_bytes = await render_gate.run(target.render_group, lambda: render_dashboard_png(target))
+        return png_response(request, png_bytes)
+    except (RenderOverloaded, BrowserPoolBusy) as e:
+        return overloaded_response(e)
+    except Exception as e:
+        return JSONResponse(
+            status_code=500,
+            content={"error": str(e)}
+        )
+
+
+@app.get("/dashboard/next")
+async def get_dashboard_next(request: Request, device: Optional[str] = None):
+    """
+    按设备唤醒计划提前渲染的图片 (见 app/timeline.py)
+
+    device 为注册表中的设备 id，默认为全局配置的设备。返回设备本次唤醒的图片，页眉时间为唤醒时间；
+    Expires 为下一次唤醒时间 (尚未用最新数据定稿时为定稿时间)，CDN / R2 边缘缓存可以缓存到那时。
+    """
+    timeline = get_timeline()
+    if timeline is None:
+        return JSONResponse(status_code=404, content={"error": "Render-ahead timeline is disabled"})
+    device_id = device or DEFAULT_DEVICE.id
+    if device_id not in timeline.devices:
+        return JSONResponse(status_code=404, content={"error": f"Unknown device {device_id!r}"})
+
+    try:
+        frame = await timeline.frame(device_id)
+    except (RenderOverloaded, BrowserPoolBusy) as e:
+        return overloaded_response(e)
+    except Exception as e:
+        logger.exception("Timeline endpoint error")
+        return JSONResponse(
+            status_code=500,
+            content={"error": str(e)}
+        )
+
+    max_age = max(0, int((frame.expires - datetime.now(timezone.utc)).total_seconds()))
+    return png_response(
+        request,
+        frame.png_bytes,
+        cache_control=f"public, max-age={max_age}",
+        last_modified=frame.rendered_at.replace(microsecond=0),
+        headers={
+            "Expires": format_datetime(frame.expires.astimezone(timezone.utc), usegmt=True),
+            "X-Dashboard-Wakeup": frame.wakeup.isoformat()
+        }
+    )
+
+
+@app.get("/dashboard/delta")
+async def get_dashboard_delta(request: Request):
+    """
+    局部刷新：返回相对设备当前图片变化的区域
+
+    设备在 If-None-Match 中带上当前显示图片的 ETag (MD5)。
+    未变化时返回 304；否则返回 tar 包 (manifest.txt + 各区域 PNG)，
+    基准帧不在服务端历史中或变化面积过大时包内为整图。
+    """
+    try:
+        png_bytes = await current_dashboard_png()
+        etag = content_etag(png_bytes)
+        base_etag = request.headers.get("if-none-match", "").strip().removeprefix("W/")
+        if base_etag == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+
+        loop = asyncio.get_running_loop()
+        with stage("delta"):
+            archive, full = await loop.run_in_executor(
+                postprocess_executor, build_delta, frame_history.get(base_etag), png_bytes
+            )
         return Response(
-            content=png_bytes,
-            media_type="image/png",
+            content=archive,
+            media_type="application/x-tar",
             headers={
-                "Cache-Control": "no-cache, no-store, must-revalidate",
-                "Pragma": "no-cache",
-                "Expires": "0"
+                "ETag": etag,
+                "Cache-Control": "no-store",
+                "X-Dashboard-Delta": "full" if full else "partial"
             }
         )
+    except (RenderOverloaded, BrowserPoolBusy) as e:
+        return overloaded_response(e)
+    except Exception as e:
+        logger.exception("Delta endpoint error")
+        return JSONResponse(
+            status_code=500,
+            content={"error": str(e)}
+        )
+
+
+class SyncRequest(BaseModel):
+    """设备同步请求"""
+    device: Optional[str] = None                       # 注册表中的设备 id，默认为全局配置的设备
+    battery: Optional[int] = Field(None, ge=0, le=100)  # 电量百分比
+    etag: str = ""                                     # 屏幕上图片的 ETag，屏幕显示其他内容时留空
+
+
+async def device_dashboard_png(device: DeviceConfig) -> bytes:
+    """设备当前应显示的图片：时间线中的本次唤醒帧、预渲染的默认图片或按设备渲染"""
+    timeline = get_timeline()
+    if timeline is not None and device.id in timeline.devices:
+        return (await timeline.frame(device.id)).png_bytes
+    if device.render_group == DEFAULT_DEVICE.render_group:
+        return await current_dashboard_png()
+    return await render_gate.run(device.render_group, lambda: render_dashboard_png(device))
+
+
+def build_sync_archive(base_png: Optional[bytes], png_bytes: bytes, wakeup_seconds: int) -> tuple[bytes, bool]:
+    """生成同步 tar 包，返回 (tar 字节, 是否为整图)；下发整图时总是提示全刷"""
+    regions = delta_regions(base_png, png_bytes)
+    full = regions is None
+    extra_lines = (f"wakeup {wakeup_seconds}", f"refresh {'full' if full else 'partial'}")
+    return pack_delta(png_bytes, regions, extra_lines), full
+
+
+@app.post("/device/sync")
+async def sync_device(body: SyncRequest):
+    """
+    设备同步：一次请求完成取图、下次唤醒时间和电量上报
+
+    设备上报电量和屏幕上图片的 ETag，返回 tar 包，manifest.txt 中包含：
+        etag "<最新图片的 ETag>"
+        wakeup <距下一次唤醒的秒数>           (按设备的 schedule / timezone 计算)
+        unchanged                              (图片未变化，包内没有图片)
+    或
+        refresh full|partial                   (建议的刷新方式：局刷 SYNC_FULL_REFRESH_EVERY 次后全刷)
+        full dashboard.png / region ...        (与 /dashboard/delta 相同)
+    每次同步记录到设备遥测 (见 app/telemetry.py)。
+    """
+    device_id = body.device or DEFAULT_DEVICE.id
+    device = DEFAULT_DEVICE if device_id == DEFAULT_DEVICE.id else registered_devices().get(device_id)
+    if device is None:
+        return JSONResponse(status_code=404, content={"error": f"Unknown device {device_id!r}"})
+
+    try:
+        png_bytes = await device_dashboard_png(device)
+    except (RenderOverloaded, BrowserPoolBusy) as e:
+        return overloaded_response(e)
     except Exception as e:
+        logger.exception("Sync endpoint error")
         return JSONResponse(
             status_code=500,
             content={"error": str(e)}
         )
 
+    now = datetime.now(timezone.utc)
+    wakeup_seconds = max(1, math.ceil((next_wakeup(device.schedule, device.timezone, now) - now).total_seconds()))
+    # 记录为历史帧，设备下次同步时可以与之比较 (按设备渲染和时间线中的帧不经过 publish_dashboard)
+    etag = frame_history.add(png_bytes)
+    base_etag = body.etag.strip().removeprefix("W/")
+    state = telemetry_store.state(device.id)
+
+    if base_etag == etag:
+        result = "unchanged"
+        archive = pack_archive([f"etag {etag}", f"wakeup {wakeup_seconds}", "unchanged"])
+        partial_refreshes = state.partial_refreshes
+    else:
+        # 屏幕内容未知 (ETag 为空) 或已局刷足够次数时全刷，全刷必须下发整图；
+        # 基准帧不在历史中或变化过多时 build_sync_archive 也会下发整图，同样按全刷处理
+        full_due = not base_etag or state.partial_refreshes >= SYNC_FULL_REFRESH_EVERY
+        base_png = None if full_due else frame_history.get(base_etag)
+        loop = asyncio.get_running_loop()
+        with stage("delta"):
+            archive, full = await loop.run_in_executor(
+                postprocess_executor, build_sync_archive, base_png, png_bytes, wakeup_seconds
+            )
+        result = "full" if full else "partial"
+        partial_refreshes = 0 if full else state.partial_refreshes + 1
+
+    await telemetry_store.record(
+        replace(
+            state, last_seen=now.timestamp(), partial_refreshes=partial_refreshes,
+            battery=body.battery if body.battery is not None else state.battery
+        ),
+        result, wakeup_seconds
+    )
+    return Response(
+        content=archive,
+        media_type="application/x-tar",
+        headers={
+            "ETag": etag,
+            "Cache-Control": "no-store",
+            "X-Dashboard-Sync": result
+        }
+    )
+
+
+@app.get("/device/status")
+async def device_status(device: Optional[str] = None, limit: int = 100):
+    """设备遥测：所有设备最近一次同步的状态；指定 device 时返回该设备最近的同步记录"""
+    if device is None:
+        return {"devices": telemetry_store.states()}
+    history = await asyncio.to_thread(telemetry_store.history, device, max(1, min(limit, 1000)))
+    return {"device": device, "syncs": history}
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus 文本格式的指标 (阶段耗时直方图、上游错误、缓存命中、浏览器池状态)"""
+    if not METRICS_ENABLED:
+        return JSONResponse(status_code=404, content={"error": "Metrics are disabled"})
+    return Response(content=render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+
+@app.get("/dashboard/status")
+async def dashboard_status():
+    """预渲染状态：最近一次渲染时间、耗时和下一次计划时间，时间线中已渲染的唤醒，以及各上游的熔断状态"""
+    scheduler = get_scheduler()
+    timeline = get_timeline()
+    status = {"prerender": True, **scheduler.status()} if scheduler is not None else {"prerender": False}
+    status["timeline"] = timeline.status() if timeline is not None else None
+    status["upstreams"] = breaker_states()
+    return status
+
 
 @app.get("/preview")
 async def preview_dashboard():
@@ -95,9 +435,12 @@ async def preview_dashboard():
     返回渲染后的 HTML 页面，可在浏览器中查看
     """
     try:
-        weather = await get_weather_data(LOCATION)
-        news = get_news_data()
-        html_content = render_dashboard_html(weather, news)
+        weather, news = await asyncio.gather(
+            get_weather_data(LOCATION),
+            get_news_data()
+        )
+        with stage("template"):
+            html_content = render_dashboard_html(weather, news)
         
         return Response(
             content=html_content,
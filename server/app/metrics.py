@@ -0,0 +1,334 @@
+"""
+渲染流水线计时与 Prometheus 文本格式指标
+
+用 stage("名称") 包住流水线的各个阶段 (QWeather、RSS、Jinja、Chromium 启动/借页面、截图、
+Pillow、磁盘、R2)，耗时记入 dashboard_stage_seconds 直方图：
+
+    with stage("template"):
+        html = render_dashboard_html(...)
+
+HTTP 请求期间的阶段耗时还会汇总到当前请求的 trace 中，
+按配置写入 Server-Timing 响应头 (SERVER_TIMING_ENABLED) 和结构化日志 (TIMING_LOG_ENABLED)。
+三项都关闭时 stage() 直接返回空的 context manager，几乎没有额外开销。
+
+/metrics 返回 Prometheus 文本格式；缓存命中数、浏览器池空闲页面等状态通过 collect() 注册的回调在抓取时读取。
+不依赖 prometheus_client。
+"""
+
+import json
+import logging
+import threading
+import time
+from contextlib import nullcontext
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+from app.config import METRICS_ENABLED, SERVER_TIMING_ENABLED, TIMING_LOG_ENABLED
+
+logger = logging.getLogger(__name__)
+timing_logger = logging.getLogger("app.timing")
+
+# 秒；覆盖从缓存命中 (<1ms) 到 Chromium 冷启动 (数秒)
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# 是否需要按请求收集阶段耗时
+TRACING_ENABLED = SERVER_TIMING_ENABLED or TIMING_LOG_ENABLED
+
+LabelValues = tuple[str, ...]
+
+_INF_LABEL = 'le="+Inf"'
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """单调递增计数器"""
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Histogram(_Metric):
+    """累计分桶直方图 (单位：秒)"""
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label 值 -> [各桶计数..., 总次数, 总和]
+        self._values: dict[LabelValues, list[float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += 1
+            state[-1] += value
+
+    def count(self, **labels) -> int:
+        state = self._values.get(self._key(labels))
+        return int(state[-2]) if state else 0
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted((key, list(state)) for key, state in self._values.items())
+        lines = []
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {int(cumulative)}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, _INF_LABEL)} {int(state[-2])}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(state[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {int(state[-2])}")
+        return lines
+
+
+class _Collected(_Metric):
+    """抓取时调用回调读取的值；回调返回数值，或 label 值元组 -> 数值"""
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        fn: Callable[[], "float | dict[LabelValues, float]"],
+        kind: str,
+        labelnames: tuple[str, ...]
+    ):
+        super().__init__(name, help_text, labelnames)
+        self.kind = kind
+        self.fn = fn
+
+    def render(self) -> list[str]:
+        try:
+            value = self.fn()
+        except Exception as e:
+            logger.debug(f"Collecting {self.name} failed: {e!r}")
+            return []
+        items = value.items() if isinstance(value, dict) else [((), value)]
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in items]
+
+
+class MetricsRegistry:
+    """按注册顺序输出的指标集合"""
+
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric):
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def collect(
+        self,
+        name: str,
+        help_text: str,
+        fn: Callable[[], "float | dict[LabelValues, float]"],
+        kind: str = "gauge",
+        labelnames: tuple[str, ...] = ()
+    ) -> None:
+        """注册抓取时读取的 gauge (或由其他对象累计的 counter)"""
+        self._metrics[name] = _Collected(name, help_text, fn, kind, labelnames)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            body = metric.render()
+            if body:
+                lines.extend(metric.header())
+                lines.extend(body)
+        return "\n".join(lines) + "\n"
+
+
+# 全局指标
+registry = MetricsRegistry()
+
+stage_seconds = registry.histogram(
+    "dashboard_stage_seconds", "Duration of dashboard pipeline stages", ("stage",)
+)
+stage_errors = registry.counter(
+    "dashboard_stage_errors_total", "Pipeline stages that raised an exception", ("stage",)
+)
+upstream_requests = registry.counter(
+    "upstream_requests_total", "Upstream fetches by outcome (ok / error)", ("upstream", "outcome")
+)
+upstream_cache_lookups = registry.counter(
+    "upstream_cache_lookups_total", "Upstream cache lookups by result (fresh / stale / miss)", ("cache", "result")
+)
+http_request_seconds = registry.histogram(
+    "http_request_duration_seconds", "HTTP request duration", ("route", "status")
+)
+
+
+# 当前请求的阶段耗时 [(阶段, 秒)]；为 None 时不收集 (后台任务或未开启 tracing)
+_trace: ContextVar[Optional[list[tuple[str, float]]]] = ContextVar("dashboard_trace", default=None)
+
+
+class _Stage:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record_stage(self.name, time.perf_counter() - self.start, failed=exc_type is not None)
+        return False
+
+
+_NOOP = nullcontext()
+
+
+def stage(name: str):
+    """计时一个流水线阶段 (同步或 async 代码块均可)"""
+    if not (METRICS_ENABLED or TRACING_ENABLED):
+        return _NOOP
+    return _Stage(name)
+
+
+def record_stage(name: str, seconds: float, failed: bool = False) -> None:
+    """记录已测得的阶段耗时"""
+    stage_seconds.observe(seconds, stage=name)
+    if failed:
+        stage_errors.inc(stage=name)
+    trace = _trace.get()
+    if trace is not None:
+        trace.append((name, seconds))
+
+
+def start_trace():
+    """开始收集当前请求 (及其创建的子任务) 的阶段耗时，返回用于 end_trace 的 token"""
+    return _trace.set([])
+
+
+def end_trace(token) -> list[tuple[str, float]]:
+    trace = _trace.get() or []
+    _trace.reset(token)
+    return trace
+
+
+def summarize_trace(trace: list[tuple[str, float]]) -> dict[str, tuple[float, int]]:
+    """按阶段名合并：阶段 -> (总耗时秒数, 次数)，保持首次出现的顺序"""
+    summary: dict[str, tuple[float, int]] = {}
+    for name, seconds in trace:
+        total, count = summary.get(name, (0.0, 0))
+        summary[name] = (total + seconds, count + 1)
+    return summary
+
+
+def server_timing_header(trace: list[tuple[str, float]], total: float) -> str:
+    """格式化 Server-Timing 响应头 (并发执行的同名阶段耗时相加，desc 中注明次数)"""
+    parts = []
+    for name, (seconds, count) in summarize_trace(trace).items():
+        part = f"{name};dur={seconds * 1000:.1f}"
+        if count > 1:
+            part += f';desc="x{count}"'
+        parts.append(part)
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def log_timing(method: str, route: str, status: int, trace: list[tuple[str, float]], total: float) -> None:
+    """输出一行 JSON 结构化计时日志"""
+    timing_logger.info(json.dumps({
+        "method": method,
+        "route": route,
+        "status": status,
+        "total_ms": round(total * 1000, 1),
+        "stages": {
+            name: {"ms": round(seconds * 1000, 1), "count": count}
+            for name, (seconds, count) in summarize_trace(trace).items()
+        }
+    }, ensure_ascii=False))
+
+
+def observe_upstream(upstream: str, ok: bool) -> None:
+    upstream_requests.inc(upstream=upstream, outcome="ok" if ok else "error")
+
+
+def render_metrics() -> str:
+    """Prometheus 文本格式"""
+    return registry.render()
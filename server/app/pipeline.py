@@ -0,0 +1,115 @@
+"""
+仪表盘渲染流水线
+
+获取数据 -> 渲染 HTML -> 截图转灰度 PNG (或 Pillow 直接绘制) -> 保存/上传，供 HTTP 接口、后台调度和命令行共用
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from app.config import RENDERER, BROWSER_POOL_SIZE
+from app.devices import DEFAULT_DEVICE, DeviceConfig
+from app.services.weather import WeatherData, get_weather_data
+from app.services.news import NewsData, get_news_data
+from app.services.r2_storage import DASHBOARD_KEY, get_upload_queue, upload_dashboard_image
+from app.renderer.template import render_dashboard_html
+from app.renderer.screenshot import html_to_grayscale_png
+from app.renderer.pillow_renderer import render_dashboard_png_direct
+from app.delta import frame_history
+from app.metrics import stage
+
+logger = logging.getLogger(__name__)
+
+# 静态目录 (保存最近一次的 dashboard.png 供调试)
+STATIC_DIR = Path(__file__).parent.parent / "static"
+
+
+async def render_dashboard_png(device: DeviceConfig = DEFAULT_DEVICE, now: Optional[datetime] = None) -> bytes:
+    """获取天气和新闻 (并发)，按设备配置渲染并返回灰度 PNG"""
+    weather, news = await asyncio.gather(
+        get_weather_data(device.location, device.location_name),
+        get_news_data()
+    )
+    return await render_png(weather, news, device, now)
+
+
+async def render_png(
+    weather: WeatherData,
+    news: NewsData,
+    device: DeviceConfig = DEFAULT_DEVICE,
+    now: Optional[datetime] = None
+) -> bytes:
+    """按设备的尺寸、旋转和布局把数据渲染成灰度 PNG (now 为页眉显示的时间，提前渲染时为唤醒时间)"""
+    size = (device.width, device.height)
+    if RENDERER == "pillow":
+        if device.layout != "dashboard":
+            raise ValueError(f"The pillow renderer only draws the dashboard layout, not {device.layout!r}")
+        return await render_dashboard_png_direct(weather, news, size, device.rotation, now)
+    with stage("template"):
+        html_content = render_dashboard_html(
+            weather, news, now, width=device.width, height=device.height, layout=device.layout
+        )
+    return await html_to_grayscale_png(html_content, size=size, rotation=device.rotation)
+
+
+async def render_devices(devices: list[DeviceConfig]) -> dict[str, bytes]:
+    """
+    批量渲染多台设备，返回 设备 id -> PNG
+
+    每个位置只请求一次天气，新闻只请求一次；位置、尺寸、旋转和布局都相同的设备只渲染一次。
+    渲染并发数与浏览器池大小一致，避免超过池的排队上限。
+    """
+    locations = sorted({(device.location, device.location_name) for device in devices})
+    weather_list, news = await asyncio.gather(
+        asyncio.gather(*(get_weather_data(location, name) for location, name in locations)),
+        get_news_data()
+    )
+    weather_by_location = dict(zip(locations, weather_list))
+
+    groups: dict[tuple, list[DeviceConfig]] = {}
+    for device in devices:
+        groups.setdefault(device.render_group, []).append(device)
+
+    semaphore = asyncio.Semaphore(max(1, BROWSER_POOL_SIZE))
+
+    async def render_group(members: list[DeviceConfig]) -> bytes:
+        device = members[0]
+        async with semaphore:
+            return await render_png(weather_by_location[(device.location, device.location_name)], news, device)
+
+    results = await asyncio.gather(*(render_group(members) for members in groups.values()))
+    logger.info(f"Rendered {len(devices)} devices with {len(locations)} locations and {len(groups)} distinct images")
+    return {
+        device.id: png_bytes
+        for members, png_bytes in zip(groups.values(), results)
+        for device in members
+    }
+
+
+def save_static_copy(png_bytes: bytes) -> None:
+    """保存到静态目录供调试"""
+    try:
+        with stage("disk"):
+            STATIC_DIR.mkdir(parents=True, exist_ok=True)
+            with open(STATIC_DIR / "dashboard.png", "wb") as f:
+                f.write(png_bytes)
+    except Exception as e:
+        logger.error(f"Failed to save static dashboard image: {e}")
+
+
+async def publish_dashboard(png_bytes: bytes) -> None:
+    """
+    记录为局部刷新的历史帧，保存本地副本并上传到 Cloudflare R2 (如果配置了)
+
+    上传队列已启动时只加入队列，不等待对象存储。
+    """
+    frame_history.add(png_bytes)
+    await asyncio.to_thread(save_static_copy, png_bytes)
+    queue = get_upload_queue()
+    if queue is not None:
+        queue.submit(png_bytes, DASHBOARD_KEY, content_type="image/png", cache_control="max-age=60")
+    else:
+        await asyncio.to_thread(upload_dashboard_image, png_bytes)
@@ -0,0 +1,103 @@
+"""
+渲染请求合并与并发限制
+
+多台 Kindle 在同一分钟唤醒时，/dashboard 不应为每个请求各跑一遍完整流水线：
+- 相同 key (同一种输出) 的并发请求共享同一个渲染任务 (single-flight)
+- 不同 key 的渲染最多 max_concurrent 个同时进行，其余排队
+- 排队的渲染超过 max_queue 个时直接拒绝 (RenderOverloaded)，由接口返回 503 + Retry-After，
+  而不是继续启动 Chromium 耗尽内存
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+from app.config import RENDER_MAX_CONCURRENCY, RENDER_MAX_QUEUE, RENDER_RETRY_AFTER
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class RenderOverloaded(Exception):
+    """排队的渲染过多"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RenderGate:
+    """按 key 合并的渲染任务 + 全局并发上限"""
+
+    def __init__(
+        self,
+        max_concurrent: int = RENDER_MAX_CONCURRENCY,
+        max_queue: int = RENDER_MAX_QUEUE,
+        retry_after: int = RENDER_RETRY_AFTER
+    ):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.retry_after = retry_after
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+        self.active = 0
+        self.coalesced = 0
+        self.rejected = 0
+
+    @property
+    def queued(self) -> int:
+        """等待并发名额的渲染数"""
+        return len(self._inflight) - self.active
+
+    async def run(self, key: Hashable, render: Callable[[], Awaitable[T]]) -> T:
+        """
+        执行 render 并返回结果；key 相同的渲染正在进行时直接等待它的结果
+
+        Raises:
+            RenderOverloaded: 已有 max_concurrent + max_queue 个不同的渲染在进行或排队
+        """
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            if len(self._inflight) >= self.max_concurrent + self.max_queue:
+                self.rejected += 1
+                raise RenderOverloaded(
+                    f"{self.active} renders running and {self.queued} queued", self.retry_after
+                )
+            task = asyncio.create_task(self._run_limited(render))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._on_done(key, t))
+        # shield: 某个等待者断开连接时不取消共享的渲染
+        return await asyncio.shield(task)
+
+    async def _run_limited(self, render: Callable[[], Awaitable[T]]) -> T:
+        async with self._semaphore:
+            self.active += 1
+            try:
+                return await render()
+            finally:
+                self.active -= 1
+
+    def _on_done(self, key: Hashable, task: asyncio.Task) -> None:
+        self._inflight.pop(key, None)
+        # 所有等待者都已断开时异常无人取出，在这里记录
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug(f"Render {key!r} failed: {task.exception()!r}")
+
+
+# 全局渲染闸门
+render_gate = RenderGate()
+
+registry.collect("render_gate_active", "Renders currently running", lambda: render_gate.active)
+registry.collect("render_gate_queued", "Renders waiting for a render slot", lambda: render_gate.queued)
+registry.collect(
+    "render_gate_coalesced_total", "Requests that joined an in-flight render",
+    lambda: render_gate.coalesced, kind="counter"
+)
+registry.collect(
+    "render_gate_rejected_total", "Requests rejected with 503 because too many renders were queued",
+    lambda: render_gate.rejected, kind="counter"
+)
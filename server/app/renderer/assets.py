@@ -0,0 +1,98 @@
+"""
+本地渲染资源
+
+截图时通过 Playwright 请求拦截，把图标字体 CSS/字体文件和中文字体子集
+直接从内存返回，渲染过程不访问 CDN。资源文件由 build_fonts.py 生成到 app/assets。
+"""
+
+import logging
+import mimetypes
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+from urllib.parse import urlsplit
+
+from playwright.async_api import Route
+
+from app.config import RENDER_LOCAL_ASSETS, RENDER_BLOCK_EXTERNAL
+
+logger = logging.getLogger(__name__)
+
+ASSETS_DIR = Path(__file__).parent.parent / "assets"
+
+# 模板中引用的 CDN 图标字体地址 (浏览器直接打开 /preview 时仍从 CDN 加载)
+QWEATHER_ICONS_BASE_URL = "https://cdn.jsdelivr.net/npm/qweather-icons@1.4.0/font"
+
+# 中文字体子集只通过拦截提供，没有真实的网络地址
+FONT_BASE_URL = "https://kindle-dash.local/fonts"
+
+# URL 前缀 -> 本地目录
+ASSET_ROUTES = {
+    QWEATHER_ICONS_BASE_URL: ASSETS_DIR / "qweather-icons",
+    FONT_BASE_URL: ASSETS_DIR / "fonts",
+}
+
+_CONTENT_TYPES = {
+    ".css": "text/css; charset=utf-8",
+    ".woff2": "font/woff2",
+    ".woff": "font/woff",
+    ".ttf": "font/ttf",
+}
+
+
+@lru_cache(maxsize=1)
+def load_assets() -> dict[str, tuple[bytes, str]]:
+    """读取所有本地资源到内存: URL -> (内容, Content-Type)"""
+    assets = {}
+    for base_url, directory in ASSET_ROUTES.items():
+        if not directory.is_dir():
+            logger.warning(f"Local assets for {base_url} not found in {directory}, run build_fonts.py")
+            continue
+        for path in directory.rglob("*"):
+            if path.is_file():
+                url = f"{base_url}/{path.relative_to(directory).as_posix()}"
+                content_type = _CONTENT_TYPES.get(path.suffix) or mimetypes.guess_type(path.name)[0]
+                assets[url] = (path.read_bytes(), content_type or "application/octet-stream")
+    logger.info(f"Loaded {len(assets)} local render assets")
+    return assets
+
+
+def lookup_asset(url: str) -> Optional[tuple[bytes, str]]:
+    """按 URL 查找本地资源 (忽略查询参数，例如字体文件的 ?v=hash)"""
+    parts = urlsplit(url)
+    return load_assets().get(f"{parts.scheme}://{parts.netloc}{parts.path}")
+
+
+async def _handle_route(route: Route) -> None:
+    url = route.request.url
+    asset = lookup_asset(url)
+    if asset is not None:
+        body, content_type = asset
+        await route.fulfill(
+            status=200,
+            body=body,
+            headers={
+                "Content-Type": content_type,
+                "Access-Control-Allow-Origin": "*",
+            }
+        )
+    elif RENDER_BLOCK_EXTERNAL and url.startswith(("http://", "https://")):
+        logger.warning(f"Blocked external request during render: {url}")
+        await route.abort("blockedbyclient")
+    else:
+        await route.continue_()
+
+
+async def install_asset_routes(target, local_assets: bool = RENDER_LOCAL_ASSETS) -> None:
+    """
+    在页面或浏览器上下文上安装资源拦截
+
+    Args:
+        target: Playwright Page 或 BrowserContext
+        local_assets: 是否从内存返回本地资源
+    """
+    if local_assets:
+        load_assets()
+        await target.route("**/*", _handle_route)
+    elif RENDER_BLOCK_EXTERNAL:
+        logger.warning("RENDER_BLOCK_EXTERNAL has no effect while local assets are disabled")
@@ -0,0 +1,265 @@
+"""
+Chromium 浏览器池
+
+随 FastAPI lifespan 启动一个常驻 Chromium，预热 N 个页面 (默认 800x600)，
+渲染时从池中借出页面，用完归还。页面渲染 K 次或出错后自动回收重建。
+借出时优先选择视口尺寸相同的空闲页面，多种屏幕尺寸共用一个池时各自保持预热的页面。
+"""
+
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Optional
+
+from playwright.async_api import Browser, BrowserContext, Page, Playwright, async_playwright
+
+from app.config import (
+    SCREEN_WIDTH,
+    SCREEN_HEIGHT,
+    BROWSER_POOL_SIZE,
+    BROWSER_PAGE_MAX_RENDERS,
+    BROWSER_POOL_MAX_WAITERS,
+    BROWSER_POOL_ACQUIRE_TIMEOUT,
+    RENDER_LOCAL_ASSETS
+)
+from app.renderer.assets import install_asset_routes
+from app.metrics import registry, stage
+
+logger = logging.getLogger(__name__)
+
+
+class BrowserPoolBusy(Exception):
+    """等待页面的渲染请求过多或等待超时"""
+
+
+@dataclass
+class PooledPage:
+    """池中的一个预热页面"""
+    context: BrowserContext
+    page: Page
+    viewport: dict        # 当前视口尺寸
+    renders: int = 0      # 已完成的渲染次数
+
+
+class BrowserPool:
+    """常驻 Chromium 页面池"""
+
+    def __init__(
+        self,
+        size: int = BROWSER_POOL_SIZE,
+        max_renders: int = BROWSER_PAGE_MAX_RENDERS,
+        max_waiters: int = BROWSER_POOL_MAX_WAITERS,
+        acquire_timeout: float = BROWSER_POOL_ACQUIRE_TIMEOUT,
+        viewport: Optional[dict] = None,
+        local_assets: bool = RENDER_LOCAL_ASSETS,
+        viewports: Optional[list[dict]] = None
+    ):
+        self.size = max(1, size)
+        self.max_renders = max(1, max_renders)
+        self.max_waiters = max(0, max_waiters)
+        self.acquire_timeout = acquire_timeout
+        self.viewport = viewport or {"width": SCREEN_WIDTH, "height": SCREEN_HEIGHT}
+        # 预热时轮流使用的视口尺寸 (默认只有 viewport)
+        self.viewports = viewports or [self.viewport]
+        self.local_assets = local_assets
+
+        self._playwright: Optional[Playwright] = None
+        self._browser: Optional[Browser] = None
+        self._idle: deque[PooledPage] = deque()
+        self._available = asyncio.Semaphore(0)
+        self._waiters = 0
+        self._browser_lock = asyncio.Lock()
+        self._closed = True
+
+    @property
+    def started(self) -> bool:
+        return not self._closed
+
+    @property
+    def idle_count(self) -> int:
+        return len(self._idle)
+
+    @property
+    def waiting_count(self) -> int:
+        return self._waiters
+
+    async def start(self) -> None:
+        """启动 Chromium 并预热所有页面"""
+        if self.started:
+            return
+        self._playwright = await async_playwright().start()
+        self._closed = False
+        try:
+            with stage("browser.launch"):
+                self._browser = await self._playwright.chromium.launch()
+            for i in range(self.size):
+                self._put_idle(await self._new_page(self.viewports[i % len(self.viewports)]))
+        except Exception:
+            await self.stop()
+            raise
+        logger.info(f"Browser pool started with {self.size} warm pages")
+
+    async def stop(self) -> None:
+        """关闭所有页面、浏览器和 Playwright"""
+        if not self.started:
+            return
+        self._closed = True
+        while self._idle:
+            await self._close_page(self._idle.popleft())
+        self._available = asyncio.Semaphore(0)
+        if self._browser is not None:
+            try:
+                await self._browser.close()
+            except Exception as e:
+                logger.warning(f"Failed to close browser: {e}")
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+        logger.info("Browser pool stopped")
+
+    @asynccontextmanager
+    async def page(self, viewport: Optional[dict] = None):
+        """
+        借出一个预热页面，并确保其视口为 viewport (默认池的视口)
+
+        页面在块内抛出异常或被取消 (客户端断开、闸门超时，导航可能只进行了一半) 时视为已损坏，
+        会被关闭并重建；正常归还时累计渲染次数，达到上限同样回收。
+        """
+        viewport = viewport or self.viewport
+        with stage("browser.acquire"):
+            pooled = await self._acquire(viewport)
+        healthy = True
+        try:
+            yield pooled.page
+        except BaseException:
+            healthy = False
+            raise
+        finally:
+            pooled.renders += 1
+            # shield: 归还过程中再次被取消时仍完成重建，不丢失槽位
+            await asyncio.shield(self._release(pooled, healthy))
+
+    async def _acquire(self, viewport: dict) -> PooledPage:
+        if not self.started:
+            raise RuntimeError("Browser pool is not started")
+        if not self._idle and self._waiters >= self.max_waiters:
+            raise BrowserPoolBusy(f"{self._waiters} renders already waiting for a page")
+
+        self._waiters += 1
+        try:
+            await asyncio.wait_for(self._available.acquire(), timeout=self.acquire_timeout)
+        except asyncio.TimeoutError:
+            raise BrowserPoolBusy(f"No page available within {self.acquire_timeout}s") from None
+        finally:
+            self._waiters -= 1
+
+        pooled = self._take_idle(viewport)
+        if pooled.viewport != viewport:
+            try:
+                await pooled.page.set_viewport_size(viewport)
+            except BaseException:
+                await asyncio.shield(self._release(pooled, healthy=False))
+                raise
+            pooled.viewport = viewport
+        return pooled
+
+    def _take_idle(self, viewport: dict) -> PooledPage:
+        """优先取最近用过的同尺寸页面，否则取最久未用的页面"""
+        for pooled in reversed(self._idle):
+            if pooled.viewport == viewport:
+                self._idle.remove(pooled)
+                return pooled
+        return self._idle.popleft()
+
+    def _put_idle(self, pooled: PooledPage) -> None:
+        self._idle.append(pooled)
+        self._available.release()
+
+    async def _release(self, pooled: PooledPage, healthy: bool) -> None:
+        if self._closed:
+            await self._close_page(pooled)
+            return
+        if healthy and pooled.renders < self.max_renders and not pooled.page.is_closed():
+            self._put_idle(pooled)
+            return
+
+        logger.info(f"Recycling page after {pooled.renders} renders (healthy={healthy})")
+        await self._close_page(pooled)
+        try:
+            self._put_idle(await self._new_page(pooled.viewport))
+        except Exception as e:
+            # 重建失败时不丢失槽位：稍后在后台重试
+            logger.error(f"Failed to recreate pooled page: {e}")
+            asyncio.get_running_loop().call_later(1.0, self._schedule_refill, pooled.viewport)
+
+    def _schedule_refill(self, viewport: dict) -> None:
+        if not self._closed:
+            asyncio.ensure_future(self._refill(viewport))
+
+    async def _refill(self, viewport: dict) -> None:
+        """重建槽位，保留被替换页面的视口，常用机型的页面仍然无需调整视口"""
+        try:
+            self._put_idle(await self._new_page(viewport))
+        except Exception as e:
+            logger.error(f"Failed to refill browser pool: {e}")
+            asyncio.get_running_loop().call_later(5.0, self._schedule_refill, viewport)
+
+    async def _new_page(self, viewport: Optional[dict] = None) -> PooledPage:
+        viewport = viewport or self.viewport
+        browser = await self._ensure_browser()
+        context = await browser.new_context(viewport=viewport)
+        await install_asset_routes(context, self.local_assets)
+        page = await context.new_page()
+        return PooledPage(context=context, page=page, viewport=viewport)
+
+    async def _ensure_browser(self) -> Browser:
+        """浏览器崩溃断开后重新启动"""
+        async with self._browser_lock:
+            if self._browser is None or not self._browser.is_connected():
+                logger.warning("Browser disconnected, relaunching Chromium")
+                with stage("browser.launch"):
+                    self._browser = await self._playwright.chromium.launch()
+            return self._browser
+
+    @staticmethod
+    async def _close_page(pooled: PooledPage) -> None:
+        try:
+            await pooled.context.close()
+        except Exception as e:
+            logger.debug(f"Ignoring error while closing page: {e}")
+
+
+# 全局浏览器池，由 app lifespan 启动和关闭
+_pool: Optional[BrowserPool] = None
+
+
+def get_browser_pool() -> Optional[BrowserPool]:
+    """获取已启动的全局浏览器池 (未启动时返回 None)"""
+    if _pool is not None and _pool.started:
+        return _pool
+    return None
+
+
+async def start_browser_pool(**kwargs) -> BrowserPool:
+    """启动全局浏览器池"""
+    global _pool
+    if _pool is None:
+        _pool = BrowserPool(**kwargs)
+    await _pool.start()
+    return _pool
+
+
+async def stop_browser_pool() -> None:
+    """关闭全局浏览器池"""
+    global _pool
+    if _pool is not None:
+        await _pool.stop()
+        _pool = None
+
+
+registry.collect("browser_pool_size", "Warm pages in the browser pool", lambda: _pool.size if get_browser_pool() else 0)
+registry.collect("browser_pool_idle_pages", "Idle pages in the browser pool", lambda: _pool.idle_count if get_browser_pool() else 0)
+registry.collect("browser_pool_waiters", "Renders waiting for a pooled page", lambda: _pool.waiting_count if get_browser_pool() else 0)
@@ -0,0 +1,72 @@
+"""
+16 级灰度量化
+
+Kindle 屏幕只有 16 级灰度，直接截断 ((x // 16) * 17) 会在图标和抗锯齿的中文笔画上产生色带。
+可选的量化方式 (均使用 Pillow 原生操作，不依赖 NumPy)：
+- posterize:       直接截断为 16 级 (默认，与原流程一致)
+- bayer:           4x4 有序抖动，先叠加 Bayer 阈值矩阵再截断
+- floyd-steinberg: 误差扩散，使用 Pillow 的调色板量化
+"""
+
+from functools import lru_cache
+
+from PIL import Image, ImageChops
+
+DITHER_MODES = ("posterize", "bayer", "floyd-steinberg")
+
+# 将 256 级灰度压缩至 16 级 (4-bit), 匹配 Kindle 硬件
+# 映射公式：(x // 16) * 17 确保 0->0, 255->255，且只有 16 个阶梯
+QUANTIZE_LUT = [(value // 16) * 17 for value in range(256)]
+
+# 4x4 Bayer 矩阵 (0-15)
+_BAYER_4X4 = (
+    0, 8, 2, 10,
+    12, 4, 14, 6,
+    3, 11, 1, 9,
+    15, 7, 13, 5,
+)
+# 缩放到一个输出阶梯 (17) 内的均匀阈值
+_BAYER_THRESHOLDS = bytes(int((b + 0.5) * 17 / 16) for b in _BAYER_4X4)
+
+# 有序抖动叠加阈值后按 17 截断到相邻的下一级，平均亮度与原图一致
+_FLOOR_LUT = [(value // 17) * 17 for value in range(256)]
+
+
+@lru_cache(maxsize=4)
+def _bayer_tile(size: tuple[int, int]) -> Image.Image:
+    """将 4x4 Bayer 阈值矩阵平铺成指定尺寸的 L 图"""
+    cell = Image.frombytes("L", (4, 4), _BAYER_THRESHOLDS)
+    row = Image.new("L", (size[0] + 3, 4))
+    for x in range(0, size[0], 4):
+        row.paste(cell, (x, 0))
+    tile = Image.new("L", (size[0] + 3, size[1] + 3))
+    for y in range(0, size[1], 4):
+        tile.paste(row, (0, y))
+    return tile.crop((0, 0, *size))
+
+
+@lru_cache(maxsize=1)
+def _gray16_palette() -> Image.Image:
+    """16 级灰阶调色板 (0, 17, ..., 255)"""
+    palette = Image.new("P", (1, 1))
+    palette.putpalette([channel for i in range(16) for channel in (i * 17,) * 3])
+    return palette
+
+
+def dither(img: Image.Image, mode: str = "posterize") -> Image.Image:
+    """
+    将 L 模式图片量化为 16 级灰度 (0, 17, ..., 255)
+
+    Args:
+        img: L 模式图片
+        mode: 量化方式，见 DITHER_MODES
+    """
+    if mode == "posterize":
+        return img.point(QUANTIZE_LUT)
+    if mode == "bayer":
+        return ImageChops.add(img, _bayer_tile(img.size)).point(_FLOOR_LUT)
+    if mode == "floyd-steinberg":
+        # L 模式直接按调色板量化时 Pillow 会把灰度值当作调色板索引，需先转为 RGB
+        rgb = img.convert("RGB")
+        return rgb.quantize(palette=_gray16_palette(), dither=Image.Dither.FLOYDSTEINBERG).convert("L")
+    raise ValueError(f"Unknown dither mode {mode!r}, expected one of {DITHER_MODES}")
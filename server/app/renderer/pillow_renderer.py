@@ -0,0 +1,330 @@
+"""
+Pillow 直接渲染
+
+不启动浏览器，按 templates/dashboard.html 的布局 (默认 800x600：顶部日期栏、左侧天气栏、右侧新闻栏)
+用 Pillow ImageDraw + FreeType 直接绘制，尺寸、字号、颜色与模板 CSS 保持一致。
+与 Chromium 截图的差异可用 benchmarks/renderer_diff.py 检查。
+"""
+
+import asyncio
+import logging
+import re
+from datetime import datetime
+from functools import lru_cache, partial
+from typing import Optional
+
+from PIL import Image, ImageDraw, ImageFont
+
+from app.config import SCREEN_WIDTH, SCREEN_HEIGHT, PILLOW_FONT_REGULAR, PILLOW_FONT_BOLD
+from app.services.weather import WeatherData
+from app.services.news import NewsData
+from app.renderer.assets import ASSETS_DIR
+from app.renderer.screenshot import postprocess_image, postprocess_executor
+from app.renderer.template import CHINA_TZ, format_header, format_stale_note
+from app.metrics import stage
+
+logger = logging.getLogger(__name__)
+
+# 模板中用到的颜色 (灰度值)
+BLACK = 0
+GRAY_333 = 0x33
+GRAY_666 = 0x66
+GRAY_888 = 0x88
+GRAY_999 = 0x99
+GRAY_CCC = 0xCC
+GRAY_F0 = 0xF0
+WHITE = 255
+
+ICONS_DIR = ASSETS_DIR / "qweather-icons"
+FontType = ImageFont.FreeTypeFont | ImageFont.ImageFont
+
+
+@lru_cache(maxsize=8)
+def _ttc_index(path: str) -> int:
+    """在 Noto Sans CJK 字体集合中找到简体中文 (SC) 字体的序号"""
+    index = 0
+    while True:
+        try:
+            family, _ = ImageFont.truetype(path, 12, index=index).getname()
+        except OSError:
+            return 0
+        if family and "SC" in family.split() and "Mono" not in family:
+            return index
+        index += 1
+
+
+@lru_cache(maxsize=64)
+def _font(path: str, size: int) -> FontType:
+    index = _ttc_index(path) if path.lower().endswith(".ttc") else 0
+    try:
+        return ImageFont.truetype(path, size, index=index)
+    except OSError:
+        logger.warning(f"Font {path} not available, using Pillow default font")
+        return ImageFont.load_default(size)
+
+
+def regular(size: int) -> FontType:
+    return _font(PILLOW_FONT_REGULAR, size)
+
+
+def bold(size: int) -> FontType:
+    return _font(PILLOW_FONT_BOLD, size)
+
+
+@lru_cache(maxsize=1)
+def _icon_codepoints() -> dict[str, str]:
+    """从 qweather-icons.css 解析 图标代码 -> 字形 (.qi-100::before { content: "\\f101"; })"""
+    css_path = ICONS_DIR / "qweather-icons.css"
+    if not css_path.exists():
+        logger.warning(f"{css_path} not found, run build_fonts.py; weather icons will be blank")
+        return {}
+    css = css_path.read_text(encoding="utf-8")
+    pattern = re.compile(r'\.qi-([\w-]+)::?before\s*\{\s*content:\s*"\\([0-9a-fA-F]+)"')
+    return {code: chr(int(hex_value, 16)) for code, hex_value in pattern.findall(css)}
+
+
+def icon(size: int) -> Optional[FontType]:
+    for name in ("qweather-icons.ttf", "qweather-icons.woff"):
+        for path in ICONS_DIR.rglob(name):
+            return _font(str(path), size)
+    return None
+
+
+def line_height(font: FontType, factor: Optional[float] = None) -> float:
+    """CSS line-height：normal 取字体 ascent + descent，否则为 字号 x 系数"""
+    if factor is not None:
+        return font.size * factor
+    ascent, descent = font.getmetrics()
+    return ascent + descent
+
+
+class Canvas:
+    """带 CSS 风格辅助方法的 ImageDraw 包装"""
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.image = Image.new("L", (width, height), WHITE)
+        self.draw = ImageDraw.Draw(self.image)
+
+    def text_line(self, x: float, top: float, text: str, font: FontType, fill: int = BLACK,
+                  lh: Optional[float] = None, align: str = "left") -> float:
+        """在行框 [top, top + lh) 中绘制单行文字 (垂直居中于行框)，返回行高"""
+        lh = lh if lh is not None else line_height(font)
+        ascent, descent = font.getmetrics()
+        baseline = top + (lh - (ascent + descent)) / 2 + ascent
+        anchor = {"left": "ls", "center": "ms", "right": "rs"}[align]
+        self.draw.text((x, baseline), text, font=font, fill=fill, anchor=anchor)
+        return lh
+
+    def hline(self, x0: float, x1: float, y: float, width: int = 1, fill: int = BLACK) -> None:
+        self.draw.rectangle([x0, y, x1 - 1, y + width - 1], fill=fill)
+
+    def vline(self, x: float, y0: float, y1: float, width: int = 1, fill: int = BLACK) -> None:
+        self.draw.rectangle([x, y0, x + width - 1, y1 - 1], fill=fill)
+
+    def dotted_hline(self, x0: float, x1: float, y: float, fill: int) -> None:
+        for x in range(int(x0), int(x1), 2):
+            self.draw.point((x, y), fill=fill)
+
+
+def wrap_break_all(text: str, font: FontType, width: float, first_indent: float = 0) -> list[str]:
+    """按字符折行 (CSS word-break: break-all)，首行可预留缩进"""
+    lines: list[str] = []
+    current = ""
+    available = width - first_indent
+    for char in text:
+        if current and font.getlength(current + char) > available:
+            lines.append(current)
+            current = char
+            available = width
+        else:
+            current += char
+    if current or not lines:
+        lines.append(current)
+    return lines
+
+
+def _draw_header(canvas: Canvas, date_str: str, update_time: str, stale_note: str = "") -> float:
+    """顶部日期栏 (padding 12px 20px，底部 2px 边框)，返回主内容区顶部 y"""
+    date_font = bold(22)
+    lh = line_height(date_font)
+    canvas.text_line(20, 12, date_str, date_font, lh=lh)
+    # align-items: center
+    time_font = regular(14)
+    time_lh = line_height(time_font)
+    time_top = 12 + (lh - time_lh) / 2
+    time_text = f"{update_time} 更新"
+    canvas.text_line(canvas.width - 20, time_top, time_text, time_font,
+                     fill=GRAY_333, lh=time_lh, align="right")
+    if stale_note:
+        # 带边框的旧数据提示，位于更新时间左侧 (margin-right 8px，padding 0 4px)
+        note_font = bold(14)
+        right = canvas.width - 20 - time_font.getlength(time_text) - 8
+        left = right - note_font.getlength(stale_note) - 8
+        canvas.draw.rectangle((left, time_top, right, time_top + time_lh), outline=BLACK, width=1)
+        canvas.text_line(left + 4, time_top, stale_note, note_font, lh=time_lh)
+    border_top = round(12 + lh + 12)
+    canvas.hline(0, canvas.width, border_top, width=2)
+    return border_top + 2
+
+
+def _draw_icon(canvas: Canvas, cx: float, top: float, code: str, size: int) -> float:
+    """绘制天气图标 (qweather-icons 字形)，返回行高"""
+    font = icon(size)
+    glyph = _icon_codepoints().get(code)
+    if font is None:
+        return size * 1.2
+    lh = line_height(font)
+    if glyph:
+        canvas.text_line(cx, top, glyph, font, lh=lh, align="center")
+    return lh
+
+
+def _draw_weather_panel(canvas: Canvas, weather: WeatherData, top: float) -> None:
+    """左侧天气栏 (宽 280px，padding 12px 15px，右侧 2px 边框)"""
+    panel_width = 280
+    canvas.vline(panel_width - 2, top, canvas.height, width=2)
+    left, right = 15, panel_width - 2 - 15
+    cx = (left + right) / 2
+    y = top + 12
+
+    current = weather.current
+    # 图标 / 天气 / 温度
+    y += 2
+    y += _draw_icon(canvas, cx, y, current.icon, 72) + 2
+    y += canvas.text_line(cx, y, current.text, bold(18), align="center")
+    y += 2
+    y += canvas.text_line(cx, y, f"{current.temp}°", bold(52), align="center")
+    y += 5
+
+    # 风力 / 体感 / AQI (14px, line-height 1.4)
+    details_font = regular(14)
+    details_lh = line_height(details_font, 1.4)
+    y += canvas.text_line(cx, y, f"{current.wind_dir}{current.wind_scale}级 | 体感 {current.feels_like}°C",
+                          details_font, lh=details_lh, align="center")
+    y += 2
+    air = weather.air
+    aqi_text = f"AQI {air.aqi if air else 'N/A'} {air.category if air else ''}"
+    y += canvas.text_line(cx, y, aqi_text, details_font, lh=details_lh, align="center")
+    y += 2 + 5
+
+    # 分隔线
+    y += 5
+    canvas.hline(left, right, y, fill=GRAY_666)
+    y += 1 + 5
+
+    # 降水预报 (13px，灰底圆角，padding 5px)
+    rain_font = regular(13)
+    rain_lh = line_height(rain_font)
+    rain_text = weather.minutely.summary if weather.minutely else "降水信息暂无"
+    rain_lines = wrap_break_all(rain_text, rain_font, right - left - 10)
+    box_height = 10 + rain_lh * len(rain_lines)
+    canvas.draw.rounded_rectangle([left, y, right - 1, y + box_height - 1], radius=4, fill=GRAY_F0)
+    line_y = y + 5
+    for line in rain_lines:
+        line_y += canvas.text_line(cx, line_y, line, rain_font, lh=rain_lh, align="center")
+    y += box_height
+
+    # 分隔线
+    y += 5
+    canvas.hline(left, right, y, fill=GRAY_666)
+    y += 1 + 5
+
+    # 位置 / 观测时间
+    y += canvas.text_line(cx, y, f"{weather.location_name} · {current.obs_time} 观测 · 未来三天",
+                          bold(12), fill=GRAY_888, align="center")
+    y += 5
+
+    # 三日预报
+    y += 5
+    days = weather.daily[:3]
+    column_width = (right - left) / 3
+    for i, day in enumerate(days):
+        col_cx = left + column_width * i + column_width / 2
+        col_y = y
+        col_y += canvas.text_line(col_cx, col_y, day.date, regular(12), fill=GRAY_333, align="center") + 3
+        col_y += 3
+        col_y += _draw_icon(canvas, col_cx, col_y, day.icon_day, 28) + 3
+        col_y += canvas.text_line(col_cx, col_y, day.text_day, bold(12), align="center") + 5
+        canvas.text_line(col_cx, col_y, f"{day.temp_min}-{day.temp_max}°", bold(13), align="center")
+
+
+def _draw_news_panel(canvas: Canvas, news: NewsData, top: float) -> None:
+    """右侧新闻栏 (padding 15px 20px)"""
+    left, right = 280 + 20, canvas.width - 20
+    y = top + 15
+    title_font = bold(16)
+    item_font = regular(14)
+    bullet_font = bold(14)
+    item_lh = line_height(item_font, 1.4)
+    bullet = "· "
+    bullet_width = bullet_font.getlength(bullet)
+
+    sections = [("【国内新闻】", news.domestic), ("【国际新闻】", news.international)]
+    for section_index, (title, items) in enumerate(sections):
+        # 标题：padding-bottom 5px + 1px #999 底边框 + margin-bottom 10px
+        y += canvas.text_line(left, y, title, title_font)
+        y += 5
+        canvas.hline(left, right, y, fill=GRAY_999)
+        y += 1 + 10
+
+        for item_index, item in enumerate(items):
+            y += 5
+            lines = wrap_break_all(item.title, item_font, right - left, first_indent=bullet_width)
+            for line_index, line in enumerate(lines):
+                x = left
+                if line_index == 0:
+                    canvas.text_line(left, y, bullet, bullet_font, lh=item_lh)
+                    x += bullet_width
+                y += canvas.text_line(x, y, line, item_font, lh=item_lh)
+            y += 5
+            if item_index < len(items) - 1:
+                canvas.dotted_hline(left, right, y, fill=GRAY_CCC)
+                y += 1
+
+        if section_index < len(sections) - 1:
+            y += 15
+
+
+def draw_dashboard(
+    weather: WeatherData,
+    news: NewsData,
+    now: Optional[datetime] = None,
+    size: tuple[int, int] = (SCREEN_WIDTH, SCREEN_HEIGHT)
+) -> Image.Image:
+    """绘制横屏仪表盘 (L 模式，默认 800x600)"""
+    now = now or datetime.now(CHINA_TZ)
+    date_str, update_time = format_header(now)
+    canvas = Canvas(*size)
+    main_top = _draw_header(canvas, date_str, update_time, format_stale_note(weather, news, now))
+    _draw_weather_panel(canvas, weather, main_top)
+    _draw_news_panel(canvas, news, main_top)
+    return canvas.image
+
+
+def render_dashboard_png_sync(
+    weather: WeatherData,
+    news: NewsData,
+    now: Optional[datetime] = None,
+    size: tuple[int, int] = (SCREEN_WIDTH, SCREEN_HEIGHT),
+    rotation: int = 90
+) -> bytes:
+    """绘制并后处理为 Kindle PNG"""
+    return postprocess_image(draw_dashboard(weather, news, now, size), rotation=rotation)
+
+
+async def render_dashboard_png_direct(
+    weather: WeatherData,
+    news: NewsData,
+    size: tuple[int, int] = (SCREEN_WIDTH, SCREEN_HEIGHT),
+    rotation: int = 90,
+    now: Optional[datetime] = None
+) -> bytes:
+    """在后处理线程池中绘制，不阻塞事件循环 (now 为页眉显示的时间，默认当前时间)"""
+    loop = asyncio.get_running_loop()
+    with stage("pillow.render"):
+        return await loop.run_in_executor(
+            postprocess_executor,
+            partial(render_dashboard_png_sync, weather, news, now, size=size, rotation=rotation)
+        )
@@ -0,0 +1,97 @@
+"""
+Kindle PNG 编码
+
+后处理后的图片只有 16 级灰度，可以用 4 bit 像素存储：
+- gray8:    8 位灰度 (Pillow 编码，兼容性最好)
+- gray4:    4 位灰度 (color type 0, bit depth 4)
+- palette4: 4 位调色板 (color type 3, 16 级灰阶调色板)
+
+Pillow 不能直接输出 4 位灰度 PNG，这里自行写出 PNG 数据块：
+像素先按 P;4 打包 (每字节两个像素)，每行使用 None 滤波 (低位深图片推荐)，
+再按指定的 zlib 压缩级别和策略压缩。扁平色块和文字用 Z_RLE 往往又快又小。
+"""
+
+import struct
+import zlib
+from io import BytesIO
+
+from PIL import Image
+
+PNG_MODES = ("gray8", "gray4", "palette4")
+
+ZLIB_STRATEGIES = {
+    "default": zlib.Z_DEFAULT_STRATEGY,
+    "filtered": zlib.Z_FILTERED,
+    "huffman": zlib.Z_HUFFMAN_ONLY,
+    "rle": zlib.Z_RLE,
+    "fixed": zlib.Z_FIXED,
+}
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# 16 级灰度 (0, 17, ..., 255) -> 4 位索引 0-15，非 17 倍数的值取最近的一级
+_NIBBLE_LUT = [(value + 8) // 17 for value in range(256)]
+
+# palette4 的调色板：索引 i 对应灰度 i * 17
+_GRAY16_PALETTE = bytes(channel for i in range(16) for channel in (i * 17,) * 3)
+
+
+def _chunk(chunk_type: bytes, data: bytes) -> bytes:
+    return (
+        struct.pack(">I", len(data))
+        + chunk_type
+        + data
+        + struct.pack(">I", zlib.crc32(data, zlib.crc32(chunk_type)))
+    )
+
+
+def _encode_4bit(img: Image.Image, palette: bool, level: int, strategy: int) -> bytes:
+    width, height = img.size
+    nibbles = img.point(_NIBBLE_LUT)
+    # 以 P 模式借用 Pillow 的 P;4 打包器 (每行按字节对齐)
+    packed = Image.frombytes("P", img.size, nibbles.tobytes()).tobytes("raw", "P;4")
+    stride = (width + 1) // 2
+
+    # 每行前加滤波类型字节 0 (None)
+    compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS, 9, strategy)
+    idat = bytearray()
+    for row in range(height):
+        idat += compressor.compress(b"\x00" + packed[row * stride:(row + 1) * stride])
+    idat += compressor.flush()
+
+    color_type = 3 if palette else 0
+    ihdr = struct.pack(">IIBBBBB", width, height, 4, color_type, 0, 0, 0)
+    parts = [_PNG_SIGNATURE, _chunk(b"IHDR", ihdr)]
+    if palette:
+        parts.append(_chunk(b"PLTE", _GRAY16_PALETTE))
+    parts.append(_chunk(b"IDAT", bytes(idat)))
+    parts.append(_chunk(b"IEND", b""))
+    return b"".join(parts)
+
+
+def encode_png(
+    img: Image.Image,
+    mode: str = "gray8",
+    compress_level: int = 9,
+    strategy: str = "filtered"
+) -> bytes:
+    """
+    将 16 级灰度的 L 模式图片编码为 PNG
+
+    Args:
+        img: L 模式图片 (像素值应为 17 的倍数)
+        mode: 输出格式，见 PNG_MODES
+        compress_level: zlib 压缩级别 0-9
+        strategy: zlib 压缩策略，见 ZLIB_STRATEGIES
+                  (filtered 是 Pillow 保存 PNG 的默认策略，gray8 + 9 + filtered 与 optimize=True 完全一致)
+    """
+    if mode not in PNG_MODES:
+        raise ValueError(f"Unknown PNG mode {mode!r}, expected one of {PNG_MODES}")
+    if strategy not in ZLIB_STRATEGIES:
+        raise ValueError(f"Unknown zlib strategy {strategy!r}, expected one of {tuple(ZLIB_STRATEGIES)}")
+
+    if mode == "gray8":
+        output = BytesIO()
+        img.save(output, format="PNG", compress_level=compress_level, compress_type=ZLIB_STRATEGIES[strategy])
+        return output.getvalue()
+    return _encode_4bit(img, mode == "palette4", compress_level, ZLIB_STRATEGIES[strategy])
@@ -0,0 +1,83 @@
+"""
+渲染结果缓存
+
+以渲染后 HTML (及输出参数) 的 SHA-256 为 key 缓存最终的灰度 PNG。
+天气、新闻、日期和分钟级更新时间都不变时 HTML 完全相同，无需再次启动浏览器截图。
+按 LRU 淘汰，同时限制条目数和总字节数。
+"""
+
+import hashlib
+from collections import OrderedDict
+from typing import Optional
+
+from app.config import RENDER_CACHE_MAX_ENTRIES, RENDER_CACHE_MAX_BYTES
+from app.metrics import registry
+
+
+def render_key(html_content: str, *variant: object) -> str:
+    """计算渲染缓存 key；variant 为影响输出的其他参数"""
+    digest = hashlib.sha256(html_content.encode("utf-8"))
+    for part in variant:
+        digest.update(b"\0")
+        digest.update(str(part).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class RenderCache:
+    """PNG 字节的 LRU 缓存"""
+
+    def __init__(self, max_entries: int = RENDER_CACHE_MAX_ENTRIES, max_bytes: int = RENDER_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._items: OrderedDict[str, bytes] = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._bytes
+
+    def get(self, key: str) -> Optional[bytes]:
+        png_bytes = self._items.get(key)
+        if png_bytes is None:
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return png_bytes
+
+    def put(self, key: str, png_bytes: bytes) -> None:
+        if not self.enabled or len(png_bytes) > self.max_bytes:
+            return
+        old = self._items.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old)
+        self._items[key] = png_bytes
+        self._bytes += len(png_bytes)
+        while len(self._items) > self.max_entries or self._bytes > self.max_bytes:
+            _, evicted = self._items.popitem(last=False)
+            self._bytes -= len(evicted)
+
+    def clear(self) -> None:
+        self._items.clear()
+        self._bytes = 0
+
+
+# 全局渲染缓存
+render_cache = RenderCache()
+
+registry.collect(
+    "render_cache_lookups_total", "Render cache lookups by result (hit / miss)",
+    lambda: {("hit",): render_cache.hits, ("miss",): render_cache.misses},
+    kind="counter", labelnames=("result",)
+)
+registry.collect("render_cache_entries", "PNGs held in the render cache", lambda: len(render_cache))
+registry.collect("render_cache_bytes", "Bytes held in the render cache", lambda: render_cache.total_bytes)
@@ -5,68 +5,255 @@ Playwright 截图服务
 """
 
 import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache, partial
 from io import BytesIO
-from PIL import Image
-from playwright.async_api import async_playwright
-from app.config import SCREEN_WIDTH, SCREEN_HEIGHT
+from PIL import Image, ImageStat
+from playwright.async_api import Page, async_playwright
+from app.config import (
+    SCREEN_WIDTH,
+    SCREEN_HEIGHT,
+    RENDER_READY_MODE,
+    RENDER_READY_TIMEOUT_MS,
+    POSTPROCESS_WORKERS,
+    PNG_OUTPUT_MODE,
+    PNG_COMPRESS_LEVEL,
+    PNG_COMPRESS_STRATEGY,
+    DITHER_MODE
+)
+from app.renderer.assets import install_asset_routes
+from app.renderer.browser_pool import get_browser_pool
+from app.renderer.render_cache import render_cache, render_key
+from app.renderer.png_encoder import encode_png
+from app.renderer.dither import QUANTIZE_LUT, dither
+from app.metrics import registry, stage
 
+logger = logging.getLogger(__name__)
 
-async def html_to_grayscale_png(html_content: str) -> bytes:
+# 在页面内等待真正影响画面的资源：样式表/图片加载 (load 事件)、
+# 字体加载、图片解码，以及模板在字体就绪后写入的 data-render-ready 标记。
+# 超过 timeoutMs 返回 false，由调用方照常截图。
+# 注意：set_content 复用同一个 window，因此标记必须放在 DOM 上而不是 window 全局变量上。
+_WAIT_FOR_READY_JS = """
+async (timeoutMs) => {
+    // 超时后置为 true，停止轮询，避免 rAF 循环留在池中的页面上
+    let done = false;
+    const nextFrame = () => new Promise(resolve => requestAnimationFrame(() => resolve()));
+    const ready = (async () => {
+        if (document.readyState !== "complete") {
+            await new Promise(resolve => window.addEventListener("load", resolve, { once: true }));
+        }
+        void document.body.offsetHeight;
+        await document.fonts.ready;
+        await Promise.all(Array.from(document.images, img => img.decode().catch(() => null)));
+        while (!done && document.documentElement.dataset.renderReady !== "1") {
+            await nextFrame();
+        }
+        if (done) {
+            return false;
+        }
+        await nextFrame();
+        return true;
+    })();
+    const deadline = new Promise(resolve => setTimeout(() => {
+        done = true;
+        resolve(false);
+    }, timeoutMs));
+    return Promise.race([ready, deadline]);
+}
+"""
+
+
+@dataclass
+class ReadyWaitStats:
+    """截图前就绪等待耗时统计"""
+    count: int = 0
+    timeouts: int = 0
+    total_ms: float = 0.0
+    last_ms: float = 0.0
+    max_ms: float = 0.0
+
+    def record(self, elapsed_ms: float, timed_out: bool) -> None:
+        self.count += 1
+        self.timeouts += int(timed_out)
+        self.total_ms += elapsed_ms
+        self.last_ms = elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+
+
+ready_wait_stats = ReadyWaitStats()
+
+registry.collect(
+    "render_ready_timeouts_total", "Screenshots taken before the page signalled ready",
+    lambda: ready_wait_stats.timeouts, kind="counter"
+)
+
+# 逆时针旋转角度 -> Pillow 转置方式
+_ROTATIONS = {
+    90: Image.Transpose.ROTATE_90,
+    180: Image.Transpose.ROTATE_180,
+    270: Image.Transpose.ROTATE_270,
+}
+
+# 对比度增强系数 (让黑更黑，白更白，减少中间灰色)
+CONTRAST_FACTOR = 1.2
+
+# Pillow 的这些操作大部分会释放 GIL，线程池即可并行
+postprocess_executor = ThreadPoolExecutor(
+    max_workers=max(1, POSTPROCESS_WORKERS),
+    thread_name_prefix="postprocess"
+)
+
+
+async def html_to_grayscale_png(
+    html_content: str,
+    use_cache: bool = True,
+    size: tuple[int, int] = (SCREEN_WIDTH, SCREEN_HEIGHT),
+    rotation: int = 90
+) -> bytes:
     """
     将 HTML 内容转换为灰度 PNG 图片
-    
+
+    相同的 HTML 直接返回缓存的结果；浏览器池已启动时复用预热页面，否则临时启动一个 Chromium。
+
     Args:
         html_content: HTML 字符串
-        
+        use_cache: 是否使用渲染结果缓存
+        size: 页面 (截图) 尺寸 (宽, 高)
+        rotation: 截图后逆时针旋转的角度 (0/90/180/270)
+
     Returns:
-        PNG 图片的字节数据（8位灰度，无透明通道）
+        PNG 图片的字节数据（16 级灰度，无透明通道，位深由 PNG_OUTPUT_MODE 决定）
     """
-    async with async_playwright() as p:
-        # 启动浏览器
-        browser = await p.chromium.launch()
-        page = await browser.new_page(
-            viewport={"width": SCREEN_WIDTH, "height": SCREEN_HEIGHT}
+    key = render_key(html_content, size, rotation, PNG_OUTPUT_MODE, PNG_COMPRESS_LEVEL, PNG_COMPRESS_STRATEGY, DITHER_MODE)
+    if use_cache:
+        cached = render_cache.get(key)
+        if cached is not None:
+            return cached
+
+    pool = get_browser_pool()
+    if pool is not None:
+        async with pool.page({"width": size[0], "height": size[1]}) as page:
+            screenshot_bytes = await _capture(page, html_content)
+    else:
+        async with async_playwright() as p:
+            # 启动浏览器
+            with stage("browser.launch"):
+                browser = await p.chromium.launch()
+                page = await browser.new_page(
+                    viewport={"width": size[0], "height": size[1]}
+                )
+                await install_asset_routes(page)
+            screenshot_bytes = await _capture(page, html_content)
+            await browser.close()
+
+    loop = asyncio.get_running_loop()
+    with stage("postprocess"):
+        png_bytes = await loop.run_in_executor(
+            postprocess_executor, partial(grayscale_postprocess, screenshot_bytes, rotation=rotation)
         )
-        
-        # 设置 HTML 内容
-        await page.set_content(html_content, wait_until="networkidle")
-        
-        # 等待字体加载
-        await page.wait_for_timeout(500)
-        
-        # 截图
-        screenshot_bytes = await page.screenshot(
+    if use_cache:
+        render_cache.put(key, png_bytes)
+    return png_bytes
+
+
+async def _capture(page: Page, html_content: str) -> bytes:
+    """在页面中载入 HTML，等待就绪后截图"""
+    with stage("browser.load"):
+        timed_out, elapsed_ms = await _load(page, html_content)
+    if timed_out:
+        logger.warning(f"Page not ready after {RENDER_READY_TIMEOUT_MS}ms, taking screenshot anyway")
+    else:
+        logger.debug(f"Page ready in {elapsed_ms:.0f}ms")
+
+    # 截图
+    with stage("browser.screenshot"):
+        return await page.screenshot(
             type="png",
             full_page=False
         )
-        
-        await browser.close()
-    
-    # 将截图转换为灰度图
-    img = Image.open(BytesIO(screenshot_bytes))
-    
+
+
+async def _load(page: Page, html_content: str) -> tuple[bool, float]:
+    """载入 HTML 并等待就绪，返回 (是否超时, 耗时毫秒)"""
+    start = time.perf_counter()
+    timed_out = False
+    if RENDER_READY_MODE == "networkidle":
+        # 旧模式：等待网络空闲，再固定等待字体加载
+        await page.set_content(html_content, wait_until="networkidle")
+        await page.wait_for_timeout(500)
+    else:
+        await page.set_content(html_content, wait_until="domcontentloaded")
+        timed_out = not await page.evaluate(_WAIT_FOR_READY_JS, RENDER_READY_TIMEOUT_MS)
+
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    ready_wait_stats.record(elapsed_ms, timed_out)
+    return timed_out, elapsed_ms
+
+
+@lru_cache(maxsize=256)
+def _contrast_lut(mean: int) -> list[int]:
+    """
+    对比度增强的 256 项查找表
+
+    ImageEnhance.Contrast 是以整图平均灰度为中心的逐像素 blend，
+    因此对 0-255 的灰度阶梯做同样的 blend，即可得到与原流程逐像素一致的映射。
+    """
+    ramp = Image.frombytes("L", (256, 1), bytes(range(256)))
+    contrasted = Image.blend(Image.new("L", (256, 1), mean), ramp, CONTRAST_FACTOR)
+    return list(contrasted.tobytes())
+
+
+@lru_cache(maxsize=256)
+def _postprocess_lut(mean: int) -> list[int]:
+    """对比度增强 + 16 级量化 (posterize) 合并为一张查找表"""
+    return [QUANTIZE_LUT[value] for value in _contrast_lut(mean)]
+
+
+def grayscale_postprocess(
+    screenshot_bytes: bytes,
+    png_mode: str = PNG_OUTPUT_MODE,
+    compress_level: int = PNG_COMPRESS_LEVEL,
+    compress_strategy: str = PNG_COMPRESS_STRATEGY,
+    dither_mode: str = DITHER_MODE,
+    rotation: int = 90
+) -> bytes:
+    """将浏览器截图转换为 Kindle 可用的 16 级灰度竖屏 PNG"""
+    return postprocess_image(
+        Image.open(BytesIO(screenshot_bytes)), png_mode, compress_level, compress_strategy, dither_mode, rotation
+    )
+
+
+def postprocess_image(
+    img: Image.Image,
+    png_mode: str = PNG_OUTPUT_MODE,
+    compress_level: int = PNG_COMPRESS_LEVEL,
+    compress_strategy: str = PNG_COMPRESS_STRATEGY,
+    dither_mode: str = DITHER_MODE,
+    rotation: int = 90
+) -> bytes:
+    """将横屏图片转换为 16 级灰度 PNG，默认旋转为竖屏 (截图和 Pillow 直接渲染共用)"""
     # 转换为灰度模式 (L = 8-bit grayscale)
     grayscale_img = img.convert("L")
-    
-    # 增强对比度 (让黑更黑，白更白，减少中间灰色)
-    from PIL import ImageEnhance
-    enhancer = ImageEnhance.Contrast(grayscale_img)
-    grayscale_img = enhancer.enhance(1.2)  # 提升 20% 对比度
-    
-    # 将 256 级灰度压缩至 16 级 (4-bit), 匹配 Kindle 硬件
-    # 映射公式：(x // 16) * 17 确保 0->0, 255->255，且只有 16 个阶梯
-    grayscale_img = grayscale_img.point(lambda x: (x // 16) * 17)
-    
-    # 逆时针旋转 90 度，将 800x600 横屏图片转为 600x800 竖屏
+
+    mean = int(ImageStat.Stat(grayscale_img).mean[0] + 0.5)
+    if dither_mode == "posterize":
+        # 对比度增强和 16 级量化：一次查表完成
+        grayscale_img = grayscale_img.point(_postprocess_lut(mean))
+    else:
+        # 抖动需要先得到对比度增强后的连续灰度 (见 dither.py)
+        grayscale_img = dither(grayscale_img.point(_contrast_lut(mean)), dither_mode)
+
+    # 默认逆时针旋转 90 度，将 800x600 横屏图片转为 600x800 竖屏
     # 这样 Kindle 竖放时可以正常显示横屏布局的内容
-    grayscale_img = grayscale_img.rotate(90, expand=True)
-    
-    # 保存到字节流
-    output = BytesIO()
-    grayscale_img.save(output, format="PNG", optimize=True)
-    output.seek(0)
-    
-    return output.getvalue()
+    if rotation:
+        grayscale_img = grayscale_img.transpose(_ROTATIONS[rotation])
+
+    # 编码为 PNG (见 png_encoder.py)
+    return encode_png(grayscale_img, png_mode, compress_level, compress_strategy)
 
 
 def sync_html_to_grayscale_png(html_content: str) -> bytes:
@@ -2,18 +2,66 @@
 HTML 模板渲染器
 
 使用 Jinja2 将天气和新闻数据渲染成 HTML
+
+Jinja 环境在进程内只创建一次，解析后的模板常驻内存：
+- build_templates.py 预编译的模板 (app/templates_compiled) 存在且不旧于源模板时直接加载，无需解析
+- 否则从 templates/ 解析，编译结果写入字节码缓存，进程重启后跳过解析
+- TEMPLATE_AUTO_RELOAD=true (开发模式) 时每次检查模板文件是否修改，不使用预编译结果
 """
 
-from pathlib import Path
+import logging
 from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
 from zoneinfo import ZoneInfo
-from jinja2 import Environment, FileSystemLoader
+from jinja2 import BaseLoader, Environment, FileSystemBytecodeCache, FileSystemLoader, ModuleLoader
 from app.services.weather import WeatherData
 from app.services.news import NewsData
+from app.config import (
+    SCREEN_WIDTH,
+    SCREEN_HEIGHT,
+    TEMPLATE_AUTO_RELOAD,
+    TEMPLATE_BYTECODE_CACHE,
+    TEMPLATE_BYTECODE_CACHE_DIR
+)
+from app.renderer.assets import QWEATHER_ICONS_BASE_URL, FONT_BASE_URL
+
+logger = logging.getLogger(__name__)
 
 # 中国时区
 CHINA_TZ = ZoneInfo("Asia/Shanghai")
 
+TEMPLATES_DIR = Path(__file__).parent.parent / "templates"
+# build_templates.py 的输出目录
+COMPILED_TEMPLATES_DIR = Path(__file__).parent.parent / "templates_compiled"
+
+
+def _precompiled_is_current() -> bool:
+    """预编译目录存在，且比所有源模板都新"""
+    if not COMPILED_TEMPLATES_DIR.is_dir():
+        return False
+    compiled_at = COMPILED_TEMPLATES_DIR.stat().st_mtime
+    if any(path.stat().st_mtime > compiled_at for path in TEMPLATES_DIR.glob("*.html")):
+        logger.warning(f"{COMPILED_TEMPLATES_DIR} is older than the templates, run build_templates.py")
+        return False
+    return True
+
+
+@lru_cache(maxsize=1)
+def get_environment() -> Environment:
+    """进程内共享的 Jinja 环境"""
+    loader: BaseLoader
+    bytecode_cache = None
+    if not TEMPLATE_AUTO_RELOAD and _precompiled_is_current():
+        loader = ModuleLoader(str(COMPILED_TEMPLATES_DIR))
+    else:
+        loader = FileSystemLoader(TEMPLATES_DIR)
+        if TEMPLATE_BYTECODE_CACHE:
+            # 未指定目录时使用系统临时目录
+            bytecode_cache = FileSystemBytecodeCache(TEMPLATE_BYTECODE_CACHE_DIR or None)
+    return Environment(loader=loader, bytecode_cache=bytecode_cache, auto_reload=TEMPLATE_AUTO_RELOAD)
+
 
 def get_weekday_name(date: datetime) -> str:
     """获取星期几"""
@@ -21,21 +69,50 @@ def get_weekday_name(date: datetime) -> str:
     return weekdays[date.weekday()]
 
 
-def render_dashboard_html(weather: WeatherData, news: NewsData) -> str:
-    """渲染仪表盘 HTML"""
-    template_dir = Path(__file__).parent.parent / "templates"
-    env = Environment(loader=FileSystemLoader(template_dir))
-    template = env.get_template("dashboard.html")
-    
-    now = datetime.now(CHINA_TZ)
-    
-    # 格式化日期
+def format_header(now: datetime) -> tuple[str, str]:
+    """格式化顶部日期栏：(日期, 更新时间)"""
     date_str = f"{now.year}年{now.month}月{now.day}日 {get_weekday_name(now)}"
     update_time = now.strftime("%H:%M")
+    return date_str, update_time
+
+
+def format_stale_note(weather: WeatherData, news: NewsData, now: datetime) -> str:
+    """上游故障时的旧数据提示，如 "旧数据 天气 08:30 · 新闻 5/3 23:10"；数据都是新的时返回空字符串"""
+    parts = []
+    for label, stale_since in (("天气", weather.stale_since), ("新闻", news.stale_since)):
+        if stale_since is None:
+            continue
+        fetched = datetime.fromtimestamp(stale_since, now.tzinfo or CHINA_TZ)
+        if fetched.date() == now.date():
+            parts.append(f"{label} {fetched:%H:%M}")
+        else:
+            parts.append(f"{label} {fetched.month}/{fetched.day} {fetched:%H:%M}")
+    return f"旧数据 {' · '.join(parts)}" if parts else ""
+
+
+def render_dashboard_html(
+    weather: WeatherData,
+    news: NewsData,
+    now: Optional[datetime] = None,
+    width: int = SCREEN_WIDTH,
+    height: int = SCREEN_HEIGHT,
+    layout: str = "dashboard"
+) -> str:
+    """渲染仪表盘 HTML (layout 为 templates/ 下的模板名，width/height 为页面尺寸)"""
+    template = get_environment().get_template(f"{layout}.html")
+    
+    # 格式化日期
+    now = now or datetime.now(CHINA_TZ)
+    date_str, update_time = format_header(now)
     
     return template.render(
         date_str=date_str,
         update_time=update_time,
+        stale_note=format_stale_note(weather, news, now),
         weather=weather,
-        news=news
+        news=news,
+        screen_width=width,
+        screen_height=height,
+        icons_base_url=QWEATHER_ICONS_BASE_URL,
+        font_base_url=FONT_BASE_URL
     )
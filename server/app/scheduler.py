@@ -0,0 +1,150 @@
+"""
+后台预渲染调度
+
+随 FastAPI lifespan 启动，按与设备相同的 cron 计划 (REFRESH_SCHEDULE) 在每次唤醒前
+PRERENDER_LEAD_SECONDS 秒渲染仪表盘，并把最新的 PNG 保存在内存中，
+/dashboard 直接返回这份图片，不再在请求中执行完整流水线。
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional
+from zoneinfo import ZoneInfo
+
+from app.config import REFRESH_SCHEDULE, TIMEZONE, PRERENDER_LEAD_SECONDS
+from app.cron import CronSchedule
+from app.pipeline import render_dashboard_png, publish_dashboard
+from app.metrics import stage
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RenderedDashboard:
+    """一次渲染结果"""
+    png_bytes: bytes
+    rendered_at: datetime
+    duration_ms: float
+
+
+class DashboardScheduler:
+    """按 cron 计划预渲染仪表盘"""
+
+    def __init__(
+        self,
+        schedule: str = REFRESH_SCHEDULE,
+        timezone: str = TIMEZONE,
+        lead_seconds: int = PRERENDER_LEAD_SECONDS,
+        render: Callable[[], Awaitable[bytes]] = render_dashboard_png,
+        publish: Callable[[bytes], Awaitable[None]] = publish_dashboard
+    ):
+        self.schedule = CronSchedule.parse(schedule)
+        self.timezone = ZoneInfo(timezone)
+        self.lead = timedelta(seconds=lead_seconds)
+        self._render = render
+        self._publish = publish
+
+        self.latest: Optional[RenderedDashboard] = None
+        self.next_run_at: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def next_run_after(self, now: datetime) -> datetime:
+        """下一次渲染时间：下一次设备唤醒时间减去提前量"""
+        wakeup = self.schedule.next_after((now + self.lead).astimezone(self.timezone))
+        return wakeup - self.lead
+
+    async def refresh(self) -> RenderedDashboard:
+        """
+        立即渲染一次并更新 latest
+
+        已有渲染在进行时不重复渲染，等待它完成后直接返回其结果。
+        """
+        if self._lock.locked():
+            async with self._lock:
+                if self.latest is not None:
+                    return self.latest
+
+        async with self._lock:
+            start = time.perf_counter()
+            with stage("prerender"):
+                png_bytes = await self._render()
+            self.latest = RenderedDashboard(
+                png_bytes=png_bytes,
+                rendered_at=datetime.now(self.timezone),
+                duration_ms=(time.perf_counter() - start) * 1000
+            )
+            self.last_error = None
+            logger.info(f"Pre-rendered dashboard in {self.latest.duration_ms:.0f}ms")
+
+        await self._publish(png_bytes)
+        return self.latest
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        # 启动时先渲染一次，保证 /dashboard 立即有图可用
+        await self._refresh_logged()
+        while True:
+            now = datetime.now(self.timezone)
+            self.next_run_at = self.next_run_after(now)
+            await asyncio.sleep(max(0.0, (self.next_run_at - now).total_seconds()))
+            await self._refresh_logged()
+
+    async def _refresh_logged(self) -> None:
+        try:
+            await self.refresh()
+        except Exception as e:
+            self.last_error = str(e)
+            logger.exception("Scheduled dashboard render failed")
+
+    def status(self) -> dict:
+        """最近一次渲染的时间、耗时以及下一次计划时间"""
+        return {
+            "schedule": self.schedule.expression,
+            "last_render_at": self.latest.rendered_at.isoformat() if self.latest else None,
+            "last_render_duration_ms": round(self.latest.duration_ms, 1) if self.latest else None,
+            "next_render_at": self.next_run_at.isoformat() if self.next_run_at else None,
+            "last_error": self.last_error,
+        }
+
+
+# 全局调度器，由 app lifespan 启动和关闭
+_scheduler: Optional[DashboardScheduler] = None
+
+
+def get_scheduler() -> Optional[DashboardScheduler]:
+    """获取已启动的全局调度器 (未启用时返回 None)"""
+    return _scheduler
+
+
+def start_scheduler(**kwargs) -> DashboardScheduler:
+    """创建并启动全局调度器"""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = DashboardScheduler(**kwargs)
+    _scheduler.start()
+    return _scheduler
+
+
+async def stop_scheduler() -> None:
+    """停止全局调度器"""
+    global _scheduler
+    if _scheduler is not None:
+        await _scheduler.stop()
+        _scheduler = None
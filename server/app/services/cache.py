@@ -0,0 +1,194 @@
+"""
+上游数据缓存
+
+按 key 缓存天气/新闻接口的结果，每类接口有各自的 TTL：
+- 未过期：直接返回缓存
+- 过期但仍在 stale 窗口内：先返回旧数据，同时在后台刷新
+- 无缓存或过旧：等待上游请求
+- 上游失败 (返回占位数据) 时回退到最近一次成功的数据 (last-known-good)，不论多旧，
+  并标记为降级，直到下一次成功刷新；模板据此显示数据时间
+
+同一个 key 的并发请求合并为一次上游调用。持久化到本地文件 (UPSTREAM_CACHE_FILE)，
+重启后直接命中，上游故障期间重启也有数据可用。
+"""
+
+import asyncio
+import logging
+import os
+import pickle
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+from app.config import UPSTREAM_CACHE_ENABLED, UPSTREAM_CACHE_STALE_TTL, UPSTREAM_CACHE_FILE
+from app.metrics import registry, upstream_cache_lookups
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+upstream_cache_fallbacks = registry.counter(
+    "upstream_cache_fallbacks_total", "Upstream failures answered with last-known-good data", ("cache",)
+)
+
+
+@dataclass
+class CacheEntry:
+    """缓存条目"""
+    value: Any
+    fetched_at: float     # 获取时间 (Unix 时间戳，重启后仍然有效)
+    degraded: bool = False  # 最近一次刷新失败，正在使用旧数据
+
+
+class UpstreamCache:
+    """带 stale-while-revalidate 和请求合并的异步缓存"""
+
+    def __init__(
+        self,
+        enabled: bool = UPSTREAM_CACHE_ENABLED,
+        stale_ttl: float = UPSTREAM_CACHE_STALE_TTL,
+        path: Optional[str] = UPSTREAM_CACHE_FILE or None
+    ):
+        self.enabled = enabled
+        self.stale_ttl = stale_ttl
+        self.path = Path(path) if path else None
+        self._entries: dict[str, CacheEntry] = {}
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._save_task: Optional[asyncio.Task] = None
+        self._save_pending = False   # 写入进行中又有新数据，写完后再写一次
+
+    async def get(
+        self,
+        key: str,
+        fetch: Callable[[], Awaitable[T]],
+        ttl: float,
+        is_valid: Callable[[T], bool] = lambda value: True
+    ) -> T:
+        """
+        读取缓存，必要时调用 fetch 获取
+
+        Args:
+            key: 缓存 key
+            fetch: 获取新数据的协程工厂
+            ttl: 数据有效期 (秒)
+            is_valid: 判断结果是否可以缓存 (接口失败时的占位数据不缓存)
+        """
+        if not self.enabled:
+            return await fetch()
+
+        # 按 key 的前缀 (weather.current / news) 统计命中率
+        cache_name = key.split(":", 1)[0]
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.time() - entry.fetched_at
+            if age < ttl:
+                upstream_cache_lookups.inc(cache=cache_name, result="fresh")
+                return entry.value
+            if age < ttl + self.stale_ttl:
+                upstream_cache_lookups.inc(cache=cache_name, result="stale")
+                self._refresh(key, fetch, is_valid)
+                return entry.value
+
+        upstream_cache_lookups.inc(cache=cache_name, result="miss")
+        # shield: 某个等待者被取消时不影响共享的上游请求
+        return await asyncio.shield(self._refresh(key, fetch, is_valid))
+
+    def _refresh(self, key: str, fetch: Callable[[], Awaitable[T]], is_valid: Callable[[T], bool]) -> asyncio.Task:
+        """启动 (或复用正在进行的) 上游请求"""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch_and_store(key, fetch, is_valid))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._on_done(key, t))
+        return task
+
+    async def _fetch_and_store(self, key: str, fetch: Callable[[], Awaitable[T]], is_valid: Callable[[T], bool]) -> T:
+        value = await fetch()
+        if is_valid(value):
+            self._entries[key] = CacheEntry(value=value, fetched_at=time.time())
+            self._schedule_save()
+            return value
+
+        # 上游失败：回退到最近一次成功的数据
+        entry = self._entries.get(key)
+        if entry is None:
+            return value
+        if not entry.degraded:
+            logger.warning(f"Upstream {key} failed, serving last-known-good data from {time.ctime(entry.fetched_at)}")
+            entry.degraded = True
+        upstream_cache_fallbacks.inc(cache=key.split(":", 1)[0])
+        return entry.value
+
+    def degraded_since(self, key: str) -> Optional[float]:
+        """正在使用旧数据时返回其获取时间，否则返回 None"""
+        entry = self._entries.get(key)
+        if entry is None or not entry.degraded:
+            return None
+        return entry.fetched_at
+
+    def _on_done(self, key: str, task: asyncio.Task) -> None:
+        self._inflight.pop(key, None)
+        # 后台刷新的异常没有等待者，在这里取出并记录
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Refreshing cache key {key} failed: {task.exception()!r}")
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def load(self) -> None:
+        """从持久化文件恢复缓存"""
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            with open(self.path, "rb") as f:
+                # 文件只由本服务写入；缓存值是 services 中的 dataclass
+                self._entries = pickle.load(f)
+            logger.info(f"Loaded {len(self._entries)} cached upstream entries from {self.path}")
+        except Exception as e:
+            logger.warning(f"Failed to load upstream cache from {self.path}: {e}")
+
+    def save(self, entries: Optional[dict[str, CacheEntry]] = None) -> None:
+        """
+        写入持久化文件 (先写临时文件再替换，避免写到一半)
+
+        在线程中调用时由调用方传入在事件循环中取的快照 entries，线程中不读取可能正在修改的字典。
+        """
+        if self.path is None:
+            return
+        snapshot = dict(self._entries) if entries is None else entries
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+            with open(tmp_path, "wb") as f:
+                pickle.dump(snapshot, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning(f"Failed to save upstream cache to {self.path}: {e}")
+
+    def _schedule_save(self) -> None:
+        """在线程中写文件；已有写入任务时合并，写完后再写入最新的数据"""
+        if self.path is None:
+            return
+        if self._save_task is not None and not self._save_task.done():
+            self._save_pending = True
+            return
+        self._save_pending = False
+        self._save_task = asyncio.create_task(asyncio.to_thread(self.save, dict(self._entries)))
+        self._save_task.add_done_callback(self._on_saved)
+
+    def _on_saved(self, task: asyncio.Task) -> None:
+        if self._save_pending:
+            self._schedule_save()
+
+    async def close(self) -> None:
+        """等待进行中的后台写入完成，再写入最终状态 (退出时调用，避免两次写入交错)"""
+        self._save_pending = False
+        while self._save_task is not None and not self._save_task.done():
+            await asyncio.shield(self._save_task)
+        self._save_task = None
+        self.save()
+
+
+# 全局上游数据缓存
+upstream_cache = UpstreamCache()
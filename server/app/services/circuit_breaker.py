@@ -0,0 +1,109 @@
+"""
+上游熔断器
+
+某个上游 (QWeather 的一个接口在一个位置上、一个 RSS 站点) 连续失败 failure_threshold 次后熔断：
+之后 reset_timeout 秒内的请求直接失败，不再等待超时，由上游缓存回退到最近一次成功的数据。
+冷却结束后放行一个试探请求 (半开)，成功则恢复，失败则重新计时；
+试探请求被取消 (release) 或 reset_timeout 秒内没有结果时再放行一个。
+
+名称为 "<上游>:<键>"，例如 weather:current:101010100、news:www.example.com。
+"""
+
+import logging
+import time
+from typing import Optional
+
+from app.config import CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """单个上游的熔断状态 (只在事件循环线程中使用)"""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+        reset_timeout: float = CIRCUIT_RESET_TIMEOUT
+    ):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probe_started: Optional[float] = None
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        """是否放行本次请求；熔断冷却结束后只放行一个试探请求"""
+        if self.state == CLOSED:
+            return True
+        now = time.monotonic()
+        if self.state == OPEN and now - self.opened_at >= self.reset_timeout:
+            self.state = HALF_OPEN
+            self.probe_started = now
+            return True
+        if self.state == HALF_OPEN and now - self.probe_started >= self.reset_timeout:
+            # 试探请求迟迟没有结果 (被取消后未 release)，视为丢失
+            logger.warning(f"Upstream {self.name} probe got no result in {self.reset_timeout:.0f}s, probing again")
+            self.probe_started = now
+            return True
+        self.rejected += 1
+        return False
+
+    def release(self) -> None:
+        """放行的请求没有结果 (被取消) 时调用；半开时立即允许下一个试探请求"""
+        if self.state == HALF_OPEN:
+            self.state = OPEN
+
+    def record(self, ok: bool) -> None:
+        if ok:
+            if self.state != CLOSED:
+                logger.info(f"Upstream {self.name} recovered, closing circuit")
+            self.state = CLOSED
+            self.failures = 0
+            return
+
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                logger.warning(
+                    f"Upstream {self.name} failed {self.failures} times, failing fast for {self.reset_timeout:.0f}s"
+                )
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """按上游名称获取 (或创建) 熔断器"""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        breaker = _breakers[name] = CircuitBreaker(name)
+    return breaker
+
+
+def breaker_states() -> dict[str, str]:
+    """上游 -> 熔断状态"""
+    return {name: breaker.state for name, breaker in _breakers.items()}
+
+
+registry.collect(
+    "upstream_circuit_open", "1 while the upstream circuit breaker is open or half-open",
+    lambda: {(name,): int(breaker.state != CLOSED) for name, breaker in _breakers.items()},
+    labelnames=("upstream",)
+)
+registry.collect(
+    "upstream_circuit_rejected_total", "Requests failed fast by an open circuit breaker",
+    lambda: {(name,): breaker.rejected for name, breaker in _breakers.items()},
+    kind="counter", labelnames=("upstream",)
+)
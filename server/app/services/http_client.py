@@ -0,0 +1,55 @@
+"""
+共享 HTTP 客户端
+
+所有上游请求 (QWeather、RSS) 复用同一个带连接池的 httpx.AsyncClient，
+避免每次请求重新进行 TCP/TLS 握手。客户端随 FastAPI lifespan 创建和关闭，
+命令行脚本中首次使用时自动创建，结束前调用 close_http_client()。
+"""
+
+import logging
+from typing import Optional
+
+import httpx
+
+from app.config import HTTP_MAX_CONNECTIONS, HTTP_KEEPALIVE_EXPIRY, HTTP2_ENABLED
+
+logger = logging.getLogger(__name__)
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _http2_available() -> bool:
+    """HTTP/2 需要可选依赖 h2 (httpx[http2])"""
+    if not HTTP2_ENABLED:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        logger.warning("h2 is not installed, falling back to HTTP/1.1")
+        return False
+    return True
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """获取共享的 AsyncClient (不存在时创建)"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            http2=_http2_available(),
+            follow_redirects=True,
+            timeout=10.0,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_CONNECTIONS,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+            )
+        )
+    return _client
+
+
+async def close_http_client() -> None:
+    """关闭共享的 AsyncClient"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -4,16 +4,23 @@ News RSS Service
 Fetch domestic and international news titles from RSS feeds
 """
 
-import httpx
+import asyncio
 import feedparser
 from io import BytesIO
 from dataclasses import dataclass
+from typing import Optional
+from urllib.parse import urlsplit
 from app.config import (
     NEWS_RSS_DOMESTIC,
     NEWS_RSS_INTERNATIONAL,
     NEWS_COUNT_DOMESTIC,
-    NEWS_COUNT_PER_CATEGORY
+    NEWS_COUNT_PER_CATEGORY,
+    CACHE_TTL_NEWS
 )
+from app.services.cache import upstream_cache
+from app.services.http_client import get_http_client
+from app.services.circuit_breaker import get_breaker
+from app.metrics import observe_upstream, stage
 
 
 @dataclass
@@ -28,19 +35,20 @@ class NewsData:
     """新闻数据"""
     domestic: list[NewsItem]      # 国内新闻
     international: list[NewsItem] # 国际新闻
+    stale_since: Optional[float] = None   # RSS 故障时使用的旧数据中最早的获取时间 (Unix 时间戳)
 
 
 
-def fetch_rss_news(url: str, count: int, prefix: str = "") -> list[NewsItem]:
+async def fetch_rss_news(url: str, count: int, prefix: str = "") -> list[NewsItem]:
     """Fetch news from RSS feed with timeout"""
     headers = {
         "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
     }
     try:
-        # Use httpx with timeout to fetch RSS content
-        with httpx.Client(timeout=10.0, follow_redirects=True, headers=headers) as client:
-            resp = client.get(url)
-            feed = feedparser.parse(BytesIO(resp.content))
+        # Use the shared pooled client to fetch RSS content
+        resp = await get_http_client().get(url, headers=headers, timeout=10.0)
+        # feedparser 是纯 CPU 解析，放到线程池中避免阻塞事件循环
+        feed = await asyncio.to_thread(feedparser.parse, BytesIO(resp.content))
         
         news_list = []
         
@@ -66,21 +74,63 @@ def fetch_rss_news(url: str, count: int, prefix: str = "") -> list[NewsItem]:
         return []
 
 
-def get_news_data() -> NewsData:
-    """获取所有新闻数据"""
-    # 1. 国内新闻
-    domestic = fetch_rss_news(NEWS_RSS_DOMESTIC, NEWS_COUNT_DOMESTIC)
-    
-    # 2. 国际新闻 (分分类循环获取)
-    international = []
-    for category_name, url in NEWS_RSS_INTERNATIONAL.items():
-        items = fetch_rss_news(url, NEWS_COUNT_PER_CATEGORY, prefix=category_name)
-        international.extend(items)
+async def fetch_rss_news_observed(url: str, count: int, prefix: str = "") -> list[NewsItem]:
+    """请求 RSS 并记录耗时和成功/失败 (空结果视为失败)；按站点熔断，熔断时直接返回空列表"""
+    breaker = get_breaker(f"news:{urlsplit(url).netloc}")
+    if not breaker.allow():
+        return []
+    try:
+        with stage("news"):
+            news_list = await fetch_rss_news(url, count, prefix)
+    except asyncio.CancelledError:
+        breaker.release()
+        raise
+    breaker.record(bool(news_list))
+    observe_upstream("news", bool(news_list))
+    return news_list
+
+
+def _cache_key(url: str, count: int, prefix: str = "") -> str:
+    return f"news:{url}:{count}:{prefix}"
+
+
+async def fetch_rss_news_cached(url: str, count: int, prefix: str = "") -> list[NewsItem]:
+    """带缓存的 RSS 获取 (空结果不缓存，有旧数据时返回旧数据)"""
+    return await upstream_cache.get(
+        _cache_key(url, count, prefix),
+        lambda: fetch_rss_news_observed(url, count, prefix),
+        ttl=CACHE_TTL_NEWS,
+        is_valid=bool
+    )
+
+
+async def get_news_data() -> NewsData:
+    """获取所有新闻数据 (所有 RSS 源并发获取)"""
+    # 1. 国内新闻 + 2. 国际新闻 (各分类)，保持分类顺序
+    domestic, *categories = await asyncio.gather(
+        fetch_rss_news_cached(NEWS_RSS_DOMESTIC, NEWS_COUNT_DOMESTIC),
+        *(
+            fetch_rss_news_cached(url, NEWS_COUNT_PER_CATEGORY, prefix=category_name)
+            for category_name, url in NEWS_RSS_INTERNATIONAL.items()
+        )
+    )
+    international = [item for items in categories for item in items]
     
     # 如果获取失败，提供默认内容
     if not domestic:
         domestic = [NewsItem(title="暂无国内新闻", link="")]
     if not international:
         international = [NewsItem(title="暂无国际新闻", link="")]
-    
-    return NewsData(domestic=domestic, international=international)
+
+    # 任一 RSS 源正在使用旧数据时，记录其中最早的获取时间供模板显示
+    keys = [_cache_key(NEWS_RSS_DOMESTIC, NEWS_COUNT_DOMESTIC)] + [
+        _cache_key(url, NEWS_COUNT_PER_CATEGORY, category_name)
+        for category_name, url in NEWS_RSS_INTERNATIONAL.items()
+    ]
+    degraded = [upstream_cache.degraded_since(key) for key in keys]
+
+    return NewsData(
+        domestic=domestic,
+        international=international,
+        stale_since=min((t for t in degraded if t is not None), default=None)
+    )
@@ -0,0 +1,96 @@
+"""
+QWeather JWT authentication
+
+Tokens are valid for 15 minutes, so the Ed25519 private key is parsed once
+and the signed token is cached until shortly before it expires, instead of
+re-parsing and re-signing for every API request.
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Optional
+
+import jwt
+from cryptography.hazmat.primitives.serialization import load_pem_private_key
+
+from app.config import QWEATHER_PROJECT_ID, QWEATHER_KEY_ID, QWEATHER_PRIVATE_KEY
+
+logger = logging.getLogger(__name__)
+
+TOKEN_LIFETIME = 900        # Valid for 15 minutes
+CLOCK_SKEW = 30             # iat 30 seconds in the past to handle clock skew
+REFRESH_MARGIN = 60         # Re-sign this many seconds before exp
+
+
+class QWeatherTokenProvider:
+    """
+    Thread-safe cache of the signed QWeather JWT.
+
+    token() never awaits, so concurrent coroutines on the event loop cannot
+    interleave inside it; the lock covers callers running in worker threads.
+    """
+
+    def __init__(
+        self,
+        project_id: str = QWEATHER_PROJECT_ID,
+        key_id: str = QWEATHER_KEY_ID,
+        private_key: str = QWEATHER_PRIVATE_KEY,
+        lifetime: int = TOKEN_LIFETIME,
+        refresh_margin: int = REFRESH_MARGIN,
+        clock: Callable[[], float] = time.time
+    ):
+        self.project_id = project_id
+        self.key_id = key_id
+        self._private_key_pem = private_key
+        self.lifetime = lifetime
+        self.refresh_margin = min(refresh_margin, lifetime // 2)
+        self._clock = clock
+
+        self._key = None
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self.signed_count = 0
+
+    def _load_key(self):
+        """Parse the PEM private key once (handle newlines in env var)"""
+        if self._key is None:
+            pem = self._private_key_pem.replace("\\n", "\n").encode("utf-8")
+            self._key = load_pem_private_key(pem, password=None)
+        return self._key
+
+    def _sign(self, now: int) -> str:
+        payload = {
+            "sub": self.project_id,
+            "iat": now - CLOCK_SKEW,
+            "exp": now + self.lifetime
+        }
+        token = jwt.encode(
+            payload,
+            self._load_key(),
+            algorithm="EdDSA",
+            headers={"kid": self.key_id}
+        )
+        self.signed_count += 1
+        return token
+
+    def token(self) -> str:
+        """Return the cached token, signing a new one when it is about to expire"""
+        now = self._clock()
+        token = self._token
+        if token is not None and now < self._expires_at - self.refresh_margin:
+            return token
+
+        with self._lock:
+            now = self._clock()
+            if self._token is None or now >= self._expires_at - self.refresh_margin:
+                issued_at = int(now)
+                self._token = self._sign(issued_at)
+                self._expires_at = issued_at + self.lifetime
+                logger.debug("Signed new QWeather JWT")
+            return self._token
+
+
+# Shared provider for all QWeather requests
+token_provider = QWeatherTokenProvider()
@@ -2,14 +2,51 @@
 Cloudflare R2 Storage Service
 
 提供 R2 对象存储的上传功能，支持 dashboard 图片等文件的云端存储
+
+- boto3 client 只创建一次 (导入 boto3 和解析凭证都很慢)，botocore client 线程安全
+- 上传前比较内容 MD5，与上次上传或对象上的 MD5 相同时跳过
+- 失败后按指数退避重试，超过 R2_MULTIPART_THRESHOLD 的文件分段上传
+- UploadQueue 在后台线程中上传，HTTP 请求无需等待对象存储
+- 设置 R2_ENDPOINT_URL 可以指向本地的 S3 兼容服务 (如 MinIO) 进行测试
 """
 
+import asyncio
+import base64
+import hashlib
 import logging
 import os
-from typing import Optional  # noqa: F401
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from functools import lru_cache
+from io import BytesIO
+from typing import Optional
+
+from app.config import (
+    R2_UPLOAD_CONCURRENCY,
+    R2_UPLOAD_RETRIES,
+    R2_UPLOAD_BACKOFF,
+    R2_MULTIPART_THRESHOLD
+)
+from app.metrics import registry, stage
 
 logger = logging.getLogger(__name__)
 
+# 默认 dashboard 图片在 R2 中的文件名
+DASHBOARD_KEY = "dashboard.png"
+
+# 对象元数据中记录内容 MD5 (分段上传的 ETag 不是 MD5)
+_MD5_METADATA_KEY = "content-md5"
+
+# 每个 key 最近一次成功上传 (或确认未变化) 的内容 MD5
+_uploaded_md5: dict[str, str] = {}
+_uploaded_lock = threading.Lock()
+
+r2_uploads = registry.counter(
+    "r2_uploads_total", "R2 uploads by result (uploaded / unchanged / failed)", ("result",)
+)
+
 
 def is_r2_configured() -> bool:
     """检查 R2 是否已配置必要的环境变量"""
@@ -19,27 +56,84 @@ def is_r2_configured() -> bool:
     return all([r2_account_id, r2_access_key, r2_secret_key])
 
 
+@lru_cache(maxsize=1)
 def get_r2_client():
     """
-    获取配置好的 boto3 S3 client 用于 R2 操作
-    
+    获取配置好的 boto3 S3 client 用于 R2 操作 (进程内只创建一次)
+
     Returns:
         boto3 S3 client 或 None (如果未配置)
     """
     if not is_r2_configured():
         return None
-    
+
     import boto3
-    
+    from botocore.config import Config
+
     r2_account_id = os.getenv("R2_ACCOUNT_ID")
     r2_access_key = os.getenv("R2_ACCESS_KEY_ID")
     r2_secret_key = os.getenv("R2_SECRET_ACCESS_KEY")
-    
+    endpoint_url = os.getenv("R2_ENDPOINT_URL") or f'https://{r2_account_id}.r2.cloudflarestorage.com'
+
     return boto3.client(
         's3',
-        endpoint_url=f'https://{r2_account_id}.r2.cloudflarestorage.com',
+        endpoint_url=endpoint_url,
         aws_access_key_id=r2_access_key,
         aws_secret_access_key=r2_secret_key,
+        region_name="auto",
+        config=Config(
+            max_pool_connections=max(10, R2_UPLOAD_CONCURRENCY * 2),
+            # 重试由 upload_to_r2 自行处理
+            retries={"max_attempts": 1, "mode": "standard"}
+        )
+    )
+
+
+def _bucket_name() -> str:
+    return os.getenv("R2_BUCKET_NAME", "file")
+
+
+def _remote_md5(client, bucket_name: str, key: str) -> Optional[str]:
+    """读取对象上记录的 MD5 (单段上传时 ETag 即 MD5)，对象不存在时返回 None"""
+    from botocore.exceptions import ClientError
+
+    try:
+        head = client.head_object(Bucket=bucket_name, Key=key)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return None
+        raise
+    md5 = head.get("Metadata", {}).get(_MD5_METADATA_KEY)
+    if md5:
+        return md5
+    etag = head.get("ETag", "").strip('"')
+    return etag if "-" not in etag else None
+
+
+def _put(client, bucket_name: str, data: bytes, key: str, md5: str, content_type: str, cache_control: str) -> None:
+    extra_args = {
+        "ContentType": content_type,
+        "CacheControl": cache_control,
+        "Metadata": {_MD5_METADATA_KEY: md5},
+    }
+    if len(data) < R2_MULTIPART_THRESHOLD:
+        client.put_object(
+            Bucket=bucket_name,
+            Key=key,
+            Body=data,
+            ContentMD5=base64.b64encode(bytes.fromhex(md5)).decode("ascii"),
+            **extra_args
+        )
+        return
+
+    from boto3.s3.transfer import TransferConfig
+
+    client.upload_fileobj(
+        BytesIO(data),
+        bucket_name,
+        key,
+        ExtraArgs=extra_args,
+        Config=TransferConfig(multipart_threshold=R2_MULTIPART_THRESHOLD, use_threads=False)
     )
 
 
@@ -47,55 +141,187 @@ def upload_to_r2(
     data: bytes,
     key: str,
     content_type: str = "application/octet-stream",
-    cache_control: str = "max-age=60"
+    cache_control: str = "max-age=60",
+    skip_unchanged: bool = True
 ) -> bool:
     """
-    上传数据到 Cloudflare R2
-    
+    上传数据到 Cloudflare R2 (阻塞调用，失败后按指数退避重试)
+
     Args:
         data: 要上传的字节数据
         key: R2 中的文件路径/名称
         content_type: MIME 类型
         cache_control: 缓存控制头
-        
+        skip_unchanged: 内容 MD5 与上次上传或 R2 上的对象相同时跳过
+
     Returns:
-        bool: 上传是否成功
+        bool: 上传是否成功 (跳过也视为成功)
     """
     client = get_r2_client()
     if client is None:
         logger.warning("R2 credentials not configured, skipping upload")
         return False
-    
-    bucket_name = os.getenv("R2_BUCKET_NAME", "file")
-    
-    try:
-        client.put_object(
-            Bucket=bucket_name,
-            Key=key,
-            Body=data,
-            ContentType=content_type,
-            CacheControl=cache_control
-        )
-        logger.info(f"Successfully uploaded {key} to R2 bucket: {bucket_name}")
-        return True
-    except Exception as e:
-        logger.error(f"Failed to upload {key} to R2: {str(e)}")
-        return False
+
+    bucket_name = _bucket_name()
+    md5 = hashlib.md5(data).hexdigest()
+    if skip_unchanged:
+        with _uploaded_lock:
+            if _uploaded_md5.get(key) == md5:
+                logger.debug(f"{key} unchanged since last upload, skipping")
+                r2_uploads.inc(result="unchanged")
+                return True
+
+    attempts = max(0, R2_UPLOAD_RETRIES) + 1
+    for attempt in range(1, attempts + 1):
+        try:
+            with stage("r2.upload"):
+                if skip_unchanged and _remote_md5(client, bucket_name, key) == md5:
+                    logger.info(f"{key} already up to date in R2 bucket: {bucket_name}")
+                    result = "unchanged"
+                else:
+                    _put(client, bucket_name, data, key, md5, content_type, cache_control)
+                    logger.info(f"Successfully uploaded {key} to R2 bucket: {bucket_name}")
+                    result = "uploaded"
+            with _uploaded_lock:
+                _uploaded_md5[key] = md5
+            r2_uploads.inc(result=result)
+            return True
+        except Exception as e:
+            if attempt == attempts:
+                logger.error(f"Failed to upload {key} to R2 after {attempts} attempts: {str(e)}")
+                r2_uploads.inc(result="failed")
+                return False
+            delay = R2_UPLOAD_BACKOFF * 2 ** (attempt - 1)
+            logger.warning(f"Upload of {key} failed ({str(e)}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+    return False
 
 
 def upload_dashboard_image(png_bytes: bytes) -> bool:
     """
     上传 dashboard 图片到 R2
-    
+
     Args:
         png_bytes: PNG 图片的字节数据
-        
+
     Returns:
         bool: 上传是否成功
     """
     return upload_to_r2(
         data=png_bytes,
-        key="dashboard.png",
+        key=DASHBOARD_KEY,
         content_type="image/png",
         cache_control="max-age=60"
     )
+
+
+@dataclass
+class UploadJob:
+    """等待上传的对象"""
+    data: bytes
+    key: str
+    content_type: str
+    cache_control: str
+
+
+class UploadQueue:
+    """
+    后台上传队列
+
+    submit 立即返回；同一个 key 还未开始上传时只保留最新的内容，
+    同一个 key 的上传按提交顺序依次执行。最多 concurrency 个上传同时在线程中执行。
+    """
+
+    def __init__(self, concurrency: int = R2_UPLOAD_CONCURRENCY):
+        self.concurrency = max(1, concurrency)
+        self._pending: dict[str, UploadJob] = {}
+        self._keys: asyncio.Queue[str] = asyncio.Queue()
+        self._workers: list[asyncio.Task] = []
+        self._key_locks: defaultdict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self.uploaded = 0
+        self.failed = 0
+
+    @property
+    def started(self) -> bool:
+        return bool(self._workers)
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def submit(
+        self,
+        data: bytes,
+        key: str,
+        content_type: str = "application/octet-stream",
+        cache_control: str = "max-age=60"
+    ) -> None:
+        """加入上传队列 (需在事件循环线程中调用)"""
+        if key not in self._pending:
+            self._keys.put_nowait(key)
+        self._pending[key] = UploadJob(data, key, content_type, cache_control)
+
+    def start(self) -> None:
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self, drain: bool = True) -> None:
+        """停止上传队列，drain=True 时先等待队列中的上传完成"""
+        if drain and self._workers:
+            await self._keys.join()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def _worker(self) -> None:
+        while True:
+            key = await self._keys.get()
+            try:
+                async with self._key_locks[key]:
+                    # 等到同一个 key 的上一次上传结束后再取最新的内容
+                    job = self._pending.pop(key, None)
+                    if job is None:
+                        continue
+                    ok = await asyncio.to_thread(upload_to_r2, job.data, job.key, job.content_type, job.cache_control)
+                if ok:
+                    self.uploaded += 1
+                else:
+                    self.failed += 1
+            except Exception:
+                self.failed += 1
+                logger.exception(f"Upload worker failed for {key}")
+            finally:
+                self._keys.task_done()
+
+
+# 全局上传队列，由 app lifespan 启动和关闭
+_upload_queue: Optional[UploadQueue] = None
+
+
+def get_upload_queue() -> Optional[UploadQueue]:
+    """获取已启动的全局上传队列 (未启动时返回 None)"""
+    return _upload_queue
+
+
+def start_upload_queue(**kwargs) -> UploadQueue:
+    """创建并启动全局上传队列"""
+    global _upload_queue
+    if _upload_queue is None:
+        _upload_queue = UploadQueue(**kwargs)
+    _upload_queue.start()
+    return _upload_queue
+
+
+async def stop_upload_queue() -> None:
+    """完成队列中的上传后停止"""
+    global _upload_queue
+    if _upload_queue is not None:
+        await _upload_queue.stop()
+        _upload_queue = None
+
+
+registry.collect(
+    "r2_upload_queue_pending", "Objects waiting in the upload queue",
+    lambda: _upload_queue.pending_count if _upload_queue is not None else 0
+)
@@ -8,51 +8,42 @@ Features:
 - Daily forecast (next 3 days)
 """
 
-import time
+import asyncio
+import logging
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Awaitable, Callable, Optional, TypeVar
 from dataclasses import dataclass
 
 import httpx
-import jwt
 
 from app.config import (
     QWEATHER_BASE_URL,
-    QWEATHER_PROJECT_ID,
-    QWEATHER_KEY_ID,
-    QWEATHER_PRIVATE_KEY,
     LOCATION,
-    LOCATION_NAME
+    LOCATION_NAME,
+    WEATHER_CALL_TIMEOUT,
+    CACHE_TTL_CURRENT_WEATHER,
+    CACHE_TTL_AIR_QUALITY,
+    CACHE_TTL_MINUTELY_RAIN,
+    CACHE_TTL_DAILY_FORECAST
 )
+from app.services.cache import upstream_cache
+from app.services.http_client import get_http_client
+from app.services.qweather_auth import token_provider
+from app.services.circuit_breaker import get_breaker
+from app.metrics import observe_upstream, stage
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
 
 
 def generate_jwt_token() -> str:
     """
-    Generate a JWT token for QWeather API authentication.
-    Uses EdDSA (Ed25519) algorithm as required by QWeather.
+    Get a JWT token for QWeather API authentication.
+    Uses EdDSA (Ed25519) algorithm as required by QWeather; the signed token
+    is cached and only re-signed shortly before it expires.
     """
-    now = int(time.time())
-
-    # Prepare private key (handle newlines in env var)
-    private_key = QWEATHER_PRIVATE_KEY.replace("\\n", "\n")
-
-    payload = {
-        "sub": QWEATHER_PROJECT_ID,
-        "iat": now - 30,  # 30 seconds in the past to handle clock skew
-        "exp": now + 900   # Valid for 15 minutes
-    }
-
-    headers = {
-        "kid": QWEATHER_KEY_ID
-    }
-
-    token = jwt.encode(
-        payload,
-        private_key,
-        algorithm="EdDSA",
-        headers=headers
-    )
-    return token
+    return token_provider.token()
 
 
 def get_auth_headers() -> dict:
@@ -104,6 +95,7 @@ class WeatherData:
     air: Optional[AirQuality]
     minutely: Optional[MinutelyRain]
     daily: list[DailyForecast]
+    stale_since: Optional[float] = None   # 上游故障时使用的旧数据中最早的获取时间 (Unix 时间戳)
 
 
 async def fetch_current_weather(location: str = LOCATION) -> CurrentWeather:
@@ -111,8 +103,18 @@ async def fetch_current_weather(location: str = LOCATION) -> CurrentWeather:
     # 使用格点天气 API 路径
     url = f"{QWEATHER_BASE_URL}/grid-weather/now"
 
-    async with httpx.AsyncClient(follow_redirects=True) as client:
-        try:
+    client = get_http_client()
+    try:
+        resp = await client.get(
+            url,
+            headers=get_auth_headers(),
+            params={"location": location},
+            timeout=10.0
+        )
+        data = resp.json()
+        # 如果格点天气返回 403 或 404，则回退到普通实时天气
+        if data.get("code") in ["403", "404"]:
+            url = f"{QWEATHER_BASE_URL}/weather/now"
             resp = await client.get(
                 url,
                 headers=get_auth_headers(),
@@ -120,54 +122,44 @@ async def fetch_current_weather(location: str = LOCATION) -> CurrentWeather:
                 timeout=10.0
             )
             data = resp.json()
-            # 如果格点天气返回 403 或 404，则回退到普通实时天气
-            if data.get("code") in ["403", "404"]:
-                url = f"{QWEATHER_BASE_URL}/weather/now"
-                resp = await client.get(
-                    url,
-                    headers=get_auth_headers(),
-                    params={"location": location},
-                    timeout=10.0
-                )
-                data = resp.json()
-
-            if data.get("code") == "200":
-                now = data["now"]
-
-                # 提取时间并转为北京时间 (处理 2024-01-20T02:00+00:00 格式)
-                obs_time_raw = now.get("obsTime", "")
-                obs_time = "未知"
-                if obs_time_raw:
-                    try:
-                        # 解析 ISO 格式时间 (例如 2026-01-20T02:00+00:00)
-                        # 虽然 Python 3.7+ fromisoformat 支持，但处理末尾的 +00:00 兼容性更好
-                        dt_utc = datetime.fromisoformat(obs_time_raw.replace('Z', '+00:00'))
-                        # 转为北京时间 (+8h)
-                        dt_beijing = dt_utc + timedelta(hours=8)
-                        obs_time = dt_beijing.strftime("%H:%M")
-                    except (ValueError, TypeError, IndexError):
-                        # 处理时间解析失败的多种可能
-                        obs_time = obs_time_raw[11:16] if len(obs_time_raw) >= 16 else "未知"
-
-                return CurrentWeather(
-                    temp=now["temp"],
-                    feels_like=now["feelsLike"],
-                    text=now["text"],
-                    icon=now["icon"],
-                    wind_dir=now["windDir"],
-                    wind_scale=now["windScale"],
-                    obs_time=obs_time
-                )
-            else:
-                return CurrentWeather(
-                    temp="N/A", feels_like="N/A", text="Error", icon="999",
-                    wind_dir="", wind_scale="", obs_time="N/A"
-                )
-        except (httpx.HTTPError, KeyError, ValueError, TypeError):
+
+        if data.get("code") == "200":
+            now = data["now"]
+
+            # 提取时间并转为北京时间 (处理 2024-01-20T02:00+00:00 格式)
+            obs_time_raw = now.get("obsTime", "")
+            obs_time = "未知"
+            if obs_time_raw:
+                try:
+                    # 解析 ISO 格式时间 (例如 2026-01-20T02:00+00:00)
+                    # 虽然 Python 3.7+ fromisoformat 支持，但处理末尾的 +00:00 兼容性更好
+                    dt_utc = datetime.fromisoformat(obs_time_raw.replace('Z', '+00:00'))
+                    # 转为北京时间 (+8h)
+                    dt_beijing = dt_utc + timedelta(hours=8)
+                    obs_time = dt_beijing.strftime("%H:%M")
+                except (ValueError, TypeError, IndexError):
+                    # 处理时间解析失败的多种可能
+                    obs_time = obs_time_raw[11:16] if len(obs_time_raw) >= 16 else "未知"
+
+            return CurrentWeather(
+                temp=now["temp"],
+                feels_like=now["feelsLike"],
+                text=now["text"],
+                icon=now["icon"],
+                wind_dir=now["windDir"],
+                wind_scale=now["windScale"],
+                obs_time=obs_time
+            )
+        else:
             return CurrentWeather(
                 temp="N/A", feels_like="N/A", text="Error", icon="999",
                 wind_dir="", wind_scale="", obs_time="N/A"
             )
+    except (httpx.HTTPError, KeyError, ValueError, TypeError):
+        return CurrentWeather(
+            temp="N/A", feels_like="N/A", text="Error", icon="999",
+            wind_dir="", wind_scale="", obs_time="N/A"
+        )
 
 
 async def fetch_air_quality(location: str = LOCATION) -> Optional[AirQuality]:
@@ -181,45 +173,45 @@ async def fetch_air_quality(location: str = LOCATION) -> Optional[AirQuality]:
         # 如果不是坐标格式，回退到老接口尝试
         return await _fetch_air_quality_v7(location)
 
-    async with httpx.AsyncClient() as client:
-        # 注意: 此接口路径不含 /v7
-        api_host = QWEATHER_BASE_URL.split('/v7', maxsplit=1)[0]
-        url = f"{api_host}/airquality/v1/current/{lat}/{lon}"
+    client = get_http_client()
+    # 注意: 此接口路径不含 /v7
+    api_host = QWEATHER_BASE_URL.split('/v7', maxsplit=1)[0]
+    url = f"{api_host}/airquality/v1/current/{lat}/{lon}"
 
-        resp = await client.get(url, headers=get_auth_headers())
-        data = resp.json()
+    resp = await client.get(url, headers=get_auth_headers(), timeout=5.0)
+    data = resp.json()
 
-        if resp.status_code != 200:
-            return None
+    if resp.status_code != 200:
+        return None
 
-        # 寻找中国标准 (cn-mee)
-        indexes = data.get("indexes", [])
-        cn_index = next((i for i in indexes if i.get("code") == "cn-mee"), None)
+    # 寻找中国标准 (cn-mee)
+    indexes = data.get("indexes", [])
+    cn_index = next((i for i in indexes if i.get("code") == "cn-mee"), None)
 
-        if not cn_index:
-            # 如果没找到，取第一个
-            cn_index = indexes[0] if indexes else {}
+    if not cn_index:
+        # 如果没找到，取第一个
+        cn_index = indexes[0] if indexes else {}
 
-        return AirQuality(
-            aqi=str(cn_index.get("aqi", "N/A")),
-            category=cn_index.get("category", "")
-        )
+    return AirQuality(
+        aqi=str(cn_index.get("aqi", "N/A")),
+        category=cn_index.get("category", "")
+    )
 
 
 async def _fetch_air_quality_v7(location: str) -> Optional[AirQuality]:
     """老版本 v7 接口，作为回退或兼容逻辑"""
     try:
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(
-                f"{QWEATHER_BASE_URL}/air/now",
-                headers=get_auth_headers(),
-                params={"location": location},
-                timeout=5.0
-            )
-            data = resp.json()
-            if data.get("code") == "200":
-                now = data.get("now", {})
-                return AirQuality(aqi=now.get("aqi", "N/A"), category=now.get("category", ""))
+        client = get_http_client()
+        resp = await client.get(
+            f"{QWEATHER_BASE_URL}/air/now",
+            headers=get_auth_headers(),
+            params={"location": location},
+            timeout=5.0
+        )
+        data = resp.json()
+        if data.get("code") == "200":
+            now = data.get("now", {})
+            return AirQuality(aqi=now.get("aqi", "N/A"), category=now.get("category", ""))
     except (httpx.HTTPError, ValueError, KeyError):
         return None
     return None
@@ -228,20 +220,20 @@ async def _fetch_air_quality_v7(location: str) -> Optional[AirQuality]:
 async def fetch_minutely_rain(location: str = LOCATION) -> Optional[MinutelyRain]:
     """获取分钟级降水预报"""
     try:
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(
-                f"{QWEATHER_BASE_URL}/minutely/5m",
-                headers=get_auth_headers(),
-                params={"location": location},
-                timeout=5.0
-            )
-            data = resp.json()
+        client = get_http_client()
+        resp = await client.get(
+            f"{QWEATHER_BASE_URL}/minutely/5m",
+            headers=get_auth_headers(),
+            params={"location": location},
+            timeout=5.0
+        )
+        data = resp.json()
 
-            if data.get("code") != "200":
-                return None
+        if data.get("code") != "200":
+            return None
 
-            summary = data.get("summary", "未来2小时天气情况未知")
-            return MinutelyRain(summary=summary)
+        summary = data.get("summary", "未来2小时天气情况未知")
+        return MinutelyRain(summary=summary)
     except (httpx.HTTPError, ValueError, KeyError):
         return None
 
@@ -249,44 +241,118 @@ async def fetch_minutely_rain(location: str = LOCATION) -> Optional[MinutelyRain
 async def fetch_daily_forecast(location: str = LOCATION, days: int = 3) -> list[DailyForecast]:
     """获取逐日天气预报"""
     try:
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(
-                f"{QWEATHER_BASE_URL}/weather/{days}d",
-                headers=get_auth_headers(),
-                params={"location": location},
-                timeout=5.0
-            )
-            data = resp.json()
+        client = get_http_client()
+        resp = await client.get(
+            f"{QWEATHER_BASE_URL}/weather/{days}d",
+            headers=get_auth_headers(),
+            params={"location": location},
+            timeout=5.0
+        )
+        data = resp.json()
 
-            if data.get("code") != "200":
-                return []
-
-            forecasts = []
-            for day in data.get("daily", []):
-                forecasts.append(DailyForecast(
-                    date=day["fxDate"][5:],  # 只取月-日
-                    text_day=day["textDay"],
-                    icon_day=day["iconDay"],
-                    temp_min=day["tempMin"],
-                    temp_max=day["tempMax"]
-                ))
-            return forecasts
+        if data.get("code") != "200":
+            return []
+
+        forecasts = []
+        for day in data.get("daily", []):
+            forecasts.append(DailyForecast(
+                date=day["fxDate"][5:],  # 只取月-日
+                text_day=day["textDay"],
+                icon_day=day["iconDay"],
+                temp_min=day["tempMin"],
+                temp_max=day["tempMax"]
+            ))
+        return forecasts
     except (httpx.HTTPError, ValueError, KeyError):
         return []
 
 
-async def get_weather_data(location: str = LOCATION) -> WeatherData:
-    """获取所有天气数据"""
-    current = await fetch_current_weather(location)
-    air = await fetch_air_quality(location)
-    minutely = await fetch_minutely_rain(location)
-    daily = await fetch_daily_forecast(location)
+def _unavailable_current_weather() -> CurrentWeather:
+    """实时天气获取失败时的占位数据"""
+    return CurrentWeather(
+        temp="N/A", feels_like="N/A", text="Error", icon="999",
+        wind_dir="", wind_scale="", obs_time="N/A"
+    )
+
+
+async def _guarded(name: str, coro: Awaitable[T], default: T) -> T:
+    """为单个接口加总超时，任何失败都返回默认值，不影响其他接口"""
+    try:
+        return await asyncio.wait_for(coro, timeout=WEATHER_CALL_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning(f"Weather call {name} timed out after {WEATHER_CALL_TIMEOUT}s")
+    except Exception as e:
+        logger.warning(f"Weather call {name} failed: {e!r}")
+    return default
+
+
+async def _fetch_observed(
+    name: str,
+    location: str,
+    fetch: Callable[[str], Awaitable[T]],
+    default: T,
+    is_valid: Callable[[T], bool]
+) -> T:
+    """请求上游并记录耗时和成功/失败 (返回占位数据即视为失败)；熔断时直接返回占位数据"""
+    # 按位置熔断：某个位置被接口拒绝时不影响其他设备
+    breaker = get_breaker(f"weather:{name}:{location}")
+    if not breaker.allow():
+        return default
+    try:
+        with stage(f"weather.{name}"):
+            value = await _guarded(name, fetch(location), default)
+    except asyncio.CancelledError:
+        breaker.release()
+        raise
+    ok = is_valid(value)
+    breaker.record(ok)
+    observe_upstream(f"weather.{name}", ok)
+    return value
+
+
+def _cache_key(name: str, location: str) -> str:
+    return f"weather.{name}:{location}"
+
+
+async def _cached(
+    name: str,
+    location: str,
+    fetch: Callable[[str], Awaitable[T]],
+    default: T,
+    ttl: float,
+    is_valid: Callable[[T], bool]
+) -> T:
+    """按接口和位置缓存；失败时的占位数据不会写入缓存，有旧数据时返回旧数据"""
+    return await upstream_cache.get(
+        _cache_key(name, location),
+        lambda: _fetch_observed(name, location, fetch, default, is_valid),
+        ttl=ttl,
+        is_valid=is_valid
+    )
+
+
+async def get_weather_data(location: str = LOCATION, location_name: str = LOCATION_NAME) -> WeatherData:
+    """获取所有天气数据 (四个接口并发请求，耗时取决于最慢的一个)"""
+    current, air, minutely, daily = await asyncio.gather(
+        _cached("current", location, fetch_current_weather, _unavailable_current_weather(),
+                CACHE_TTL_CURRENT_WEATHER, lambda v: v.text != "Error"),
+        _cached("air", location, fetch_air_quality, None,
+                CACHE_TTL_AIR_QUALITY, lambda v: v is not None),
+        _cached("minutely", location, fetch_minutely_rain, None,
+                CACHE_TTL_MINUTELY_RAIN, lambda v: v is not None),
+        _cached("daily", location, fetch_daily_forecast, [],
+                CACHE_TTL_DAILY_FORECAST, bool)
+    )
+
+    # 任一接口正在使用旧数据时，记录其中最早的获取时间供模板显示
+    degraded = [upstream_cache.degraded_since(_cache_key(name, location)) for name in ("current", "air", "minutely", "daily")]
 
     # 获取地理位置名称，优先使用配置中的名称
     return WeatherData(
-        location_name=LOCATION_NAME,
+        location_name=location_name,
         current=current,
         air=air,
         minutely=minutely,
-        daily=daily
+        daily=daily,
+        stale_since=min((t for t in degraded if t is not None), default=None)
     )
@@ -0,0 +1,170 @@
+"""
+设备遥测存储
+
+/device/sync 每次同步记录一行 (时间、设备、电量、同步结果、下次唤醒秒数) 到本地 SQLite 文件 (TELEMETRY_DB)，
+并保存每台设备的状态 (最近一次同步、电量、距上次全刷的局刷次数)，重启后继续计数。
+
+设备状态常驻内存，请求中只读内存；写入在线程中执行，不阻塞事件循环。
+超过 TELEMETRY_RETENTION_DAYS 天的同步记录在启动时和每写入一定条数后清理。
+"""
+
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Optional
+
+from app.config import TELEMETRY_DB, TELEMETRY_RETENTION_DAYS
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# 每写入多少条同步记录清理一次过期记录
+_PRUNE_EVERY = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS syncs (
+    ts REAL NOT NULL,
+    device TEXT NOT NULL,
+    battery INTEGER,
+    result TEXT NOT NULL,
+    wakeup_seconds INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS syncs_device_ts ON syncs (device, ts);
+CREATE TABLE IF NOT EXISTS devices (
+    device TEXT PRIMARY KEY,
+    last_seen REAL NOT NULL,
+    battery INTEGER,
+    partial_refreshes INTEGER NOT NULL
+);
+"""
+
+device_syncs = registry.counter(
+    "device_syncs_total", "/device/sync requests by result (unchanged / partial / full)", ("result",)
+)
+
+
+@dataclass
+class DeviceState:
+    """设备最近一次同步的状态"""
+    device: str
+    last_seen: float = 0.0            # Unix 时间戳
+    battery: Optional[int] = None     # 电量百分比
+    partial_refreshes: int = 0        # 距上次全刷的局刷次数
+
+
+class TelemetryStore:
+    """SQLite 中的同步记录 + 内存中的设备状态"""
+
+    def __init__(self, path: Optional[str] = TELEMETRY_DB or None, retention_days: int = TELEMETRY_RETENTION_DAYS):
+        self.path = Path(path) if path else None
+        self.retention = retention_days * 86400
+        self._states: dict[str, DeviceState] = {}
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def open(self) -> None:
+        """打开 (或创建) 数据库，恢复设备状态并清理过期记录"""
+        with self._lock:
+            if self._conn is not None:
+                return
+            try:
+                if self.path is not None:
+                    self.path.parent.mkdir(parents=True, exist_ok=True)
+                # 写入在线程池中执行，由 _lock 保证同一时间只有一个线程使用连接
+                self._conn = sqlite3.connect(
+                    str(self.path) if self.path is not None else ":memory:", check_same_thread=False
+                )
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.executescript(_SCHEMA)
+                rows = self._conn.execute("SELECT device, last_seen, battery, partial_refreshes FROM devices")
+                self._states = {row[0]: DeviceState(*row) for row in rows}
+                self._prune()
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to open telemetry store {self.path}: {e}, keeping telemetry in memory only")
+                self._conn = None
+                return
+        logger.info(f"Loaded {len(self._states)} devices from telemetry store {self.path or ':memory:'}")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def state(self, device: str) -> DeviceState:
+        """设备的当前状态 (从未同步过时为初始状态)"""
+        return self._states.get(device) or DeviceState(device=device)
+
+    def states(self) -> dict[str, dict]:
+        """设备 -> 最近一次同步的状态"""
+        return {device: asdict(state) for device, state in sorted(self._states.items())}
+
+    async def record(self, state: DeviceState, result: str, wakeup_seconds: int) -> None:
+        """更新设备状态并写入一条同步记录"""
+        self._states[state.device] = state
+        device_syncs.inc(result=result)
+        await asyncio.to_thread(self._write, state, result, wakeup_seconds)
+
+    def _write(self, state: DeviceState, result: str, wakeup_seconds: int) -> None:
+        with self._lock:
+            if self._conn is None:
+                return
+            try:
+                with self._conn:
+                    self._conn.execute(
+                        "INSERT INTO syncs (ts, device, battery, result, wakeup_seconds) VALUES (?, ?, ?, ?, ?)",
+                        (state.last_seen, state.device, state.battery, result, wakeup_seconds)
+                    )
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO devices (device, last_seen, battery, partial_refreshes) "
+                        "VALUES (?, ?, ?, ?)",
+                        (state.device, state.last_seen, state.battery, state.partial_refreshes)
+                    )
+                self._writes += 1
+                if self._writes % _PRUNE_EVERY == 0:
+                    self._prune()
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to write telemetry for {state.device}: {e}")
+
+    def _prune(self) -> None:
+        """删除过期的同步记录 (调用方持有 _lock)"""
+        with self._conn:
+            deleted = self._conn.execute("DELETE FROM syncs WHERE ts < ?", (time.time() - self.retention,)).rowcount
+        if deleted:
+            logger.info(f"Pruned {deleted} telemetry records older than {self.retention // 86400} days")
+
+    def history(self, device: str, limit: int = 100) -> list[dict]:
+        """设备最近的同步记录 (新的在前)"""
+        with self._lock:
+            if self._conn is None:
+                return []
+            rows = self._conn.execute(
+                "SELECT ts, battery, result, wakeup_seconds FROM syncs WHERE device = ? ORDER BY ts DESC LIMIT ?",
+                (device, limit)
+            ).fetchall()
+        return [
+            {"ts": ts, "battery": battery, "result": result, "wakeup_seconds": wakeup_seconds}
+            for ts, battery, result, wakeup_seconds in rows
+        ]
+
+
+# 全局设备遥测存储，由 app lifespan 打开和关闭
+telemetry_store = TelemetryStore()
+
+registry.collect(
+    "device_battery_percent", "Battery level reported by the device in its last sync",
+    lambda: {
+        (device,): state.battery for device, state in telemetry_store._states.items() if state.battery is not None
+    },
+    labelnames=("device",)
+)
+registry.collect(
+    "device_last_sync_timestamp_seconds", "Unix time of the device's last sync",
+    lambda: {(device,): state.last_seen for device, state in telemetry_store._states.items()},
+    labelnames=("device",)
+)
@@ -0,0 +1,253 @@
+"""
+提前渲染时间线 (render-ahead)
+
+设备端用 next-wakeup 按 cron 计划计算下一次唤醒，服务端按同一个计划 (DeviceConfig.schedule / timezone)
+就能知道每台设备什么时候来取图。页眉中的日期和更新时间只取决于唤醒时间，因此可以提前渲染：
+
+- 为每台设备渲染接下来 TIMELINE_AHEAD 次唤醒的图片，页眉为各自的唤醒时间，数据为当时缓存中的数据
+- 每次唤醒前 PRERENDER_LEAD_SECONDS 秒用最新数据重新渲染该帧 (just-in-time)
+- /dashboard/next 返回设备本次唤醒的帧，Expires 为下一次唤醒时间，
+  CDN / R2 边缘缓存可以安全地缓存到那时，命中缓存的请求不再触达服务
+
+唤醒后 TIMELINE_GRACE_SECONDS 秒内 (设备联网需要时间) 仍返回该次唤醒的帧，之后切换到下一次唤醒。
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Optional
+from zoneinfo import ZoneInfo
+
+from app.config import PRERENDER_LEAD_SECONDS, TIMELINE_AHEAD, TIMELINE_GRACE_SECONDS
+from app.cron import CronSchedule
+from app.devices import DeviceConfig
+from app.pipeline import render_dashboard_png
+from app.render_gate import render_gate
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# 渲染失败后重试的间隔
+_RETRY_DELAY = timedelta(seconds=30)
+
+timeline_requests = registry.counter(
+    "render_timeline_requests_total", "/dashboard/next requests served from a pre-rendered frame (hit) or not (miss)",
+    ("result",)
+)
+
+
+@dataclass
+class TimelineFrame:
+    """某台设备某次唤醒的图片"""
+    wakeup: datetime
+    png_bytes: bytes
+    rendered_at: datetime
+    just_in_time: bool    # 已在唤醒前 lead 秒内用最新数据渲染，不会再变化
+    expires: datetime     # 内容可能变化的时间：已定稿为下一次唤醒，否则为定稿渲染的时间
+
+
+class RenderTimeline:
+    """按设备唤醒计划提前渲染的图片"""
+
+    def __init__(
+        self,
+        devices: list[DeviceConfig],
+        ahead: int = TIMELINE_AHEAD,
+        lead_seconds: int = PRERENDER_LEAD_SECONDS,
+        grace_seconds: int = TIMELINE_GRACE_SECONDS,
+        render: Callable[[DeviceConfig, datetime], Awaitable[bytes]] = render_dashboard_png
+    ):
+        self.devices = {device.id: device for device in devices}
+        self.ahead = max(1, ahead)
+        self.lead = timedelta(seconds=lead_seconds)
+        self.grace = timedelta(seconds=grace_seconds)
+        self._render = render
+        self._schedules = {device.id: CronSchedule.parse(device.schedule) for device in devices}
+        self._timezones = {device.id: ZoneInfo(device.timezone) for device in devices}
+        self._frames: dict[str, dict[datetime, TimelineFrame]] = {device.id: {} for device in devices}
+
+        self.last_error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def wakeups(self, device_id: str, now: datetime) -> list[datetime]:
+        """设备本次 (或下一次) 唤醒起的 ahead 次唤醒时间"""
+        schedule = self._schedules[device_id]
+        after = (now - self.grace).astimezone(self._timezones[device_id])
+        times = []
+        for wakeup in schedule.iter_after(after):
+            times.append(wakeup)
+            if len(times) >= self.ahead:
+                return times
+        return times
+
+    def _store(self, device_id: str, wakeup: datetime, png_bytes: bytes, now: datetime) -> TimelineFrame:
+        """保存渲染结果；在唤醒前 lead 秒内渲染的帧已使用最新数据，有效期到下一次唤醒"""
+        just_in_time = now >= wakeup - self.lead
+        if just_in_time:
+            expires = self._schedules[device_id].next_after(wakeup)
+        else:
+            expires = wakeup - self.lead
+        frame = TimelineFrame(
+            wakeup=wakeup,
+            png_bytes=png_bytes,
+            rendered_at=now,
+            just_in_time=just_in_time,
+            expires=expires
+        )
+        self._frames[device_id][wakeup] = frame
+        return frame
+
+    async def frame(self, device_id: str, now: Optional[datetime] = None) -> TimelineFrame:
+        """
+        设备本次唤醒的帧；尚未渲染时 (刚启动、后台渲染失败) 在请求中渲染
+
+        Raises:
+            KeyError: 设备不在时间线中
+            RenderOverloaded: 排队的渲染过多
+        """
+        device = self.devices[device_id]
+        now = now or datetime.now(timezone.utc)
+        wakeup = self.wakeups(device_id, now)[0]
+        frame = self._frames[device_id].get(wakeup)
+        if frame is not None:
+            timeline_requests.inc(result="hit")
+            return frame
+
+        timeline_requests.inc(result="miss")
+        png_bytes = await render_gate.run(
+            ("timeline", device.render_group, wakeup), lambda: self._render(device, wakeup)
+        )
+        return self._store(device_id, wakeup, png_bytes, datetime.now(timezone.utc))
+
+    async def update(self, now: Optional[datetime] = None) -> None:
+        """
+        丢弃已过去的唤醒，渲染进入窗口的唤醒，并重新渲染即将唤醒 (lead 秒内) 的帧
+
+        输出完全相同的设备在同一唤醒时间只渲染一次。渲染经过全局渲染闸门，与 /dashboard 的实时渲染
+        共享并发上限，并与同一帧的请求内渲染合并；排队过多被拒绝的帧稍后重试。
+        """
+        now = now or datetime.now(timezone.utc)
+        pending: dict[tuple, list[tuple[str, datetime]]] = {}
+        for device_id, device in self.devices.items():
+            wakeups = self.wakeups(device_id, now)
+            frames = self._frames[device_id]
+            for wakeup in [wakeup for wakeup in frames if wakeup not in wakeups]:
+                del frames[wakeup]
+            for wakeup in wakeups:
+                frame = frames.get(wakeup)
+                if frame is None or (not frame.just_in_time and now >= wakeup - self.lead):
+                    pending.setdefault((device.render_group, wakeup), []).append((device_id, wakeup))
+        if not pending:
+            return
+
+        # 同时提交到闸门的后台渲染不超过其并发上限，不占满排队名额，实时请求仍可排队
+        submitted = asyncio.Semaphore(render_gate.max_concurrent)
+
+        async def render(members: list[tuple[str, datetime]]) -> bytes:
+            device_id, wakeup = members[0]
+            device = self.devices[device_id]
+            async with submitted:
+                return await render_gate.run(
+                    ("timeline", device.render_group, wakeup), lambda: self._render(device, wakeup)
+                )
+
+        results = await asyncio.gather(*(render(members) for members in pending.values()), return_exceptions=True)
+        failed = 0
+        for members, result in zip(pending.values(), results):
+            if isinstance(result, BaseException):
+                failed += 1
+                logger.error(f"Timeline render for {members[0][1].isoformat()} failed: {result!r}")
+                continue
+            for device_id, wakeup in members:
+                self._store(device_id, wakeup, result, now)
+        self.last_error = f"{failed} of {len(pending)} timeline renders failed" if failed else None
+        logger.info(f"Rendered {len(pending) - failed} timeline frames for {len(self.devices)} devices")
+
+    def next_update_at(self, now: datetime) -> datetime:
+        """下一次需要更新的时间：某帧需要定稿，或某台设备切换到下一次唤醒"""
+        candidates = []
+        for device_id in self.devices:
+            wakeups = self.wakeups(device_id, now)
+            candidates.append(wakeups[0] + self.grace)
+            frames = self._frames[device_id]
+            for wakeup in wakeups:
+                frame = frames.get(wakeup)
+                if frame is not None and frame.just_in_time:
+                    continue
+                # 缺少的帧和已过定稿时间的帧是上一轮渲染失败留下的，稍后重试
+                due = wakeup - self.lead if frame is not None else now
+                candidates.append(due if due > now else now + _RETRY_DELAY)
+        return min(candidates)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.update()
+            except Exception as e:
+                self.last_error = str(e)
+                logger.exception("Timeline update failed")
+            now = datetime.now(timezone.utc)
+            await asyncio.sleep(max(1.0, (self.next_update_at(now) - now).total_seconds()))
+
+    @property
+    def frame_count(self) -> int:
+        return sum(len(frames) for frames in self._frames.values())
+
+    def status(self) -> dict:
+        """各设备已渲染的唤醒时间 (* 表示已用最新数据定稿)"""
+        return {
+            "devices": {
+                device_id: [
+                    wakeup.isoformat() + ("*" if frame.just_in_time else "")
+                    for wakeup, frame in sorted(frames.items())
+                ]
+                for device_id, frames in self._frames.items()
+            },
+            "last_error": self.last_error,
+        }
+
+
+# 全局时间线，由 app lifespan 启动和关闭
+_timeline: Optional[RenderTimeline] = None
+
+
+def get_timeline() -> Optional[RenderTimeline]:
+    """获取已启动的全局时间线 (未启用时返回 None)"""
+    return _timeline
+
+
+def start_timeline(devices: list[DeviceConfig], **kwargs) -> RenderTimeline:
+    """创建并启动全局时间线"""
+    global _timeline
+    if _timeline is None:
+        _timeline = RenderTimeline(devices, **kwargs)
+    _timeline.start()
+    return _timeline
+
+
+async def stop_timeline() -> None:
+    """停止全局时间线"""
+    global _timeline
+    if _timeline is not None:
+        await _timeline.stop()
+        _timeline = None
+
+
+registry.collect(
+    "render_timeline_frames", "Pre-rendered frames held for upcoming device wakeups",
+    lambda: _timeline.frame_count if _timeline is not None else 0
+)
@@ -0,0 +1 @@
+# Render pipeline benchmarks (run from server/: python -m benchmarks.<name>)
@@ -0,0 +1,87 @@
+"""
+16 级量化方式基准：posterize / bayer / floyd-steinberg
+
+对每种量化方式比较量化耗时、最终 PNG 大小，以及与对比度增强后的连续灰度图相比的画质：
+- PSNR:        逐像素峰值信噪比
+- blurred PSNR: 两者都做半径 1px 高斯模糊后再计算，近似人眼在阅读距离上看到的效果，
+                抖动的优势主要体现在这一项
+
+static/dashboard.png 和 example/dashboard.png 已经是量化后的图片，只作为参考；
+Pillow 直接渲染的样例数据和合成渐变图保留了完整的抗锯齿灰度，更能体现差异。
+
+用法 (在 server/ 目录下):
+    python -m benchmarks.dithering --iterations 30
+"""
+
+import argparse
+import math
+import time
+from io import BytesIO
+
+from PIL import Image, ImageChops, ImageFilter, ImageStat
+
+from app.pipeline import STATIC_DIR
+from app.renderer.dither import DITHER_MODES, dither
+from app.renderer.pillow_renderer import draw_dashboard
+from app.renderer.screenshot import _contrast_lut, grayscale_postprocess
+from benchmarks.fixtures import sample_weather, sample_news
+from benchmarks.postprocess import sample_inputs
+from benchmarks.stats import summarize
+
+
+def psnr(reference: Image.Image, image: Image.Image) -> float:
+    histogram = ImageChops.difference(reference, image).histogram()
+    mse = sum(count * value * value for value, count in enumerate(histogram)) / (reference.width * reference.height)
+    return math.inf if mse == 0 else 10 * math.log10(255 * 255 / mse)
+
+
+def quality_inputs() -> dict[str, Image.Image]:
+    """后处理前的 800x600 L 模式图片"""
+    inputs = {}
+    static_sample = STATIC_DIR / "dashboard.png"
+    if static_sample.exists():
+        # 竖屏成品图，转回横屏
+        inputs["static/dashboard.png"] = Image.open(static_sample).convert("L").transpose(Image.Transpose.ROTATE_270)
+    for name, data in sample_inputs().items():
+        if name != "example/dashboard.png" or not static_sample.exists():
+            inputs[name] = Image.open(BytesIO(data)).convert("L")
+    inputs["pillow fixture"] = draw_dashboard(sample_weather(), sample_news())
+    return inputs
+
+
+def main(iterations: int) -> None:
+    for name, img in quality_inputs().items():
+        print(f"{name}:")
+        # 参考图：对比度增强后、量化前的连续灰度
+        mean = int(ImageStat.Stat(img).mean[0] + 0.5)
+        reference = img.point(_contrast_lut(mean))
+        blurred_reference = reference.filter(ImageFilter.GaussianBlur(1))
+
+        output = BytesIO()
+        img.save(output, format="PNG")
+        data = output.getvalue()
+
+        for mode in DITHER_MODES:
+            samples = []
+            for _ in range(iterations):
+                start = time.perf_counter()
+                quantized = dither(reference, mode)
+                samples.append((time.perf_counter() - start) * 1000)
+            blurred = quantized.filter(ImageFilter.GaussianBlur(1))
+            # 抖动噪点会降低 PNG 压缩率，一并输出最终 PNG 大小和完整后处理耗时
+            start = time.perf_counter()
+            png_bytes = grayscale_postprocess(data, dither_mode=mode)
+            total_ms = (time.perf_counter() - start) * 1000
+            print(
+                f"  {summarize(mode, samples)}  "
+                f"PSNR={psnr(reference, quantized):6.2f}dB  "
+                f"blurred PSNR={psnr(blurred_reference, blurred):6.2f}dB  "
+                f"png={len(png_bytes):7d}B ({total_ms:.0f}ms with encoding)"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=30)
+    args = parser.parse_args()
+    main(args.iterations)
@@ -0,0 +1,59 @@
+"""
+基准测试用的固定输入
+
+提供与线上结构一致的天气/新闻样例数据，渲染结果不依赖任何外部 API。
+"""
+
+from app.services.weather import (
+    WeatherData,
+    CurrentWeather,
+    AirQuality,
+    MinutelyRain,
+    DailyForecast
+)
+from app.services.news import NewsData, NewsItem
+
+
+def sample_weather() -> WeatherData:
+    """固定的天气样例"""
+    return WeatherData(
+        location_name="太仓",
+        current=CurrentWeather(
+            temp="23", feels_like="25", text="多云", icon="101",
+            wind_dir="东南风", wind_scale="3", obs_time="14:30"
+        ),
+        air=AirQuality(aqi="42", category="优"),
+        minutely=MinutelyRain(summary="未来两小时无降水"),
+        daily=[
+            DailyForecast(date="10-16", text_day="多云", icon_day="101", temp_min="18", temp_max="26"),
+            DailyForecast(date="10-17", text_day="小雨", icon_day="305", temp_min="17", temp_max="22"),
+            DailyForecast(date="10-18", text_day="晴", icon_day="100", temp_min="16", temp_max="24"),
+        ]
+    )
+
+
+def sample_news() -> NewsData:
+    """固定的新闻样例"""
+    return NewsData(
+        domestic=[
+            NewsItem(title="长三角一体化示范区发布新一轮重点项目清单", link=""),
+            NewsItem(title="多地启动秋冬季大气污染综合治理攻坚行动", link=""),
+            NewsItem(title="国家统计局发布前三季度国民经济运行数据", link=""),
+            NewsItem(title="沪苏通铁路二期工程取得阶段性进展", link=""),
+            NewsItem(title="全国秋粮收获进度过七成", link=""),
+        ],
+        international=[
+            NewsItem(title="[国际] Leaders meet to discuss regional security framework", link=""),
+            NewsItem(title="[国际] Flood relief efforts continue across the region", link=""),
+            NewsItem(title="[财经] Global markets steady ahead of central bank decisions", link=""),
+            NewsItem(title="[财经] Oil prices edge higher on supply concerns", link=""),
+            NewsItem(title="[科技] Chipmakers announce new manufacturing investments", link=""),
+            NewsItem(title="[科技] Researchers unveil low-power display prototype", link=""),
+        ]
+    )
+
+
+def fixture_html() -> str:
+    """使用样例数据渲染仪表盘 HTML"""
+    from app.renderer.template import render_dashboard_html
+    return render_dashboard_html(sample_weather(), sample_news())
@@ -0,0 +1,33 @@
+"""
+字体加载基准：CDN 字体 vs 内存中的本地字体
+
+用法 (在 server/ 目录下，需先运行 build_fonts.py):
+    python -m benchmarks.font_loading --renders 20
+"""
+
+import argparse
+import asyncio
+
+from app.renderer import browser_pool
+from benchmarks.fixtures import fixture_html
+from benchmarks.render_latency import run_renders
+from benchmarks.stats import summarize
+
+
+async def main(renders: int) -> None:
+    html = fixture_html()
+
+    for name, local_assets in (("cdn fonts", False), ("local fonts", True)):
+        await browser_pool.start_browser_pool(size=1, local_assets=local_assets)
+        try:
+            samples = await run_renders(html, renders, concurrency=1)
+        finally:
+            await browser_pool.stop_browser_pool()
+        print(summarize(name, samples))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--renders", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.renders))
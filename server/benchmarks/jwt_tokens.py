@@ -0,0 +1,83 @@
+"""
+QWeather JWT 签名基准：每次请求重新签名 vs 缓存 token
+
+每次刷新 dashboard 会调用 5 个 QWeather 接口，原实现每次都重新解析 PEM 私钥并签名。
+未配置 QWEATHER_PRIVATE_KEY 时使用临时生成的 Ed25519 私钥。
+
+用法 (在 server/ 目录下):
+    python -m benchmarks.jwt_tokens --iterations 2000
+"""
+
+import argparse
+import time
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+
+from app.config import QWEATHER_PRIVATE_KEY
+from app.services.qweather_auth import QWeatherTokenProvider
+from benchmarks.stats import summarize
+
+# 每次刷新 dashboard 的 QWeather 请求数 (实时天气、空气质量、分钟降水、逐日预报，以及一次回退请求)
+CALLS_PER_REFRESH = 5
+
+
+def private_key_pem() -> str:
+    if QWEATHER_PRIVATE_KEY:
+        return QWEATHER_PRIVATE_KEY
+    key = Ed25519PrivateKey.generate()
+    return key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption()
+    ).decode("ascii")
+
+
+def sign_per_call(pem: str) -> str:
+    """原实现：每次调用都解析私钥并签名"""
+    now = int(time.time())
+    return jwt.encode(
+        {"sub": "benchmark", "iat": now - 30, "exp": now + 900},
+        pem.replace("\\n", "\n"),
+        algorithm="EdDSA",
+        headers={"kid": "benchmark"}
+    )
+
+
+def bench(name: str, get_token, iterations: int) -> None:
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        for _ in range(CALLS_PER_REFRESH):
+            get_token()
+        samples.append((time.perf_counter() - start) * 1000)
+    per_call_us = sum(samples) / len(samples) / CALLS_PER_REFRESH * 1000
+    print(f"{summarize(name, samples)}  ({per_call_us:.1f}us per call)")
+
+
+def main(iterations: int) -> None:
+    pem = private_key_pem()
+    provider = QWeatherTokenProvider(project_id="benchmark", key_id="benchmark", private_key=pem)
+
+    print(f"Per dashboard refresh ({CALLS_PER_REFRESH} QWeather calls):")
+    bench("sign per call", lambda: sign_per_call(pem), iterations)
+    bench("cached provider", provider.token, iterations)
+    print(f"cached provider signed {provider.signed_count} token(s) for {iterations * CALLS_PER_REFRESH} calls")
+
+    # 模拟时钟推进一整天，统计需要重新签名的次数
+    clock = [time.time()]
+    simulated = QWeatherTokenProvider(
+        project_id="benchmark", key_id="benchmark", private_key=pem, clock=lambda: clock[0]
+    )
+    for _ in range(24 * 60):
+        simulated.token()
+        clock[0] += 60
+    print(f"1 refresh per minute for 24h: {simulated.signed_count} signatures instead of {24 * 60}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+    main(args.iterations)
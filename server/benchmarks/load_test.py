@@ -0,0 +1,305 @@
+"""
+端到端压测：本地上游替身 + 真实服务进程 / render_cli.py
+
+启动 stubs.py 中的 QWeather / RSS / R2 替身，再以子进程启动 uvicorn 服务，
+按指定并发请求 /dashboard，输出吞吐量、延迟百分位、非 200 响应数、
+服务进程树的峰值 RSS 和 Chromium 进程数，以及 /metrics 中各阶段的平均耗时。
+可选再以同样的并发运行 render_cli.py (单次渲染或 --devices 批量渲染)。
+全程不访问外网，可用于离线发现任何阶段的性能回退。
+
+默认关闭预渲染，每个请求都经过完整流水线；--no-cache 同时关闭上游缓存和渲染缓存。
+进程树的 RSS 和进程数从 /proc 读取，仅 Linux 可用。
+
+用法 (在 server/ 目录下):
+    python -m benchmarks.load_test --requests 200 --concurrency 8 --latency-ms 50 --error-rate 0.02
+    python -m benchmarks.load_test --renderer pillow --no-cache --requests 500 --concurrency 16
+    python -m benchmarks.load_test --requests 0 --cli-runs 4 --cli-devices 20 --concurrency 2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Optional
+
+import httpx
+
+from app.devices import SCREEN_PRESETS
+from benchmarks.stats import percentile, summarize
+from benchmarks.stubs import StubServer, add_stub_arguments, stub_config_from_args
+
+SERVER_DIR = Path(__file__).parent.parent
+PROC = Path("/proc")
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+CHROMIUM_NAMES = ("chrom", "headless_shell")
+
+
+def _process_table() -> dict[int, tuple[int, str, int]]:
+    """pid -> (父进程 pid, 进程名, RSS 字节)"""
+    table = {}
+    for entry in PROC.iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            stat = (entry / "stat").read_text()
+            rss_pages = int((entry / "statm").read_text().split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        # comm 可能包含空格和括号，取最后一个 ')' 之后的字段
+        name = stat[stat.index("(") + 1:stat.rindex(")")]
+        ppid = int(stat[stat.rindex(")") + 2:].split()[1])
+        table[int(entry.name)] = (ppid, name, rss_pages * PAGE_SIZE)
+    return table
+
+
+class ProcessTreeSampler:
+    """后台线程定期统计本进程所有子孙进程的 RSS 总和和 Chromium 进程数，记录峰值"""
+
+    def __init__(self, interval: float = 0.1):
+        self.interval = interval
+        self.available = PROC.is_dir()
+        self.peak_rss = 0
+        self.peak_chromium = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def sample(self) -> tuple[int, int]:
+        table = _process_table()
+        children = defaultdict(list)
+        for pid, (ppid, _, _) in table.items():
+            children[ppid].append(pid)
+        rss, chromium = 0, 0
+        stack = list(children[os.getpid()])
+        while stack:
+            pid = stack.pop()
+            _, name, pid_rss = table[pid]
+            rss += pid_rss
+            chromium += any(part in name.lower() for part in CHROMIUM_NAMES)
+            stack.extend(children[pid])
+        return rss, chromium
+
+    def reset(self) -> None:
+        self.peak_rss = 0
+        self.peak_chromium = 0
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            rss, chromium = self.sample()
+            self.peak_rss = max(self.peak_rss, rss)
+            self.peak_chromium = max(self.peak_chromium, chromium)
+
+    def start(self) -> None:
+        if self.available:
+            self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def report(self) -> str:
+        if not self.available:
+            return "peak RSS / Chromium processes: n/a (requires /proc)"
+        return f"peak RSS={self.peak_rss / 1024 / 1024:.0f}MiB  peak Chromium processes={self.peak_chromium}"
+
+
+def report_latencies(name: str, samples: list[float], elapsed: float, failures: int) -> None:
+    total = len(samples) + failures
+    print(summarize(name, samples) if samples else f"{name:<24} no successful requests")
+    if samples:
+        print(f"{'':<24} p90={percentile(samples, 90):8.1f}ms max={max(samples):8.1f}ms")
+    print(f"{'':<24} throughput={total / elapsed:.2f}/s  failures={failures}/{total}")
+
+
+def stage_means(metrics_text: str) -> dict[str, tuple[float, int]]:
+    """从 /metrics 中读取 dashboard_stage_seconds 的 阶段 -> (平均毫秒, 次数)"""
+    sums, counts = {}, {}
+    for match in re.finditer(r'^dashboard_stage_seconds_(sum|count)\{stage="([^"]+)"\} (\S+)$', metrics_text, re.M):
+        kind, name, value = match.groups()
+        (sums if kind == "sum" else counts)[name] = float(value)
+    return {name: (sums[name] / counts[name] * 1000, int(counts[name])) for name in counts if counts[name]}
+
+
+async def wait_for_server(base_url: str, process: subprocess.Popen, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"Server exited with code {process.returncode}")
+            try:
+                if (await client.get(f"{base_url}/health")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server did not become healthy within {timeout}s")
+
+
+async def drive_dashboard(base_url: str, paths: list[str], requests: int, concurrency: int) -> tuple[list[float], int, float]:
+    """并发请求 paths (轮流)，返回 (成功请求的毫秒耗时, 失败数, 总秒数)"""
+    semaphore = asyncio.Semaphore(concurrency)
+    samples: list[float] = []
+    failures = 0
+
+    async def one(client: httpx.AsyncClient, path: str) -> None:
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                resp = await client.get(f"{base_url}{path}")
+                ok = resp.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                samples.append((time.perf_counter() - start) * 1000)
+            else:
+                failures += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(one(client, paths[i % len(paths)]) for i in range(requests)))
+        elapsed = time.perf_counter() - start
+    return samples, failures, elapsed
+
+
+async def run_server_load(args: argparse.Namespace, env: dict[str, str], sampler: ProcessTreeSampler) -> None:
+    port = args.port
+    base_url = f"http://127.0.0.1:{port}"
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=SERVER_DIR, env=env
+    )
+    try:
+        await wait_for_server(base_url, process)
+        paths = [f"/dashboard?device={preset}" for preset in args.presets] if args.presets else ["/dashboard"]
+
+        # 预热：浏览器池、字体、模板
+        await drive_dashboard(base_url, paths, len(paths), 1)
+        sampler.reset()
+
+        samples, failures, elapsed = await drive_dashboard(base_url, paths, args.requests, args.concurrency)
+        print(f"\n/dashboard ({args.requests} requests, concurrency={args.concurrency}, paths={paths}):")
+        report_latencies("GET /dashboard", samples, elapsed, failures)
+        print(f"{'':<24} {sampler.report()}")
+
+        async with httpx.AsyncClient() as client:
+            resp = await client.get(f"{base_url}/metrics")
+        if resp.status_code == 200:
+            print("Server stage timings (from /metrics, including warm-up):")
+            for name, (mean_ms, count) in sorted(stage_means(resp.text).items()):
+                print(f"  {name:<22} n={count:<5} mean={mean_ms:8.1f}ms")
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def write_devices_file(path: Path, count: int) -> None:
+    """count 台设备，分布在 4 个位置和各种机型上"""
+    locations = [("121.1462,31.4622", "太仓"), ("116.41,39.92", "北京"), ("121.47,31.23", "上海"), ("113.26,23.13", "广州")]
+    presets = list(SCREEN_PRESETS.values())
+    devices = []
+    for i in range(count):
+        location, name = locations[i % len(locations)]
+        width, height = presets[(i // len(locations)) % len(presets)]
+        # 预设为竖放分辨率，布局按横屏渲染
+        devices.append({"id": f"bench-{i}", "location": location, "location_name": name, "width": height, "height": width})
+    path.write_text(json.dumps(devices, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+async def run_cli(args: argparse.Namespace, env: dict[str, str], sampler: ProcessTreeSampler) -> None:
+    command = [sys.executable, "render_cli.py"]
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.cli_devices:
+            devices_file = Path(tmp) / "devices.json"
+            write_devices_file(devices_file, args.cli_devices)
+            command += ["--devices", str(devices_file)]
+
+        semaphore = asyncio.Semaphore(args.concurrency)
+        samples: list[float] = []
+        failures = 0
+
+        async def one() -> None:
+            nonlocal failures
+            async with semaphore:
+                start = time.perf_counter()
+                process = await asyncio.create_subprocess_exec(
+                    *command, cwd=SERVER_DIR, env=env,
+                    stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE
+                )
+                _, stderr = await process.communicate()
+                if process.returncode == 0:
+                    samples.append((time.perf_counter() - start) * 1000)
+                else:
+                    failures += 1
+                    print(stderr.decode(errors="replace")[-2000:], file=sys.stderr)
+
+        sampler.reset()
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(args.cli_runs)))
+        elapsed = time.perf_counter() - start
+
+    label = f"--devices ({args.cli_devices} devices)" if args.cli_devices else "single render"
+    print(f"\nrender_cli.py {label} ({args.cli_runs} runs, concurrency={args.concurrency}):")
+    report_latencies("render_cli.py", samples, elapsed, failures)
+    print(f"{'':<24} {sampler.report()}")
+
+
+async def main(args: argparse.Namespace) -> None:
+    sampler = ProcessTreeSampler()
+    with StubServer(stub_config_from_args(args)) as stubs:
+        env = {
+            **os.environ,
+            **stubs.env(),
+            "RENDERER": args.renderer,
+            "PRERENDER_ENABLED": "false",
+            "METRICS_ENABLED": "true",
+            "UPSTREAM_CACHE_FILE": "",
+        }
+        if args.no_cache:
+            env.update(UPSTREAM_CACHE_ENABLED="false", RENDER_CACHE_MAX_ENTRIES="0")
+        print(f"Upstream stubs on {stubs.base_url} "
+              f"(latency={args.latency_ms}+{args.jitter_ms}ms, error rate={args.error_rate}, "
+              f"R2 error rate={args.r2_error_rate}), renderer={args.renderer}, "
+              f"caches={'off' if args.no_cache else 'on'}")
+
+        sampler.start()
+        try:
+            if args.requests:
+                await run_server_load(args, env, sampler)
+            if args.cli_runs:
+                await run_cli(args, env, sampler)
+        finally:
+            sampler.stop()
+
+        print("\nUpstream stub requests:")
+        for name, count in sorted(stubs.stats.items()):
+            print(f"  {name:<28} {count}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100, help="/dashboard 请求数 (0 表示不压测服务)")
+    parser.add_argument("--concurrency", type=int, default=4, help="同时进行的请求 / render_cli.py 进程数")
+    parser.add_argument("--presets", nargs="*", default=[], metavar="PRESET",
+                        help=f"轮流请求的机型 ({', '.join(SCREEN_PRESETS)})，默认只请求 /dashboard")
+    parser.add_argument("--renderer", choices=("chromium", "pillow"), default="chromium")
+    parser.add_argument("--no-cache", action="store_true", help="关闭上游缓存和渲染缓存")
+    parser.add_argument("--port", type=int, default=8765, help="被测服务端口")
+    parser.add_argument("--cli-runs", type=int, default=0, help="render_cli.py 运行次数")
+    parser.add_argument("--cli-devices", type=int, default=0, help="render_cli.py --devices 批量渲染的设备数")
+    add_stub_arguments(parser)
+    asyncio.run(main(parser.parse_args()))
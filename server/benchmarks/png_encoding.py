@@ -0,0 +1,45 @@
+"""
+PNG 编码基准：输出格式 x zlib 压缩级别 x 压缩策略 的文件大小与编码耗时
+
+用法 (在 server/ 目录下):
+    python -m benchmarks.png_encoding --iterations 10
+"""
+
+import argparse
+import statistics
+import time
+from io import BytesIO
+
+from PIL import Image
+
+from app.renderer.png_encoder import PNG_MODES, ZLIB_STRATEGIES, encode_png
+from app.renderer.screenshot import grayscale_postprocess
+from benchmarks.postprocess import sample_inputs
+
+LEVELS = (1, 3, 6, 9)
+
+
+def main(iterations: int, strategies: list[str]) -> None:
+    for name, data in sample_inputs().items():
+        # 先得到与线上一致的 16 级灰度竖屏图片，再只测编码
+        img = Image.open(BytesIO(grayscale_postprocess(data, png_mode="gray8")))
+        img.load()
+        print(f"{name} ({img.size[0]}x{img.size[1]})")
+        print(f"  {'mode':<10}{'level':>6} {'strategy':<10}{'bytes':>10}{'encode p50':>14}")
+        for mode in PNG_MODES:
+            for level in LEVELS:
+                for strategy in strategies:
+                    samples = []
+                    for _ in range(iterations):
+                        start = time.perf_counter()
+                        png_bytes = encode_png(img, mode, level, strategy)
+                        samples.append((time.perf_counter() - start) * 1000)
+                    print(f"  {mode:<10}{level:>6} {strategy:<10}{len(png_bytes):>10}{statistics.median(samples):>12.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--strategies", nargs="+", default=list(ZLIB_STRATEGIES), choices=list(ZLIB_STRATEGIES))
+    args = parser.parse_args()
+    main(args.iterations, args.strategies)
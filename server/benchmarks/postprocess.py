@@ -0,0 +1,88 @@
+"""
+Pillow 后处理基准：原始多步流程 vs 合并查找表
+
+校验两者输出逐像素一致，并比较耗时。
+
+用法 (在 server/ 目录下):
+    python -m benchmarks.postprocess --iterations 50
+"""
+
+import argparse
+import time
+from functools import partial
+from io import BytesIO
+from pathlib import Path
+
+from PIL import Image, ImageChops, ImageDraw, ImageEnhance
+
+from app.renderer.screenshot import grayscale_postprocess
+from benchmarks.stats import summarize
+
+SAMPLE_SCREENSHOT = Path(__file__).parent.parent.parent / "example" / "dashboard.png"
+
+
+def legacy_postprocess(screenshot_bytes: bytes) -> bytes:
+    """改造前 html_to_grayscale_png 中的后处理流程"""
+    img = Image.open(BytesIO(screenshot_bytes))
+    grayscale_img = img.convert("L")
+    grayscale_img = ImageEnhance.Contrast(grayscale_img).enhance(1.2)
+    grayscale_img = grayscale_img.point(lambda x: (x // 16) * 17)
+    grayscale_img = grayscale_img.rotate(90, expand=True)
+    output = BytesIO()
+    grayscale_img.save(output, format="PNG", optimize=True)
+    return output.getvalue()
+
+
+def _png(img: Image.Image) -> bytes:
+    output = BytesIO()
+    img.save(output, format="PNG")
+    return output.getvalue()
+
+
+def sample_inputs() -> dict[str, bytes]:
+    """样例截图 + 覆盖全部 256 级灰度的合成图 (RGB，与浏览器截图一致)"""
+    inputs = {}
+    if SAMPLE_SCREENSHOT.exists():
+        inputs["example/dashboard.png"] = _png(Image.open(SAMPLE_SCREENSHOT).convert("RGB"))
+
+    synthetic = Image.linear_gradient("L").resize((800, 600)).convert("RGB")
+    draw = ImageDraw.Draw(synthetic)
+    for i in range(0, 800, 40):
+        draw.rectangle([i, 100, i + 20, 500], fill=(i % 256, (i * 3) % 256, (i * 7) % 256))
+    draw.text((20, 20), "Kindle dashboard 16-level test", fill=(0, 0, 0))
+    inputs["synthetic gradient"] = _png(synthetic)
+    return inputs
+
+
+def _time(func, data: bytes, iterations: int) -> list[float]:
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func(data)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+# 与改造前一致的输出格式
+fused_postprocess = partial(
+    grayscale_postprocess, png_mode="gray8", compress_level=9, compress_strategy="filtered", dither_mode="posterize"
+)
+
+
+def main(iterations: int) -> None:
+    for name, data in sample_inputs().items():
+        legacy = Image.open(BytesIO(legacy_postprocess(data)))
+        fused = Image.open(BytesIO(fused_postprocess(data)))
+        identical = legacy.size == fused.size and ImageChops.difference(legacy, fused).getbbox() is None
+        print(f"{name}: pixel-identical={identical}")
+        if not identical:
+            raise SystemExit(1)
+        print("  " + summarize("legacy", _time(legacy_postprocess, data, iterations)))
+        print("  " + summarize("fused lut", _time(fused_postprocess, data, iterations)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+    main(args.iterations)
@@ -0,0 +1,53 @@
+"""
+渲染延迟基准：每次冷启动 Chromium vs 常驻浏览器池
+
+用法 (在 server/ 目录下):
+    python -m benchmarks.render_latency --renders 30 --concurrency 2
+"""
+
+import argparse
+import asyncio
+import time
+
+from app.renderer import browser_pool
+from app.renderer.screenshot import html_to_grayscale_png
+from benchmarks.fixtures import fixture_html
+from benchmarks.stats import summarize
+
+
+async def run_renders(html: str, renders: int, concurrency: int) -> list[float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    samples: list[float] = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await html_to_grayscale_png(html, use_cache=False)
+            samples.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(one() for _ in range(renders)))
+    return samples
+
+
+async def main(renders: int, concurrency: int, pool_size: int) -> None:
+    html = fixture_html()
+
+    # 未启动浏览器池：每次渲染都冷启动 Chromium
+    cold = await run_renders(html, renders, concurrency)
+    print(summarize("cold launch", cold))
+
+    await browser_pool.start_browser_pool(size=pool_size)
+    try:
+        warm = await run_renders(html, renders, concurrency)
+    finally:
+        await browser_pool.stop_browser_pool()
+    print(summarize(f"warm pool (size={pool_size})", warm))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--renders", type=int, default=30)
+    parser.add_argument("--concurrency", type=int, default=2)
+    parser.add_argument("--pool-size", type=int, default=2)
+    args = parser.parse_args()
+    asyncio.run(main(args.renders, args.concurrency, args.pool_size))
@@ -0,0 +1,84 @@
+"""
+渲染引擎对比：Chromium 截图 vs Pillow 直接绘制
+
+用同一份样例数据分别渲染，比较耗时，并计算两者像素差异
+(平均绝对差、差异像素占比)。差异超过容差时以非零状态退出，可在 CI 中作为回归检查。
+
+用法 (在 server/ 目录下):
+    python -m benchmarks.renderer_diff --iterations 10 --max-mean-diff 8 --max-diff-ratio 0.08
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import datetime
+from io import BytesIO
+from pathlib import Path
+
+from PIL import Image, ImageChops, ImageStat
+
+from app.renderer.pillow_renderer import render_dashboard_png_sync
+from app.renderer.screenshot import html_to_grayscale_png
+from app.renderer.template import CHINA_TZ, render_dashboard_html
+from benchmarks.fixtures import sample_weather, sample_news
+from benchmarks.stats import summarize
+
+# 差异像素：灰度差超过一级 (17) 才计入
+PIXEL_THRESHOLD = 17
+
+
+def pixel_diff(a: bytes, b: bytes) -> tuple[float, float, Image.Image]:
+    """返回 (平均绝对差, 差异像素占比, 差异图)"""
+    img_a = Image.open(BytesIO(a)).convert("L")
+    img_b = Image.open(BytesIO(b)).convert("L")
+    if img_a.size != img_b.size:
+        raise SystemExit(f"Size mismatch: {img_a.size} vs {img_b.size}")
+    diff = ImageChops.difference(img_a, img_b)
+    mean_diff = ImageStat.Stat(diff).mean[0]
+    histogram = diff.histogram()
+    differing = sum(histogram[PIXEL_THRESHOLD + 1:])
+    return mean_diff, differing / (img_a.width * img_a.height), diff
+
+
+async def main(iterations: int, max_mean_diff: float, max_diff_ratio: float, output: Path | None) -> None:
+    weather, news = sample_weather(), sample_news()
+    # 两种引擎使用相同的时间，避免页头时间不同造成差异
+    now = datetime.now(CHINA_TZ).replace(second=0, microsecond=0)
+
+    chromium_samples, pillow_samples = [], []
+    chromium_png = pillow_png = b""
+    for _ in range(iterations):
+        start = time.perf_counter()
+        chromium_png = await html_to_grayscale_png(render_dashboard_html(weather, news, now), use_cache=False)
+        chromium_samples.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        pillow_png = render_dashboard_png_sync(weather, news, now)
+        pillow_samples.append((time.perf_counter() - start) * 1000)
+
+    print(summarize("chromium", chromium_samples))
+    print(summarize("pillow", pillow_samples))
+
+    mean_diff, diff_ratio, diff_image = pixel_diff(chromium_png, pillow_png)
+    print(f"mean abs diff: {mean_diff:.2f} (max {max_mean_diff})")
+    print(f"differing pixels: {diff_ratio:.2%} (max {max_diff_ratio:.2%})")
+
+    if output:
+        output.mkdir(parents=True, exist_ok=True)
+        (output / "chromium.png").write_bytes(chromium_png)
+        (output / "pillow.png").write_bytes(pillow_png)
+        diff_image.save(output / "diff.png")
+        print(f"Saved images to {output}")
+
+    if mean_diff > max_mean_diff or diff_ratio > max_diff_ratio:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--max-mean-diff", type=float, default=8.0)
+    parser.add_argument("--max-diff-ratio", type=float, default=0.08)
+    parser.add_argument("--output", type=Path, default=None, help="保存两种渲染结果和差异图的目录")
+    args = parser.parse_args()
+    asyncio.run(main(args.iterations, args.max_mean_diff, args.max_diff_ratio, args.output))
@@ -0,0 +1,23 @@
+"""基准测试统计工具"""
+
+import math
+import statistics
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    """最近秩 (nearest-rank) 百分位数"""
+    if not samples:
+        return float("nan")
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(name: str, samples_ms: list[float]) -> str:
+    """格式化一组以毫秒为单位的耗时样本"""
+    return (
+        f"{name:<24} n={len(samples_ms):<4} "
+        f"mean={statistics.fmean(samples_ms):8.1f}ms "
+        f"p50={percentile(samples_ms, 50):8.1f}ms "
+        f"p99={percentile(samples_ms, 99):8.1f}ms"
+    )
@@ -0,0 +1,307 @@
+"""
+本地上游替身：QWeather、RSS 和 R2 (S3 兼容)
+
+在本机端口上启动一个 HTTP 服务，返回与线上结构一致的固定数据，可配置延迟和错误率，
+让端到端基准 (load_test.py) 完全离线运行：
+
+- QWeather: /v7/grid-weather/now、/v7/weather/now、/v7/air/now、/v7/minutely/5m、/v7/weather/3d、
+            /airquality/v1/current/{lat}/{lon} (不校验 JWT)
+- RSS:      /rss/{feed}
+- R2:       PUT / HEAD / GET /{bucket}/{key}，对象保存在内存中
+- /_stats:  各端点收到的请求数
+
+StubServer.env() 返回把服务指向替身所需的环境变量 (含临时生成的 Ed25519 私钥)。
+也可以单独运行，供手动启动的服务或 render_cli.py 使用 (在 server/ 目录下):
+    python -m benchmarks.stubs --port 9100 --latency-ms 50 --error-rate 0.05
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import socket
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+from xml.sax.saxutils import escape
+
+import uvicorn
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+
+from benchmarks.fixtures import sample_news, sample_weather
+
+R2_BUCKET = "dashboard"
+
+# RSS 分类 -> 替身中的 feed 名
+INTERNATIONAL_FEEDS = {"国际": "world", "财经": "markets", "科技": "technology"}
+
+
+@dataclass
+class StubConfig:
+    """替身行为"""
+    latency_ms: float = 0.0       # 每个请求的基础延迟
+    jitter_ms: float = 0.0        # 在基础延迟上随机增加 0-jitter_ms
+    error_rate: float = 0.0       # QWeather / RSS 返回 500 的概率
+    r2_error_rate: float = 0.0    # R2 返回 500 的概率
+    seed: Optional[int] = None
+
+
+def _qweather_now() -> dict:
+    current = sample_weather().current
+    obs_time = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    return {
+        "obsTime": obs_time.isoformat(timespec="minutes"),
+        "temp": current.temp,
+        "feelsLike": current.feels_like,
+        "text": current.text,
+        "icon": current.icon,
+        "windDir": current.wind_dir,
+        "windScale": current.wind_scale,
+    }
+
+
+def _qweather_daily(days: int) -> list[dict]:
+    forecasts = sample_weather().daily
+    today = date.today()
+    return [
+        {
+            "fxDate": (today + timedelta(days=i)).isoformat(),
+            "textDay": forecasts[i % len(forecasts)].text_day,
+            "iconDay": forecasts[i % len(forecasts)].icon_day,
+            "tempMin": forecasts[i % len(forecasts)].temp_min,
+            "tempMax": forecasts[i % len(forecasts)].temp_max,
+        }
+        for i in range(days)
+    ]
+
+
+def _rss(feed: str) -> str:
+    news = sample_news()
+    titles = [item.title for item in news.domestic] if feed == "domestic" else [
+        item.title.split("] ", 1)[-1] + " - Reuters" for item in news.international
+    ]
+    items = "".join(
+        f"<item><title>{escape(title)}</title><link>https://example.com/{feed}/{i}</link></item>"
+        for i, title in enumerate(titles)
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        f'<rss version="2.0"><channel><title>{feed}</title>{items}</channel></rss>'
+    )
+
+
+def create_stub_app(config: StubConfig) -> FastAPI:
+    """创建替身应用"""
+    app = FastAPI()
+    rng = random.Random(config.seed)
+    stats: Counter[str] = Counter()
+    objects: dict[str, tuple[bytes, dict[str, str]]] = {}
+
+    async def delay() -> None:
+        latency = config.latency_ms + rng.random() * config.jitter_ms
+        if latency > 0:
+            await asyncio.sleep(latency / 1000)
+
+    async def upstream(name: str, payload: dict) -> Response:
+        stats[name] += 1
+        await delay()
+        if rng.random() < config.error_rate:
+            stats[f"{name} (error)"] += 1
+            return JSONResponse(status_code=500, content={"code": "500"})
+        return JSONResponse({"code": "200", "updateTime": datetime.now(timezone.utc).isoformat(), **payload})
+
+    @app.get("/v7/grid-weather/now")
+    async def grid_weather_now():
+        return await upstream("grid-weather/now", {"now": _qweather_now()})
+
+    @app.get("/v7/weather/now")
+    async def weather_now():
+        return await upstream("weather/now", {"now": _qweather_now()})
+
+    @app.get("/v7/air/now")
+    async def air_now():
+        air = sample_weather().air
+        return await upstream("air/now", {"now": {"aqi": air.aqi, "category": air.category}})
+
+    @app.get("/airquality/v1/current/{lat}/{lon}")
+    async def air_quality_v1(lat: str, lon: str):
+        air = sample_weather().air
+        return await upstream("airquality/v1/current", {
+            "indexes": [{"code": "cn-mee", "aqi": int(air.aqi), "category": air.category}]
+        })
+
+    @app.get("/v7/minutely/5m")
+    async def minutely():
+        return await upstream("minutely/5m", {"summary": sample_weather().minutely.summary})
+
+    @app.get("/v7/weather/{days}d")
+    async def daily(days: int):
+        return await upstream(f"weather/{days}d", {"daily": _qweather_daily(days)})
+
+    @app.get("/rss/{feed}")
+    async def rss(feed: str):
+        stats["rss"] += 1
+        await delay()
+        if rng.random() < config.error_rate:
+            stats["rss (error)"] += 1
+            return Response(status_code=500)
+        return Response(content=_rss(feed), media_type="application/rss+xml")
+
+    @app.get("/_stats")
+    async def get_stats():
+        return {"requests": dict(stats), "objects": sorted(objects)}
+
+    @app.api_route("/{bucket}/{key:path}", methods=["PUT", "HEAD", "GET"])
+    async def r2_object(bucket: str, key: str, request: Request):
+        stats[f"r2 {request.method}"] += 1
+        # 先读完请求体，返回错误时连接上不会残留未读的数据
+        body = await request.body()
+        await delay()
+        if rng.random() < config.r2_error_rate:
+            stats[f"r2 {request.method} (error)"] += 1
+            return Response(status_code=500)
+
+        path = f"{bucket}/{key}"
+        if request.method == "PUT":
+            etag = f'"{hashlib.md5(body).hexdigest()}"'
+            headers = {
+                name: value for name, value in request.headers.items()
+                if name.startswith("x-amz-meta-") or name in ("content-type", "cache-control")
+            }
+            headers["etag"] = etag
+            objects[path] = (body, headers)
+            return Response(status_code=200, headers={"ETag": etag})
+
+        stored = objects.get(path)
+        if stored is None:
+            return Response(status_code=404)
+        body, headers = stored
+        if request.method == "HEAD":
+            return Response(status_code=200, headers={**headers, "content-length": str(len(body))})
+        return Response(content=body, headers=headers)
+
+    app.state.stats = stats
+    app.state.objects = objects
+    return app
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _private_key_pem() -> str:
+    return Ed25519PrivateKey.generate().private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption()
+    ).decode("ascii")
+
+
+class StubServer:
+    """在后台线程中运行替身服务"""
+
+    def __init__(self, config: Optional[StubConfig] = None, port: int = 0):
+        self.config = config or StubConfig()
+        self.port = port or _free_port()
+        self.app = create_stub_app(self.config)
+        self._server = uvicorn.Server(uvicorn.Config(
+            self.app, host="127.0.0.1", port=self.port, log_level="warning", lifespan="off",
+            # 不切换全局事件循环策略 (uvloop)，以免影响调用方的 asyncio 子进程
+            loop="asyncio"
+        ))
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    @property
+    def stats(self) -> dict[str, int]:
+        return dict(self.app.state.stats)
+
+    def env(self) -> dict[str, str]:
+        """把服务和 render_cli.py 指向替身的环境变量"""
+        return {
+            "QWEATHER_BASE_URL": f"{self.base_url}/v7",
+            "QWEATHER_PROJECT_ID": "stub-project",
+            "QWEATHER_KEY_ID": "stub-key",
+            "QWEATHER_PRIVATE_KEY": _private_key_pem(),
+            "NEWS_RSS_DOMESTIC": f"{self.base_url}/rss/domestic",
+            "NEWS_RSS_INTERNATIONAL": json.dumps(
+                {category: f"{self.base_url}/rss/{feed}" for category, feed in INTERNATIONAL_FEEDS.items()},
+                ensure_ascii=False
+            ),
+            "R2_ACCOUNT_ID": "stub",
+            "R2_ACCESS_KEY_ID": "stub",
+            "R2_SECRET_ACCESS_KEY": "stub",
+            "R2_ENDPOINT_URL": self.base_url,
+            "R2_BUCKET_NAME": R2_BUCKET,
+            # 替身只提供明文 HTTP/1.1
+            "HTTP2_ENABLED": "false",
+        }
+
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(target=self._server.run, name="upstream-stubs", daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > deadline or not self._thread.is_alive():
+                raise RuntimeError(f"Stub server failed to start on port {self.port}")
+            time.sleep(0.01)
+        return self
+
+    def stop(self) -> None:
+        self._server.should_exit = True
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def __enter__(self) -> "StubServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def add_stub_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="替身每个请求的基础延迟")
+    parser.add_argument("--jitter-ms", type=float, default=10.0, help="随机附加的延迟上限")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="QWeather / RSS 返回 500 的概率")
+    parser.add_argument("--r2-error-rate", type=float, default=0.0, help="R2 返回 500 的概率")
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def stub_config_from_args(args: argparse.Namespace) -> StubConfig:
+    return StubConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        r2_error_rate=args.r2_error_rate,
+        seed=args.seed
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=9100)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    server = StubServer(stub_config_from_args(args), port=args.port)
+    for name, value in server.env().items():
+        print(f"export {name}={json.dumps(value, ensure_ascii=False)}")
+    server.start()
+    print(f"# Upstream stubs listening on {server.base_url}, Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
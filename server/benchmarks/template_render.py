@@ -0,0 +1,98 @@
+"""
+Jinja 模板渲染基准：每次新建 Environment vs 共享环境 vs 预编译模板
+
+- per-call environment: 原实现，每次调用都新建 Environment 并重新解析 dashboard.html
+- shared environment:   进程内共享环境，模板只解析一次
+- precompiled:          build_templates.py 预编译的模块 (输出到临时目录)
+另外比较进程冷启动时首次渲染的耗时 (无缓存 / 字节码缓存 / 预编译)。
+
+用法 (在 server/ 目录下):
+    python -m benchmarks.template_render --iterations 500
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, ModuleLoader
+
+from app.renderer.template import TEMPLATES_DIR, render_dashboard_html
+from app.renderer.assets import QWEATHER_ICONS_BASE_URL, FONT_BASE_URL
+from benchmarks.fixtures import sample_weather, sample_news
+from benchmarks.stats import summarize
+
+
+def render_with(env_factory: Callable[[], Environment], weather, news) -> str:
+    """与 render_dashboard_html 相同的参数，只替换 Jinja 环境"""
+    return env_factory().get_template("dashboard.html").render(
+        date_str="2024年1月20日 周六",
+        update_time="08:05",
+        weather=weather,
+        news=news,
+        screen_width=800,
+        screen_height=600,
+        icons_base_url=QWEATHER_ICONS_BASE_URL,
+        font_base_url=FONT_BASE_URL
+    )
+
+
+def bench(name: str, render: Callable[[], str], iterations: int) -> None:
+    samples = []
+    start_all = time.perf_counter()
+    for _ in range(iterations):
+        start = time.perf_counter()
+        render()
+        samples.append((time.perf_counter() - start) * 1000)
+    rate = iterations / (time.perf_counter() - start_all)
+    print(f"{summarize(name, samples)}  {rate:8.0f} renders/s")
+
+
+def first_render_ms(env_factory: Callable[[], Environment], weather, news) -> float:
+    start = time.perf_counter()
+    render_with(env_factory, weather, news)
+    return (time.perf_counter() - start) * 1000
+
+
+def main(iterations: int) -> None:
+    weather, news = sample_weather(), sample_news()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        compiled_dir = Path(tmp) / "compiled"
+        bytecode_dir = Path(tmp) / "bytecode"
+        compiled_dir.mkdir()
+        bytecode_dir.mkdir()
+        Environment(loader=FileSystemLoader(TEMPLATES_DIR)).compile_templates(str(compiled_dir), zip=None)
+
+        shared = Environment(loader=FileSystemLoader(TEMPLATES_DIR))
+        precompiled = Environment(loader=ModuleLoader(str(compiled_dir)))
+
+        print("Steady state:")
+        bench("per-call environment", lambda: render_with(
+            lambda: Environment(loader=FileSystemLoader(TEMPLATES_DIR)), weather, news), iterations)
+        bench("shared environment", lambda: render_with(lambda: shared, weather, news), iterations)
+        bench("precompiled", lambda: render_with(lambda: precompiled, weather, news), iterations)
+        bench("render_dashboard_html", lambda: render_dashboard_html(weather, news), iterations)
+
+        # 冷启动：新的环境首次加载模板 (字节码缓存先写入一次)
+        first_render_ms(lambda: Environment(
+            loader=FileSystemLoader(TEMPLATES_DIR), bytecode_cache=FileSystemBytecodeCache(str(bytecode_dir))
+        ), weather, news)
+        print("First render in a fresh process (ms):")
+        for name, factory in (
+            ("parse", lambda: Environment(loader=FileSystemLoader(TEMPLATES_DIR))),
+            ("bytecode cache", lambda: Environment(
+                loader=FileSystemLoader(TEMPLATES_DIR), bytecode_cache=FileSystemBytecodeCache(str(bytecode_dir))
+            )),
+            ("precompiled", lambda: Environment(loader=ModuleLoader(str(compiled_dir)))),
+        ):
+            samples = [first_render_ms(factory, weather, news) for _ in range(20)]
+            print(summarize(name, samples))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+    main(args.iterations)
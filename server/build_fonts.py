@@ -0,0 +1,115 @@
+"""
+生成离线渲染所需的本地字体资源 (app/assets)
+
+1. 下载 qweather-icons 图标字体 CSS 及其引用的字体文件
+2. 从系统 Noto Sans CJK 字体中裁剪出简体中文子集 (GB2312 + ASCII + 常用标点)，输出 woff2
+
+依赖 fonttools 和 brotli (仅构建时需要):
+    pip install fonttools brotli
+    python build_fonts.py
+"""
+
+import argparse
+import re
+import sys
+from pathlib import Path
+
+import httpx
+
+sys.path.append(str(Path(__file__).parent))
+
+from app.renderer.assets import ASSETS_DIR, QWEATHER_ICONS_BASE_URL  # noqa: E402
+
+NOTO_CJK_DIR = Path("/usr/share/fonts/opentype/noto")
+NOTO_SOURCES = {
+    "regular": NOTO_CJK_DIR / "NotoSansCJK-Regular.ttc",
+    "bold": NOTO_CJK_DIR / "NotoSansCJK-Bold.ttc",
+}
+
+# 模板中固定出现、但不一定在 GB2312 里的字符
+EXTRA_CHARS = "·°【】｜—…“”‘’"
+
+
+def download_qweather_icons(output_dir: Path) -> None:
+    """下载图标字体 CSS 以及 CSS 中 url(...) 引用的字体文件"""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    with httpx.Client(timeout=30.0, follow_redirects=True) as client:
+        css_url = f"{QWEATHER_ICONS_BASE_URL}/qweather-icons.css"
+        css = client.get(css_url).raise_for_status().text
+        (output_dir / "qweather-icons.css").write_text(css, encoding="utf-8")
+        print(f"Downloaded {css_url}")
+
+        for ref in sorted(set(re.findall(r"url\([\"']?([^\"')]+)[\"']?\)", css))):
+            relative = ref.split("?", 1)[0].split("#", 1)[0]
+            if relative.startswith(("data:", "http://", "https://")):
+                continue
+            target = (output_dir / relative).resolve()
+            if output_dir.resolve() not in target.parents:
+                raise ValueError(f"Refusing to write outside of {output_dir}: {ref}")
+            target.parent.mkdir(parents=True, exist_ok=True)
+            file_url = f"{QWEATHER_ICONS_BASE_URL}/{relative.removeprefix('./')}"
+            target.write_bytes(client.get(file_url).raise_for_status().content)
+            print(f"Downloaded {file_url}")
+
+
+def subset_charset() -> str:
+    """GB2312 全部汉字和符号 + 可打印 ASCII + 额外字符"""
+    chars = {chr(c) for c in range(0x20, 0x7F)}
+    for hi in range(0xA1, 0xF8):
+        for lo in range(0xA1, 0xFF):
+            try:
+                chars.add(bytes([hi, lo]).decode("gb2312"))
+            except UnicodeDecodeError:
+                pass
+    chars.update(EXTRA_CHARS)
+    return "".join(sorted(chars))
+
+
+def subset_noto_sans_sc(source: Path, output: Path, text: str) -> None:
+    """从 Noto Sans CJK 字体集合中取出 SC 字体并裁剪为 woff2 子集"""
+    from fontTools import subset
+    from fontTools.ttLib import TTCollection, TTFont
+
+    if source.suffix.lower() == ".ttc":
+        fonts = TTCollection(str(source)).fonts
+        font = next(
+            (f for f in fonts if "CJK SC" in f["name"].getDebugName(1) and "Mono" not in f["name"].getDebugName(1)),
+            None
+        )
+        if font is None:
+            raise ValueError(f"No Noto Sans CJK SC face found in {source}")
+    else:
+        font = TTFont(str(source))
+
+    options = subset.Options()
+    options.flavor = "woff2"
+    options.layout_features = ["*"]
+    options.name_IDs = ["*"]
+    options.notdef_outline = True
+    subsetter = subset.Subsetter(options=options)
+    subsetter.populate(text=text)
+    subsetter.subset(font)
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    font.flavor = "woff2"
+    font.save(str(output))
+    print(f"Wrote {output} ({output.stat().st_size // 1024} KiB)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--regular", type=Path, default=NOTO_SOURCES["regular"], help="Noto Sans CJK Regular 字体")
+    parser.add_argument("--bold", type=Path, default=NOTO_SOURCES["bold"], help="Noto Sans CJK Bold 字体")
+    parser.add_argument("--skip-icons", action="store_true", help="不下载图标字体")
+    args = parser.parse_args()
+
+    if not args.skip_icons:
+        download_qweather_icons(ASSETS_DIR / "qweather-icons")
+
+    text = subset_charset()
+    subset_noto_sans_sc(args.regular, ASSETS_DIR / "fonts" / "noto-sans-sc-regular.woff2", text)
+    subset_noto_sans_sc(args.bold, ASSETS_DIR / "fonts" / "noto-sans-sc-bold.woff2", text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+预编译 Jinja 模板 (app/templates -> app/templates_compiled)
+
+编译后的模板是普通 Python 模块，服务启动后直接导入，无需再解析模板源码。
+修改模板后需重新运行；预编译结果比源模板旧时会自动回退到解析模板。
+
+    python build_templates.py
+"""
+
+import argparse
+import shutil
+import sys
+from pathlib import Path
+
+from jinja2 import Environment, FileSystemLoader
+
+sys.path.append(str(Path(__file__).parent))
+
+from app.renderer.template import COMPILED_TEMPLATES_DIR, TEMPLATES_DIR  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", type=Path, default=COMPILED_TEMPLATES_DIR, help="输出目录")
+    args = parser.parse_args()
+
+    # 先清空，避免保留已删除模板的旧模块
+    shutil.rmtree(args.output, ignore_errors=True)
+    args.output.mkdir(parents=True)
+
+    env = Environment(loader=FileSystemLoader(TEMPLATES_DIR))
+    env.compile_templates(
+        str(args.output),
+        zip=None,
+        filter_func=lambda name: name.endswith(".html"),
+        ignore_errors=False,
+        log_function=print
+    )
+
+
+if __name__ == "__main__":
+    main()
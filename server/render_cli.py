@@ -1,32 +1,34 @@
+import argparse
 import asyncio
 import os
 import sys
+import time
 from pathlib import Path
 
 # 确保导入路径正确
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from app.services.weather import get_weather_data
-from app.services.news import get_news_data
-from app.renderer.template import render_dashboard_html
-from app.renderer.screenshot import html_to_grayscale_png
-from app.services.r2_storage import upload_dashboard_image, is_r2_configured
-from app.config import LOCATION
+from app.services.r2_storage import UploadQueue, upload_dashboard_image, is_r2_configured
+from app.services.http_client import close_http_client
+from app.services.cache import upstream_cache
+from app.renderer.browser_pool import start_browser_pool, stop_browser_pool
+from app.devices import DEFAULT_DEVICE, load_devices
+from app.pipeline import render_devices
+from app.config import LOCATION, DEVICES_FILE, RENDERER, BROWSER_POOL_SIZE
 
 async def main():
     print(f"Starting dashboard render for {LOCATION}...")
     
-    # 1. 获取数据
-    weather = await get_weather_data(LOCATION)
-    news = get_news_data()
-    
-    # 2. 渲染 HTML
-    html_content = render_dashboard_html(weather, news)
-    
-    # 3. 生成灰度 PNG
-    png_bytes = await html_to_grayscale_png(html_content)
+    # 1. 获取数据并渲染灰度 PNG，与 HTTP 服务相同按 RENDERER 选择渲染方式
+    #    (复用 UPSTREAM_CACHE_FILE 中上次的缓存，上游失败时使用其中的旧数据)
+    upstream_cache.load()
+    try:
+        png_bytes = (await render_devices([DEFAULT_DEVICE]))[DEFAULT_DEVICE.id]
+    finally:
+        await close_http_client()
+        await upstream_cache.close()
 
-    # 4. 始终保存到本地 ./static/dashboard.png
+    # 2. 始终保存到本地 ./static/dashboard.png
     output_dir = Path("./static")
     output_dir.mkdir(exist_ok=True)
     output_path = output_dir / "dashboard.png"
@@ -37,7 +39,7 @@ async def main():
     except Exception as e:
         print(f"Failed to save local copy: {str(e)}")
 
-    # 5. 上传到 Cloudflare R2 (如果配置了)
+    # 3. 上传到 Cloudflare R2 (如果配置了)
     if is_r2_configured():
         print("Uploading to Cloudflare R2...")
         if upload_dashboard_image(png_bytes):
@@ -47,6 +49,56 @@ async def main():
     else:
         print("R2 credentials not set, skipping upload.")
 
+
+async def render_all_devices(devices_file: str):
+    """按设备注册表批量渲染，并上传到各自的 R2 文件名"""
+    devices = load_devices(devices_file)
+    print(f"Starting batch render for {len(devices)} devices from {devices_file}...")
+    start = time.perf_counter()
+
+    upstream_cache.load()
+    if RENDERER == "chromium" and BROWSER_POOL_SIZE > 0:
+        await start_browser_pool()
+    try:
+        results = await render_devices(devices)
+    finally:
+        await stop_browser_pool()
+        await close_http_client()
+        await upstream_cache.close()
+    print(f"Rendered {len(devices)} devices in {time.perf_counter() - start:.1f}s")
+
+    # 本地副本保存到 ./static/devices/<id>.png
+    output_dir = Path("./static/devices")
+    output_dir.mkdir(parents=True, exist_ok=True)
+    for device_id, png_bytes in results.items():
+        (output_dir / f"{device_id}.png").write_bytes(png_bytes)
+    print(f"Saved local copies to {output_dir}")
+
+    if not is_r2_configured():
+        print("R2 credentials not set, skipping upload.")
+        return
+
+    # 上传队列限制并发并重试，内容未变化的图片跳过
+    queue = UploadQueue()
+    queue.start()
+    for device in devices:
+        queue.submit(results[device.id], device.key, content_type="image/png", cache_control="max-age=60")
+    await queue.stop()
+    print(f"Uploaded {queue.uploaded}/{len(devices)} images to R2")
+    if queue.failed:
+        print(f"{queue.failed} uploads failed")
+        sys.exit(1)
+
+
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Render the Kindle dashboard and upload it to R2")
+    parser.add_argument(
+        "--devices", nargs="?", const=DEVICES_FILE, default=None, metavar="FILE",
+        help=f"batch render every device in the registry (default file: {DEVICES_FILE})"
+    )
+    args = parser.parse_args()
+    if args.devices:
+        asyncio.run(render_all_devices(args.devices))
+    else:
+        asyncio.run(main())
 
@@ -0,0 +1,106 @@
+"""
+/device/sync 的局部刷新
+
+用 Pillow 渲染器和固定的样例数据渲染按设备的图片 (不经过 publish_dashboard)，
+确认第二次同步能与第一次下发的图片比较，只下发变化的区域。
+"""
+
+import io
+import json
+import os
+import sys
+import tarfile
+import tempfile
+from dataclasses import replace
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+_devices_file = Path(tempfile.mkdtemp()) / "devices.json"
+_devices_file.write_text(json.dumps([
+    {"id": "beijing-office", "location": "101010100", "location_name": "北京"}
+]))
+# 配置在导入时读取
+os.environ.update({
+    "RENDERER": "pillow",
+    "PRERENDER_ENABLED": "false",
+    "TIMELINE_ENABLED": "false",
+    "UPSTREAM_CACHE_FILE": "",
+    "TELEMETRY_DB": "",
+    "DEVICES_FILE": str(_devices_file),
+})
+for _name, _font in (("PILLOW_FONT_REGULAR", "DejaVuSans.ttf"), ("PILLOW_FONT_BOLD", "DejaVuSans-Bold.ttf")):
+    _path = Path("/usr/share/fonts/truetype/dejavu") / _font
+    if _path.exists():
+        os.environ.setdefault(_name, str(_path))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import app.pipeline  # noqa: E402
+from app.main import app as dashboard_app  # noqa: E402
+from app.telemetry import telemetry_store  # noqa: E402
+from benchmarks.fixtures import sample_news, sample_weather  # noqa: E402
+
+
+@pytest.fixture
+def news(monkeypatch):
+    """可修改的新闻数据，天气固定"""
+    current = {"news": sample_news()}
+
+    async def fake_weather(location, name=None):
+        return sample_weather()
+
+    async def fake_news():
+        return current["news"]
+
+    monkeypatch.setattr(app.pipeline, "get_weather_data", fake_weather)
+    monkeypatch.setattr(app.pipeline, "get_news_data", fake_news)
+    telemetry_store._states.clear()
+    return current
+
+
+def _sync(client: TestClient, etag: str):
+    response = client.post("/device/sync", json={"device": "beijing-office", "etag": etag, "battery": 80})
+    assert response.status_code == 200
+    with tarfile.open(fileobj=io.BytesIO(response.content)) as archive:
+        names = archive.getnames()
+        manifest = archive.extractfile("manifest.txt").read().decode().splitlines()
+    return response, manifest, names
+
+
+def _change_first_title(news):
+    items = news["news"].domestic
+    news["news"] = replace(news["news"], domestic=[replace(items[0], title="全国秋粮收获进度过八成"), *items[1:]])
+
+
+def test_second_sync_is_partial(news):
+    client = TestClient(dashboard_app)
+    first, manifest, names = _sync(client, "")
+    assert first.headers["X-Dashboard-Sync"] == "full"
+    assert "refresh full" in manifest and "dashboard.png" in names
+
+    _change_first_title(news)
+    second, manifest, names = _sync(client, first.headers["ETag"])
+    assert second.headers["ETag"] != first.headers["ETag"]
+    assert second.headers["X-Dashboard-Sync"] == "partial"
+    assert "refresh partial" in manifest
+    assert any(line.startswith("region ") for line in manifest)
+    assert "dashboard.png" not in names
+    assert telemetry_store.state("beijing-office").partial_refreshes == 1
+
+    third, manifest, names = _sync(client, second.headers["ETag"])
+    assert third.headers["X-Dashboard-Sync"] == "unchanged"
+    assert "unchanged" in manifest
+
+
+def test_unknown_base_is_full(news):
+    client = TestClient(dashboard_app)
+    telemetry_store._states["beijing-office"] = replace(
+        telemetry_store.state("beijing-office"), partial_refreshes=2
+    )
+    response, manifest, names = _sync(client, '"0123456789abcdef0123456789abcdef"')
+    assert response.headers["X-Dashboard-Sync"] == "full"
+    assert "refresh full" in manifest and "dashboard.png" in names
+    assert telemetry_store.state("beijing-office").partial_refreshes == 0
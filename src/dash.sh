@@ -5,6 +5,9 @@ DEBUG=${DEBUG:-false}
 DIR="$(dirname "$0")"
 DASH_PNG="$DIR/dash.png"
 FETCH_DASHBOARD_CMD="$DIR/local/fetch-dashboard.sh"
+FETCH_DELTA_CMD="$DIR/local/fetch-delta.sh"
+SYNC_CMD="$DIR/local/sync-dashboard.sh"
+DELTA_DIR="$DIR/delta"
 LOW_BATTERY_CMD="$DIR/local/low-battery.sh"
 
 REFRESH_SCHEDULE=${REFRESH_SCHEDULE:-"5 7-23 * * *"}
@@ -15,8 +18,14 @@ RTC=/sys/devices/platform/mxc_rtc.0/wakeup_enable
 LOW_BATTERY_REPORTING=${LOW_BATTERY_REPORTING:-false}
 LOW_BATTERY_THRESHOLD_PERCENT=${LOW_BATTERY_THRESHOLD_PERCENT:-10}
 
+SYNC_URL=${SYNC_URL:-""}
+
 num_refresh=0
 
+# Whether the screen shows something other than the dashboard (or nothing yet).
+# An unchanged dashboard is only skipped when the screen already shows it.
+screen_dirty=true
+
 init() {
   if [ -z "$TIMEZONE" ] || [ -z "$REFRESH_SCHEDULE" ]; then
     echo "Missing required configuration."
@@ -37,6 +46,7 @@ prepare_sleep() {
   echo "Preparing sleep"
 
   /usr/sbin/eips -f -g "$DIR/sleeping.png"
+  screen_dirty=true
 
   # Give screen time to refresh
   sleep 2
@@ -45,14 +55,53 @@ prepare_sleep() {
   num_refresh=$FULL_DISPLAY_REFRESH_RATE
 }
 
+draw_regions() {
+  echo "Partial screen refresh of changed regions"
+  while read -r kind x y width height file; do
+    [ "$kind" = region ] || continue
+    echo "Region ${width}x${height} at $x,$y"
+    /usr/sbin/eips -g "$DELTA_DIR/$file" -x "$x" -y "$y"
+  done <"$DELTA_DIR/manifest.txt"
+}
+
 refresh_dashboard() {
   echo "Refreshing dashboard"
   "$DIR/wait-for-wifi.sh" "$WIFI_TEST_IP"
 
-  "$FETCH_DASHBOARD_CMD" "$DASH_PNG"
-  fetch_status=$?
+  if [ -n "$DELTA_URL" ] && [ "$screen_dirty" = false ] &&
+    [ "$num_refresh" -ne "$FULL_DISPLAY_REFRESH_RATE" ]; then
+    "$FETCH_DELTA_CMD" "$DASH_PNG" "$DELTA_DIR"
+    fetch_status=$?
+
+    case "$fetch_status" in
+    2)
+      echo "Dashboard unchanged, skipping screen refresh"
+      return 0
+      ;;
+    4)
+      draw_regions
+      num_refresh=$((num_refresh + 1))
+      return 0
+      ;;
+    0) ;;
+    *)
+      echo "fetch-delta returned $fetch_status, fetching the whole dashboard"
+      "$FETCH_DASHBOARD_CMD" "$DASH_PNG"
+      fetch_status=$?
+      ;;
+    esac
+  else
+    "$FETCH_DASHBOARD_CMD" "$DASH_PNG"
+    fetch_status=$?
+  fi
 
-  if [ "$fetch_status" -ne 0 ]; then
+  # fetch-dashboard exits with 2 when the image is unchanged (HTTP 304)
+  if [ "$fetch_status" -eq 2 ] && [ "$screen_dirty" = false ]; then
+    echo "Dashboard unchanged, skipping screen refresh"
+    return 0
+  fi
+
+  if [ "$fetch_status" -ne 0 ] && [ "$fetch_status" -ne 2 ]; then
     echo "Not updating screen, fetch-dashboard returned $fetch_status"
     return 1
   fi
@@ -69,14 +118,74 @@ refresh_dashboard() {
   fi
 
   num_refresh=$((num_refresh + 1))
+  screen_dirty=false
+}
+
+# Fetch the dashboard and the next wakeup from SYNC_URL in one request,
+# reporting the battery level. Sets next_wakeup_secs, synced_at and action.
+# Fails when the server could not be reached.
+sync_dashboard() {
+  echo "Syncing dashboard"
+  "$DIR/wait-for-wifi.sh" "$WIFI_TEST_IP"
+
+  SCREEN_DIRTY=$screen_dirty "$SYNC_CMD" "$DASH_PNG" "$DELTA_DIR" "$battery_level_numeric"
+  sync_status=$?
+  synced_at=$(date +%s)
+
+  # Only the script's own results; every failure (including HTTP errors)
+  # exits 1, leaving the previous manifest in place
+  case "$sync_status" in
+  0 | 2 | 4) ;;
+  *)
+    echo "sync-dashboard returned $sync_status"
+    synced_at=""
+    return 1
+    ;;
+  esac
+
+  next_wakeup_secs=$(sed -n 's/^wakeup //p' "$DELTA_DIR/manifest.txt")
+  if [ -z "$next_wakeup_secs" ]; then
+    next_wakeup_secs=$("$DIR/next-wakeup" --schedule="$REFRESH_SCHEDULE" --timezone="$TIMEZONE")
+    synced_at=""
+  fi
+
+  if [ "$next_wakeup_secs" -gt "$SLEEP_SCREEN_INTERVAL" ]; then
+    action="sleep"
+    prepare_sleep
+    return 0
+  fi
+  action="suspend"
+
+  case "$sync_status" in
+  2)
+    echo "Dashboard unchanged, skipping screen refresh"
+    return 0
+    ;;
+  4)
+    draw_regions
+    ;;
+  0)
+    # The server counts partial refreshes and asks for a full one regularly
+    if [ "$(sed -n 's/^refresh //p' "$DELTA_DIR/manifest.txt")" = full ] ||
+      [ "$screen_dirty" = true ]; then
+      echo "Full screen refresh"
+      /usr/sbin/eips -f -g "$DASH_PNG"
+    else
+      echo "Partial screen refresh"
+      /usr/sbin/eips -g "$DASH_PNG"
+    fi
+    ;;
+  esac
+
+  screen_dirty=false
 }
 
 log_battery_stats() {
   battery_level=$(gasgauge-info -c)
+  battery_level_numeric=${battery_level%?}
   echo "$(date) Battery level: $battery_level."
 
   if [ "$LOW_BATTERY_REPORTING" = true ]; then
-    battery_level_numeric=${battery_level%?}
     if [ "$battery_level_numeric" -le "$LOW_BATTERY_THRESHOLD_PERCENT" ]; then
       "$LOW_BATTERY_CMD" "$battery_level_numeric"
     fi
@@ -99,19 +208,30 @@ main_loop() {
   while true; do
     log_battery_stats
 
-    next_wakeup_secs=$("$DIR/next-wakeup" --schedule="$REFRESH_SCHEDULE" --timezone="$TIMEZONE")
-
-    if [ "$next_wakeup_secs" -gt "$SLEEP_SCREEN_INTERVAL" ]; then
-      action="sleep"
-      prepare_sleep
+    synced_at=""
+    if [ -n "$SYNC_URL" ] && sync_dashboard; then
+      echo "Synced with the dashboard server"
     else
-      action="suspend"
-      refresh_dashboard
+      next_wakeup_secs=$("$DIR/next-wakeup" --schedule="$REFRESH_SCHEDULE" --timezone="$TIMEZONE")
+
+      if [ "$next_wakeup_secs" -gt "$SLEEP_SCREEN_INTERVAL" ]; then
+        action="sleep"
+        prepare_sleep
+      else
+        action="suspend"
+        refresh_dashboard
+      fi
     fi
 
     # take a bit of time before going to sleep, so this process can be aborted
     sleep 10
 
+    if [ -n "$synced_at" ]; then
+      # The server counted the seconds until the next wakeup from the sync
+      next_wakeup_secs=$((next_wakeup_secs - ($(date +%s) - synced_at)))
+      [ "$next_wakeup_secs" -gt 0 ] || next_wakeup_secs=1
+    fi
+
     echo "Going to $action, next wakeup in ${next_wakeup_secs}s"
 
     rtc_sleep "$next_wakeup_secs"
@@ -18,6 +18,25 @@ export FULL_DISPLAY_REFRESH_RATE=${FULL_DISPLAY_REFRESH_RATE:-4}
 # during the day, for example.
 export SLEEP_SCREEN_INTERVAL=3600
 
+# Send the MD5 of the current image as If-None-Match and skip both the
+# download and the screen redraw when the dashboard has not changed.
+export CONDITIONAL_FETCH=${CONDITIONAL_FETCH:-true}
+
+# Kindle dashboard server endpoint returning only the regions that changed
+# since the image on screen (e.g. https://example.com/dashboard/delta).
+# When set, partial refreshes only redraw those regions; full refreshes
+# still download the whole image from DASHBOARD_URL.
+export DELTA_URL=${DELTA_URL:-""}
+
+# Kindle dashboard server sync endpoint (e.g. https://example.com/device/sync).
+# When set, each wakeup makes a single request that reports the battery level
+# and returns the next wakeup, the full/partial refresh hint and the new image
+# (or changed regions) only when the dashboard changed. Falls back to
+# DASHBOARD_URL and the local next-wakeup when the server can't be reached.
+# DEVICE_ID is the device id in the server's devices.json (empty: default).
+export SYNC_URL=${SYNC_URL:-""}
+export DEVICE_ID=${DEVICE_ID:-""}
+
 export LOW_BATTERY_REPORTING=${LOW_BATTERY_REPORTING:-false}
 export LOW_BATTERY_THRESHOLD_PERCENT=10
 
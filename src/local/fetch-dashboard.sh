@@ -1,4 +1,44 @@
 #!/usr/bin/env sh
 # Fetch a new dashboard image, make sure to output it to "$1".
-# For example:
-"$(dirname "$0")/../xh" -d -q -o "$1" get "${DASHBOARD_URL}"
+#
+# With CONDITIONAL_FETCH=true the request carries the MD5 of the current
+# image as If-None-Match (the ETag format used by the server and by R2).
+# Exit with status 2 when the server answers 304 Not Modified, so the
+# screen is not redrawn, and 1 when the request failed.
+out="$1"
+xh="$(dirname "$0")/../xh"
+
+if [ "$CONDITIONAL_FETCH" != true ] || [ ! -f "$out" ]; then
+  "$xh" -d -q -o "$out" get "${DASHBOARD_URL}"
+  status=$?
+  if [ "$status" -ne 0 ]; then
+    echo "Fetching $DASHBOARD_URL failed, xh exited with $status"
+    exit 1
+  fi
+  rm -f "$out.etag"
+  exit 0
+fi
+
+etag="\"$(md5sum "$out" | cut -d ' ' -f 1)\""
+tmp="$out.tmp"
+
+"$xh" -d -q --check-status -o "$tmp" get "${DASHBOARD_URL}" "If-None-Match:$etag"
+status=$?
+
+case "$status" in
+0)
+  mv "$tmp" "$out"
+  rm -f "$out.etag"
+  ;;
+3)
+  # 3xx: 304 Not Modified
+  rm -f "$tmp"
+  exit 2
+  ;;
+*)
+  # xh exits 2 on a timeout, which would read as 304 Not Modified
+  echo "Fetching $DASHBOARD_URL failed, xh exited with $status"
+  rm -f "$tmp"
+  exit 1
+  ;;
+esac
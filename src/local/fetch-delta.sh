@@ -0,0 +1,59 @@
+#!/usr/bin/env sh
+# Fetch only the regions of the dashboard that changed since the image on
+# screen. "$1" is the local dashboard image, "$2" the directory the regions
+# are extracted to.
+#
+# The ETag of the image on screen is read from "$1.etag" (written after a
+# previous partial update) or computed from "$1", and sent as If-None-Match
+# to DELTA_URL. Exit status:
+#   0  the server sent the whole image, it has been written to "$1"
+#   1  the request failed (network error, timeout, HTTP error or bad archive)
+#   2  the dashboard has not changed (HTTP 304)
+#   4  "$2/manifest.txt" lists the changed regions to draw
+out="$1"
+dir="$2"
+xh="$(dirname "$0")/../xh"
+
+if [ -f "$out.etag" ]; then
+  etag="$(cat "$out.etag")"
+elif [ -f "$out" ]; then
+  etag="\"$(md5sum "$out" | cut -d ' ' -f 1)\""
+else
+  etag=""
+fi
+
+tmp="$out.delta.tmp"
+"$xh" -d -q --check-status -o "$tmp" get "${DELTA_URL}" "If-None-Match:$etag"
+status=$?
+
+case "$status" in
+0) ;;
+3)
+  # 3xx: 304 Not Modified
+  rm -f "$tmp"
+  exit 2
+  ;;
+*)
+  # xh exits 2 on a timeout and 4 on 4xx, which would read as our own codes
+  echo "Fetching $DELTA_URL failed, xh exited with $status"
+  rm -f "$tmp"
+  exit 1
+  ;;
+esac
+
+rm -rf "$dir"
+mkdir -p "$dir"
+tar -xf "$tmp" -C "$dir"
+status=$?
+rm -f "$tmp"
+[ "$status" -eq 0 ] || exit 1
+
+if [ -f "$dir/dashboard.png" ]; then
+  mv "$dir/dashboard.png" "$out"
+  rm -f "$out.etag"
+  exit 0
+fi
+
+# The local image is now older than the screen, remember what is shown.
+sed -n 's/^etag //p' "$dir/manifest.txt" >"$out.etag"
+exit 4
@@ -0,0 +1,69 @@
+#!/usr/bin/env sh
+# Sync with the dashboard server in a single request: report the battery
+# level and the ETag of the image on screen to SYNC_URL, get back the next
+# wakeup and, when the dashboard changed, the new image or changed regions.
+# "$1" is the local dashboard image, "$2" the directory the reply is
+# extracted to, "$3" the battery level in percent.
+#
+# An empty ETag is sent when "$1" is not on screen (SCREEN_DIRTY=true), so
+# the server sends the whole image. "$2/manifest.txt" contains
+#   wakeup <seconds until the next wakeup>
+#   refresh full|partial (when an image was sent)
+# Exit status:
+#   0  the server sent the whole image, it has been written to "$1"
+#   1  the sync failed (network error, timeout, HTTP error or bad archive)
+#   2  the dashboard has not changed
+#   4  "$2/manifest.txt" lists the changed regions to draw
+out="$1"
+dir="$2"
+battery="$3"
+xh="$(dirname "$0")/../xh"
+
+if [ "$SCREEN_DIRTY" = true ]; then
+  etag=""
+elif [ -f "$out.etag" ]; then
+  etag="$(cat "$out.etag")"
+elif [ -f "$out" ]; then
+  etag="\"$(md5sum "$out" | cut -d ' ' -f 1)\""
+else
+  etag=""
+fi
+
+tmp="$out.sync.tmp"
+if [ -n "$battery" ]; then
+  "$xh" -d -q --check-status -o "$tmp" post "${SYNC_URL}" \
+    device="$DEVICE_ID" etag="$etag" battery:="$battery"
+else
+  "$xh" -d -q --check-status -o "$tmp" post "${SYNC_URL}" \
+    device="$DEVICE_ID" etag="$etag"
+fi
+status=$?
+
+if [ "$status" -ne 0 ]; then
+  # xh exits 2 on a timeout and 4 on 4xx (unknown DEVICE_ID, bad battery),
+  # which would read as our own codes
+  echo "Syncing with $SYNC_URL failed, xh exited with $status"
+  rm -f "$tmp"
+  exit 1
+fi
+
+rm -rf "$dir"
+mkdir -p "$dir"
+tar -xf "$tmp" -C "$dir"
+status=$?
+rm -f "$tmp"
+[ "$status" -eq 0 ] || exit 1
+
+if grep -q '^unchanged$' "$dir/manifest.txt"; then
+  exit 2
+fi
+
+if [ -f "$dir/dashboard.png" ]; then
+  mv "$dir/dashboard.png" "$out"
+  rm -f "$out.etag"
+  exit 0
+fi
+
+# The local image is now older than the screen, remember what is shown.
+sed -n 's/^etag //p' "$dir/manifest.txt" >"$out.etag"
+exit 4